@@ -1,142 +1,275 @@
+import time
+IMPORT_STARTED = time.perf_counter()
+
 import os
+import sys
 import tkinter as tk
-from tkinter import ttk, messagebox
-import win32gui
-import win32con
-import win32api
-from PIL import Image, ImageTk, ImageSequence
-import keyboard  # Add this import at the top
-from pyvda import VirtualDesktop, AppView, get_virtual_desktops
 import pystray
 import threading
-import time
+from concurrent.futures import Future
+from backend import HOTKEY, WindowGoneError, WindowsBackend
+from bundle import bundle_path, read_bundle
+from control import ControlError, ControlServer, control_endpoint, dispatch, parse_settings, select_windows
+from frames import (FrameSource, first_frame, gif_digest, preview_frame, render_frames, scale_frame, scale_frames,
+                    tray_frame, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+from floats import (FloatRecord, FloatRegistry, FloatWidget, PhotoStore, ProgressivePhotos, make_photos,
+                    set_window_attribute, DEFAULT_SIZE, OPACITY_PRESETS, SIZE_PRESETS, SPEED_PRESETS)
+from desktops import DesktopManager
+from drag import WindowMover
+from framecache import FrameCache
+from hotkeys import HotkeyPipeline
+from metrics import Metrics, metrics_enabled
+from notification import NotificationWindow
+from resizer import FrameResizer
+from scheduler import DEFAULT_DURATION, AnimationScheduler
+from state import StateStore, match_windows
+from themes import DEFAULT_THEME_DIR, Theme, ThemeLibrary, scan_themes, theme_budget
+from tray import TrayAnimator
+from visibility import VisibilityTracker
+from windowevents import SharedWindowEvents, WindowWatcher
+
+# How long the imports above took
+IMPORT_MS = (time.perf_counter() - IMPORT_STARTED) * 1000
+
+# With --startup, frames are prepared once login has had this long to settle
+STARTUP_IDLE_MS = 3000
+# Longest a control command waits for the UI thread
+CONTROL_TIMEOUT = 10.0
 
 class GifMinimizer:
-    def __init__(self, root, hwnd=None):
+    def __init__(self, root, hwnd=None, backend=None, defer=False):
         self.root = root
+        self._ui_thread = threading.get_ident()
         self.hwnd = hwnd
+        # All window, desktop and keyboard calls go through the platform backend
+        self.backend = backend if backend is not None else WindowsBackend()
+        # Opt-in timing of the hot paths (WINDOWSFLOAT_METRICS=1); errors are always counted.
+        # show_frame is one animation tick.
+        self.metrics = Metrics(enabled=metrics_enabled())
+        for name in ('load_gif', 'set_size', 'show_frame', 'handle_hotkey', 'monitor_window_state', 'apply_theme'):
+            setattr(self, name, self.metrics.wrap(name, getattr(self, name)))
         self.gif_path = "windowsfloat.gif"
+        self.theme_name = os.path.splitext(os.path.basename(self.gif_path))[0]
         self.speed_multiplier = 1.5
-        self.properties_shown = False
-        self.minimized_windows = {}
-        self.hidden_desktop = None
-        self.original_desktop = None
-        self.target_window = None
-        self.animation_id = None  # Add this to track animation callbacks
-        self.is_dragging = False  # Add this flag
-        self.current_notification = None  # Add this to track active notifications
+        # Parks floated windows on a hidden virtual desktop and brings them back
+        self.desktops = DesktopManager(self.backend, lambda callback: self.root.after(0, callback),
+                                       on_error=lambda e: self.metrics.error('desktops', e))
+        self.checking_windows = set()  # Floats whose window is being looked at on the desktop thread
+        # Floated windows, each with its own float widget
+        self.floats = FloatRegistry()
+        self.menu_float = None  # The float whose menu was opened last
+        self.float_size = DEFAULT_SIZE  # Settings for new floats
+        self.float_opacity = 0.75
+        # One set of PhotoImages per size, shared by every float of that size
+        self.photos = PhotoStore()
+        # The one animation loop for every float; restarting it replaces the previous loop
+        self.animation = AnimationScheduler(
+            self.root.after,
+            self.root.after_cancel,
+            self.show_frame,
+            on_skip=self.drop_frames,
+            on_error=lambda e: self.metrics.error('animation', e)
+        )
+        self.animation.set_speed(self.speed_multiplier)
+        # The loop only runs while a float can be seen; until the first float it is suspended
+        # One window event hook for the visibility tracker and the window watcher
+        self.window_events = SharedWindowEvents(self.backend)
+        self.visibility = VisibilityTracker(
+            self.backend,
+            self.root.after,
+            self.root.after_cancel,
+            self.on_visibility_change,
+            events=self.window_events
+        )
+        self.animation.suspend()
+        self.is_dragging = False  # No hover text while a float is being dragged
+        self.frame_cache = FrameCache()  # Pre-scaled frame sets for each size
+        self.resizer = FrameResizer(lambda callback: self.root.after(0, callback), self.frame_cache)
+        self.pending_sizes = set()  # Sizes being scaled in the background
+        self.refining = {}  # {size: ProgressivePhotos} still showing quick resizes
+        # The GIFs in the themes folder, loaded and scaled in the background before a switch
+        self.themes = ThemeLibrary(
+            scan_themes(DEFAULT_THEME_DIR, self.gif_path),
+            self.frame_cache,
+            lambda callback: self.root.after(0, callback),
+            theme_budget(),
+            on_error=lambda e: self.metrics.error('load_theme', e)
+        )
+        self.theme_request = None  # The theme the user picked last, while it loads
+        # Settings and floated windows survive restarts and crashes
+        self.state = StateStore(self.root.after, self.root.after_cancel, identify=self.backend.window_info)
+        self.saved_state = self.state.load() or {}
+        self.apply_settings(self.saved_state.get('settings', {}))
+        self._frame_source = None  # Opened on first use
+        self._atlas = None  # The bundle mapping the current frames come from, if any
+        self.tray_frames = None
+        self.frames_ready = False
+        # Milliseconds since the imports started, for the metrics
+        self.startup = {'import_ms': IMPORT_MS, 'bundle': False}
+        
+        # Load GIF first; the tray icon and the float share its frames
+        if not self.load_gif():
+            return
+        
+        if not defer:
+            # Decode once for both the tray icon and the size of new floats
+            self.prepare_frames(self.float_size)
         
         # Create system tray icon
         self.setup_tray()
         
-        # Replace the hotkey line with this:
-        keyboard.on_press_key('e', self.check_hotkey, suppress=False)
+        # Watch the floated windows for restores and closes (idle until one is floated)
+        self.window_watcher = WindowWatcher(
+            self.window_events,
+            self.root.after,
+            self.root.after_cancel,
+            self.monitor_window_state
+        )
+        
+        # Float the foreground window on Win+Shift+E; the hook only queues the press
+        self.hotkeys = HotkeyPipeline(self.handle_hotkey, on_error=lambda e: self.metrics.error('handle_hotkey', e))
+        self.hotkeys.start()
+        self.backend.register_hotkey(HOTKEY, self.hotkeys.press)
+        self.startup['hotkey_ready_ms'] = (time.perf_counter() - IMPORT_STARTED) * 1000
         
-        # Initially hide the window until hotkey is pressed
+        # The root window only hosts the floats, menus and notifications
         self.root.withdraw()
         
         # Set window to not appear in taskbar or switcher
-        self.root.wm_attributes("-toolwindow", 1)
+        set_window_attribute(self.root, "-toolwindow", 1)
         self.root.wm_attributes("-topmost", True)
         
-        # Load GIF first to get dimensions
-        if not self.load_gif():
-            return
-            
-        # Then set up the GUI with the correct dimensions
-        self.setup_gui()
-        
-        # Set default settings
-        self.set_opacity(0.75)
-        self.set_size((72, 90))
+        # One notification window, reused for every message
+        self.notification = NotificationWindow(self.root)
         
-        # Start the animation
-        self.animate_gif(0)
+        # Then set up the shared menu
+        self.setup_menu()
         
         # Add drag functionality
         self.setup_drag()
         
-        # Start monitoring window state
-        self.monitor_window_state()
+        if defer:
+            # Decode and scale once login has settled, or at the first float if that comes sooner
+            self.root.after(STARTUP_IDLE_MS, lambda: self.root.after_idle(self.finish_startup))
+        else:
+            self.finish_startup()
         
         self.setup_virtual_desktop()
-
-    def setup_gui(self):
-        # Make the window always on top
-        self.root.attributes('-topmost', True)
         
-        # Remove window decorations
-        self.root.overrideredirect(True)
+        # Float again whatever the last run left parked
+        self.restore_saved_floats()
         
-        # Set transparent background
-        self.root.wm_attributes("-transparentcolor", "white")
+        # Every component reports into the metrics snapshot
+        self.metrics.add_source('animation', self.animation.stats)
+        self.metrics.add_source('visibility', self.visibility.stats)
+        self.metrics.add_source('tray', self.tray_animator.stats)
+        self.metrics.add_source('hotkeys', self.hotkeys.stats)
+        self.metrics.add_source('desktops', self.desktops.stats)
+        self.metrics.add_source('window_watcher', self.window_watcher.stats)
+        self.metrics.add_source('window_events', self.window_events.stats)
+        self.metrics.add_source('frame_cache', self.frame_cache.stats)
+        self.metrics.add_source('resizer', lambda: dict(
+            self.resizer.stats(),
+            refining={f"{w}x{h}": photos.stats() for (w, h), photos in self.refining.items()}
+        ))
+        self.metrics.add_source('themes', self.themes.stats)
+        self.metrics.add_source('state', self.state.stats)
+        self.metrics.add_source('notifications', self.notification.stats)
+        self.metrics.add_source('drag', self.drag_mover.stats)
+        self.metrics.add_source('frame_source', lambda: self._frame_source.stats() if self._frame_source else {})
+        self.metrics.add_source('startup', lambda: self.startup)
+        self.metrics.add_source('floats', lambda: {'count': len(self.floats), 'photo_sets': len(self.photos.sizes())})
         
-        # Create a canvas for the GIF with the correct dimensions
-        self.canvas = tk.Canvas(
-            self.root, 
-            bg='white', 
-            highlightthickness=0, 
-            bd=0,
-            width=self.gif_width,
-            height=self.gif_height
-        )
-        self.canvas.pack()
+        # Optionally serve the metrics on localhost for a Prometheus scraper
+        port = os.environ.get('WINDOWSFLOAT_METRICS_PORT')
+        if port:
+            try:
+                self.metrics.serve(int(port), post=lambda callback: self.root.after(0, callback))
+            except (OSError, ValueError) as e:
+                self.metrics.error('metrics_server', e)
+        
+        # Optionally take commands from scripts on a local socket or pipe (see control.py)
+        self.control = None
+        endpoint = control_endpoint()
+        if endpoint:
+            family, port = endpoint
+            self.control = ControlServer(self.run_control, family, port)
+            try:
+                self.control.start()
+                self.metrics.add_source('control', self.control.stats)
+            except OSError as e:
+                self.metrics.error('control_server', e)
+                self.control = None
+
+    def create_float(self, record):
+        """Create the float widget for a record and wire up its events"""
+        widget = FloatWidget(self.root, record.size, record.opacity)
+        record.widget = widget
         
         # Add hover binding
-        self.canvas.bind("<Enter>", self.on_hover_enter)
-        self.canvas.bind("<Leave>", self.on_hover_leave)
+        widget.canvas.bind("<Enter>", self.on_hover_enter)
+        widget.canvas.bind("<Leave>", self.on_hover_leave)
         
-        # Add right-click menu
-        self.setup_menu()
+        # Bind right-click to show menu
+        widget.canvas.bind("<Button-3>", self.show_menu)
+        widget.window.bind("<Button-1>", self.hide_menu)
+        
+        # Bind mouse events
+        widget.canvas.bind("<ButtonPress-1>", self.start_drag)
+        widget.canvas.bind("<ButtonRelease-1>", self.stop_drag)
+        widget.canvas.bind("<B1-Motion>", self.on_drag)
+        
+        # Add double-click to restore window
+        widget.canvas.bind("<Double-Button-1>", lambda e: self.restore_from_menu(self.floats.for_widget(e.widget)))
+        return widget
 
     def setup_tray(self):
         """Setup system tray icon and menu"""
-        # Load all frames for tray animation
-        self.tray_frames = []
-        with Image.open(self.gif_path) as gif:
-            # Get frame duration (in milliseconds)
-            self.frame_duration = gif.info.get('duration', 100)  # default to 100ms if not specified
-            
-            for frame in ImageSequence.Iterator(gif):
-                # Convert frame to RGBA and resize to larger tray icon size
-                frame = frame.convert('RGBA')
-                frame = frame.resize((32, 32), Image.Resampling.LANCZOS)
-                self.tray_frames.append(frame)
-
-        # Create tray icon menu with just Exit option
-        menu = (
-            pystray.MenuItem("Exit", self.exit_app),
-        )
+        # Create tray icon menu
+        menu = [
+            pystray.MenuItem("Restore All", lambda icon, item: self.root.after(0, self.restore_all)),
+            pystray.MenuItem("Dump Metrics", lambda icon, item: self.root.after(0, self.dump_metrics)),
+        ]
+        if len(self.themes.names()) > 1:
+            menu.append(pystray.MenuItem("Theme", pystray.Menu(*[
+                pystray.MenuItem(name, self._tray_theme_action(name), checked=self._tray_theme_checked(name),
+                                 radio=True)
+                for name in self.themes.names()
+            ])))
+        menu.append(pystray.MenuItem("Exit", lambda icon, item: self.root.after(0, self.exit_app)))
 
+        # Until the whole GIF is decoded the tray shows its first frame
+        frames = self.tray_frames or [tray_frame(first_frame(self.gif_path))]
+        
         # Create tray icon with first frame
         self.tray_icon = pystray.Icon(
             "GifMinimizer",
-            self.tray_frames[0],
+            frames[0],
             "Windows FLoat",
             menu
         )
 
-        # Start animation thread
-        self.tray_animation_running = True
-        self.tray_animation_thread = threading.Thread(target=self.animate_tray_icon)
-        self.tray_animation_thread.daemon = True
-        self.tray_animation_thread.start()
-
         # Run the tray icon detached
         self.tray_icon.run_detached()
 
-    def animate_tray_icon(self):
-        """Animate the tray icon by cycling through frames"""
-        frame_index = 0
-        while self.tray_animation_running:
-            # Update icon with current frame
-            self.tray_icon.icon = self.tray_frames[frame_index]
-            
-            # Move to next frame
-            frame_index = (frame_index + 1) % len(self.tray_frames)
-            
-            # Wait for frame duration
-            time.sleep(self.frame_duration / 1000)  # Convert ms to seconds
+        # Start animation thread; it slows down while the user is away or on battery
+        self.tray_animator = TrayAnimator(
+            self.tray_icon,
+            frames,
+            self.frame_durations or [DEFAULT_DURATION],
+            idle_seconds=self.backend.idle_seconds,
+            on_battery=self.backend.on_battery,
+            low_power_fps=2,
+            on_error=lambda e: self.metrics.error('tray_power_check', e)
+        )
+        self.tray_animator.start()
+
+    def _tray_theme_action(self, name):
+        # pystray counts an action's arguments, so no default-argument lambdas here
+        return lambda icon, item: self.root.after(0, self.set_theme, name)
+
+    def _tray_theme_checked(self, name):
+        return lambda item: self.theme_name == name
 
     def show_window(self, icon=None, item=None):
         """Show the main window from tray"""
@@ -158,12 +291,16 @@ class GifMinimizer:
             command=self.restore_from_menu,
             foreground="#00ff00"
         )
+        self.menu.add_command(
+            label="Float All Windows of This App",
+            command=self.float_process
+        )
         self.menu.add_separator()
         
         # Opacity submenu
         opacity_menu = tk.Menu(self.menu, tearoff=0, bg="#333333", fg="white", 
                           activebackground="#444444", activeforeground="white")
-        for value in [5, 10, 15, 20, 25, 50, 75, 100]:
+        for value in OPACITY_PRESETS:
             opacity_menu.add_command(
                 label=f"{value}%",
                 command=lambda v=value: self.set_opacity(v/100)
@@ -173,7 +310,7 @@ class GifMinimizer:
         # Size submenu
         size_menu = tk.Menu(self.menu, tearoff=0, bg="#333333", fg="white", 
                            activebackground="#444444", activeforeground="white")
-        for size in [(360, 450), (288, 360), (216, 270), (144, 180), (72, 90), (56, 70)]:
+        for size in SIZE_PRESETS:
             size_menu.add_command(
                 label=f"{size[0]}×{size[1]} px",
                 command=lambda s=size: self.set_size(s)
@@ -183,22 +320,35 @@ class GifMinimizer:
         # Speed submenu
         speed_menu = tk.Menu(self.menu, tearoff=0, bg="#333333", fg="white", 
                             activebackground="#444444", activeforeground="white")
-        for speed in [0.25, 0.5, 1, 1.5, 2]:
+        for speed in SPEED_PRESETS:
             speed_menu.add_command(
                 label=f"{speed}x",
                 command=lambda s=speed: self.set_speed(s)
             )
         self.menu.add_cascade(label="Speed", menu=speed_menu)
         
+        # Theme submenu, for every float at once
+        if len(self.themes.names()) > 1:
+            self.theme_var = tk.StringVar(self.root, value=self.theme_name)
+            theme_menu = tk.Menu(self.menu, tearoff=0, bg="#333333", fg="white",
+                                 activebackground="#444444", activeforeground="white")
+            for name in self.themes.names():
+                theme_menu.add_radiobutton(
+                    label=name,
+                    variable=self.theme_var,
+                    value=name,
+                    command=lambda n=name: self.set_theme(n)
+                )
+            self.menu.add_cascade(label="Theme", menu=theme_menu)
+        
         # Add exit option
         self.menu.add_separator()
         self.menu.add_command(label="Exit", command=self.exit_app)
-        
-        # Bind right-click to show menu
-        self.canvas.bind("<Button-3>", self.show_menu)
-        self.root.bind("<Button-1>", self.hide_menu)
 
     def show_menu(self, event):
+        # Menu commands apply to the float that was right-clicked
+        self.menu_float = self.floats.for_widget(event.widget)
+        
         # Show menu at mouse position
         try:
             self.menu.tk_popup(event.x_root, event.y_root)
@@ -209,164 +359,435 @@ class GifMinimizer:
         # Hide the menu
         self.menu.unpost()
 
-    def set_opacity(self, value):
-        # Set window opacity
-        self.root.attributes("-alpha", value)
-
-    def set_size(self, size):
-        # Set window size
-        width, height = size
-        self.root.geometry(f"{width}x{height}")
-        self.canvas.config(width=width, height=height)
-        self.gif_width, self.gif_height = width, height
-        
-        # Resize all frames of the GIF with edge preservation
-        self.resized_frames = []
-        for frame in ImageSequence.Iterator(self.gif):
-            # Ensure the frame is in RGBA mode
-            if frame.mode != 'RGBA':
-                frame = frame.convert('RGBA')
-            
-            # Create a mask from the alpha channel
-            mask = frame.split()[-1]
-            
-            # Resize the image with high-quality downscaling
-            resized_img = frame.resize((width, height), Image.Resampling.LANCZOS)
-            
-            # Resize the mask separately
-            resized_mask = mask.resize((width, height), Image.Resampling.LANCZOS)
-            
-            # Apply the mask to remove any semi-transparent edge pixels
-            resized_img.putalpha(resized_mask.point(lambda p: 255 if p > 128 else 0))
-            
-            # Create new PhotoImage
-            resized_frame = ImageTk.PhotoImage(resized_img)
-            self.resized_frames.append(resized_frame)
-        
-        # Use the resized frames for animation
-        self.frames = self.resized_frames
-        self.animate_gif(0)  # Restart animation with new frames
+    def set_opacity(self, value, record=None):
+        # Set window opacity of the float, or the default for new floats
+        record = record or self.menu_float
+        if record is None:
+            self.float_opacity = value
+        else:
+            record.opacity = value
+            record.widget.set_opacity(value)
+            self.visibility.set_float(record.hwnd, opacity=value)
+        self.save_state()
+
+    def set_size(self, size, record=None):
+        # Resize the float, or set the size of new floats
+        record = record or self.menu_float
+        if record is None:
+            self.float_size = size
+        else:
+            record.pending_size = size
+        self.save_state()
+        
+        # Every float of this size shares the same PhotoImages
+        if self.photos.get(size) is not None:
+            self.apply_frames(size)
+            return
+        if size in self.pending_sizes:
+            return  # Already being scaled; apply_frames picks this float up too
+        
+        # Look up the scaled frames before resizing the whole GIF again
+        key = self.frame_key(size)
+        scaled_frames = self.frame_cache.get(key)
+        if scaled_frames is not None or not self.photos.sizes():
+            if scaled_frames is None:
+                # Nothing to show in the meantime, so resize right away
+                scaled_frames = scale_frames(self.frame_source, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+                self.frame_cache.put(key, scaled_frames)
+            self.apply_frames(size, scaled_frames)
+        elif not self.resize_progressively(size, key):
+            # Keep animating the current frames until the new ones are ready
+            self.scale_in_background(size, key)
+
+    def resize_progressively(self, size, key):
+        """Show size at once with quick resizes of a set already scaled, then refine it in the background
+
+        Returns False if no scaled set is in memory to make the quick
+        versions from.
+        """
+        base = None
+        for other in sorted(self.photos.sizes(), key=lambda s: s[0] * s[1], reverse=True):
+            base = self.frame_cache.peek(self.frame_key(other))
+            if base is not None:
+                break
+        if base is None:
+            return False
+        
+        photos = ProgressivePhotos(size, len(base), lambda index: preview_frame(base[index], size))
+        self.photos.put(size, photos)
+        self.apply_frames(size)
+        
+        # The proper frames come in from the one about to be shown onwards, pasted in when Tk is idle
+        started = time.perf_counter()
+        self.refining[size] = photos
+        
+        def done(frames):
+            # Full quality everywhere; the quick pass and the refine are reported apart
+            self.metrics.observe('resize_preview', photos.preview_ms)
+            self.metrics.observe('resize_refined', (time.perf_counter() - started) * 1000)
+            if self.refining.get(size) is photos:
+                del self.refining[size]
+        
+        def failed(e):
+            # Keep showing the quick frames and have the whole set scaled again the plain way
+            self.metrics.error('resize_refine', e)
+            if self.refining.get(size) is photos:
+                del self.refining[size]
+                self.scale_in_background(size, key)
+        
+        self.resizer.refine(
+            self.frame_source,
+            size,
+            lambda indices, frames: self.root.after_idle(self.paste_refined, photos, indices, frames),
+            done,
+            key=key,
+            start=self.animation.index,
+            on_error=failed,
+            resample=DEFAULT_RESAMPLE,
+            threshold=DEFAULT_THRESHOLD
+        )
+        return True
+
+    def paste_refined(self, photos, indices, frames):
+        for index, frame in zip(indices, frames):
+            photos.refine(index, frame)
+
+    def scale_in_background(self, size, key):
+        """Scale the GIF to size on the resizer; apply_frames swaps the result in"""
+        self.pending_sizes.add(size)
+        self.resizer.resize(
+            self.frame_source,
+            size,
+            lambda frames: self.apply_frames(size, frames),
+            key=key,
+            supersede=False,
+            on_error=lambda e: self.resize_failed(size, e),
+            resample=DEFAULT_RESAMPLE,
+            threshold=DEFAULT_THRESHOLD
+        )
+
+    def resize_failed(self, size, error):
+        """Stop waiting for a background resize that failed, so set_size can try that size again"""
+        self.metrics.error('resize', error)
+        self.pending_sizes.discard(size)
+
+    def apply_frames(self, size, scaled_frames=None):
+        """Swap in the frames for size on every float waiting for it (UI thread only)"""
+        self.pending_sizes.discard(size)
+        if scaled_frames is not None:
+            # Create new PhotoImages
+            self.photos.put(size, make_photos(scaled_frames, size))
+        
+        for record in self.floats:
+            if record.pending_size == size:
+                # Set window size
+                record.size = size
+                record.pending_size = None
+                record.widget.set_size(size)
+        
+        # Drop the frames no float uses any more
+        self.photos.release_unused(self.floats.sizes() | {self.float_size})
+
+    def frame_key(self, size):
+        """Return the frame cache key for the GIF at the given size"""
+        return FrameCache.make_key(self.gif_digest, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+
+    def prepare_frames(self, size):
+        """Build whatever is missing of the tray frames and the float frames for size, in one decode pass
+
+        With the tray set, the durations and the set for size all cached,
+        the GIF isn't decoded at all.
+        """
+        if self.tray_frames is None or self.frame_durations is None:
+            cached = self.frame_cache.get_tray(self.gif_digest)
+            if cached is not None:
+                self.tray_frames, self.frame_durations = cached
+        
+        key = self.frame_key(size)
+        renderers = []
+        if self.tray_frames is None:
+            renderers.append(tray_frame)
+        if self.frame_cache.get(key) is None:
+            renderers.append(lambda frame: scale_frame(frame, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD))
+        built_tray = self.tray_frames is None
+        if renderers:
+            outputs = render_frames(self.frame_source, renderers)
+            if built_tray:
+                self.tray_frames = outputs.pop(0)
+            if outputs:
+                self.frame_cache.put(key, outputs[0])
+        
+        # Held frames are merged as the GIF is decoded, so the schedule is only known after a pass
+        if self.frame_durations is None:
+            self.frame_durations = self.frame_source.durations()
+        if built_tray:
+            self.frame_cache.put_tray(self.gif_digest, self.tray_frames, self.frame_durations)
+
+    @property
+    def frame_source(self):
+        # Opening the GIF counts its frames, which reads the whole file, so wait until it's needed
+        if self._frame_source is None:
+            self._frame_source = FrameSource(self.gif_path)
+        return self._frame_source
 
     def load_gif(self):
         if not os.path.exists(self.gif_path):
+            from tkinter import messagebox
             messagebox.showerror("Error", f"GIF file not found: {self.gif_path}")
             self.root.destroy()
             return False
-            
-        self.gif = Image.open(self.gif_path)
-        self.gif_width, self.gif_height = self.gif.size
-        
-        # Convert frames to PhotoImage
-        self.frames = []
-        for frame in ImageSequence.Iterator(self.gif):
-            if frame.mode != 'RGBA':
-                frame = frame.convert('RGBA')
-            photo = ImageTk.PhotoImage(frame)
-            self.frames.append(photo)
-            
+        
+        # Frames are decoded on demand; set_size builds the ones we display
+        self.gif_digest = gif_digest(self.gif_path)
+        self.frame_durations = None
+        
+        # A bundle built with bundle.py saves decoding anything at startup
+        bundle = read_bundle(bundle_path(self.gif_path), self.gif_digest)
+        if bundle is not None:
+            self.frame_durations = bundle.durations
+            self.tray_frames = bundle.tray_frames
+            for size, frames in bundle.frame_sets.items():
+                self.frame_cache.put(self.frame_key(size), frames, persist=False)
+            if bundle.source is not None:
+                # Scale new sizes from the mapped full-size frames instead of decoding the GIF
+                self._frame_source = bundle.source
+            self._atlas = bundle.atlas
+            self.startup['bundle'] = True
+        
         return True
 
-    def animate_gif(self, frame_num):
-        # Clear previous frame
-        self.canvas.delete("all")
-        
-        # Update the GIF frame with proper transparency
-        self.canvas.create_image(
-            self.gif_width//2, 
-            self.gif_height//2, 
-            image=self.frames[frame_num], 
-            anchor=tk.CENTER
-        )
+    def finish_startup(self):
+        """Prepare the frames for new floats and start the animation (once)"""
+        if self.frames_ready:
+            return
+        self.frames_ready = True
         
-        # Calculate delay based on speed multiplier
-        delay = int(self.gif.info['duration'] / self.speed_multiplier)
+        self.prepare_frames(self.float_size)
+        if self.tray_animator.frames is not self.tray_frames:
+            self.tray_animator.set_frames(self.tray_frames, self.frame_durations)
         
-        # Store the animation ID so we can cancel it later
-        self.animation_id = self.root.after(delay, self.animate_gif, (frame_num + 1) % len(self.frames))
-
-    def minimize_to_gif(self, hwnd):
-        # Minimize the window
-        win32gui.ShowWindow(hwnd, win32con.SW_MINIMIZE)
+        # Prepare the frames for new floats
+        self.set_size(self.float_size)
         
-        # Store the window handle
-        self.minimized_windows[hwnd] = True
+        # Start the animation
+        self.animate_gif(0)
+        self.startup['frames_ready_ms'] = (time.perf_counter() - IMPORT_STARTED) * 1000
+        
+        # Have the next theme ready in case the user switches
+        self.root.after_idle(self.preload_next_theme)
+
+    def theme_sizes(self):
+        """The float sizes a theme must come with to swap in without waiting"""
+        return self.photos.sizes() | self.floats.sizes() | {self.float_size}
+
+    def preload_next_theme(self):
+        if len(self.themes.names()) > 1:
+            self.themes.preload(self.themes.next_name(self.theme_name), self.theme_sizes())
+
+    def set_theme(self, name):
+        """Switch every float and the tray icon to another animation (UI thread only)
+
+        A preloaded theme swaps in at once; otherwise it is loaded and
+        scaled in the background while the current one keeps playing.
+        """
+        self.theme_request = name
+        if hasattr(self, 'theme_var'):
+            self.theme_var.set(name)
+        if name == self.theme_name:
+            return
+        theme = self.themes.get(name)
+        if theme is not None and all(size in theme.frame_sets for size in self.theme_sizes()):
+            self.apply_theme(theme)
+            return
+        self.themes.preload(name, self.theme_sizes(),
+                            lambda theme: self.apply_theme(theme) if self.theme_request == theme.name else None,
+                            lambda e: self.theme_failed(name, e))
+
+    def theme_failed(self, name, error):
+        """Keep the current theme and tell the user the one they picked can't be shown"""
+        if self.theme_request != name:
+            return  # They picked another one meanwhile
+        self.theme_request = self.theme_name
+        if hasattr(self, 'theme_var'):
+            self.theme_var.set(self.theme_name)
+        x, y = self.backend.cursor_pos()
+        self.show_notification(f"Couldn't load theme {name}: {error}", x, y + 20)
+
+    def current_theme(self):
+        """The running animation as a Theme, or None while its frames aren't ready"""
+        if self.frame_durations is None or self.tray_frames is None:
+            return None
+        frame_sets = {}
+        for size in self.theme_sizes():
+            frames = self.frame_cache.get(self.frame_key(size))
+            if frames is not None:
+                frame_sets[size] = frames
+        return Theme(self.theme_name, self.gif_path, self.gif_digest, self.frame_durations, self.tray_frames,
+                     self._frame_source, frame_sets, self._atlas)
 
-    def restore_window(self, hwnd):
-        # Restore the window
-        win32gui.ShowWindow(hwnd, win32con.SW_RESTORE)
+    def apply_theme(self, theme):
+        """Swap a loaded theme into the running animation"""
+        if theme.name == self.theme_name:
+            return
+        self.themes.activate(theme, previous=self.current_theme())
+        
+        # Anything still scaling belongs to the old theme
+        self.resizer.cancel()
+        self.pending_sizes.clear()
+        self.refining.clear()
+        
+        self.theme_name = theme.name
+        self.gif_path = theme.path
+        self.gif_digest = theme.digest
+        self.frame_durations = theme.durations
+        self.tray_frames = theme.tray_frames
+        self._frame_source = theme.source
+        self._atlas = theme.atlas
+        for size, frames in theme.frame_sets.items():
+            self.frame_cache.put(self.frame_key(size), frames, persist=False)
         
-        # Remove from minimized list
-        if hwnd in self.minimized_windows:
-            del self.minimized_windows[hwnd]
+        if not self.frames_ready:
+            # Startup hasn't prepared the old theme yet, so prepare this one instead
+            self.finish_startup()
+            return
+        
+        # New PhotoImages for every size on screen; floats pick them up on the next tick
+        for size in self.photos.sizes():
+            frames = theme.frame_sets.get(size)
+            if frames is not None:
+                self.photos.put(size, make_photos(frames, size))
+            else:
+                self.scale_in_background(size, self.frame_key(size))
+        # Floats whose resize was cancelled above ask again
+        for record in list(self.floats):
+            if record.pending_size is not None and record.pending_size not in self.pending_sizes:
+                self.set_size(record.pending_size, record)
+        self.tray_animator.set_frames(self.tray_frames, self.frame_durations)
+        self.animate_gif(0)
+        self.metrics.count('theme_swaps')
+        self.save_state()
+        
+        # And get the one after it ready
+        self.root.after_idle(self.preload_next_theme)
+
+    def animate_gif(self, frame_num):
+        # (Re)start the animation loop at the given frame
+        self.animation.start(self.frame_durations, frame_num)
+
+    def on_visibility_change(self, visible):
+        # Nothing is scheduled while no float can be seen; it picks up in step when one can
+        if visible:
+            self.animation.unsuspend()
+        else:
+            self.animation.suspend()
+
+    def show_frame(self, frame_num):
+        # Update every float with the same frame of its size
+        for record in self.floats:
+            photos = self.photos.get(record.size)
+            if photos:
+                record.widget.renderer.show(photos[frame_num % len(photos)])
+
+    def drop_frames(self, count):
+        self.metrics.count('frames_dropped', count)
+        for record in self.floats:
+            record.widget.renderer.drop(count)
 
     def setup_drag(self):
         # Variables to store drag start position
-        self._drag_data = {"x": 0, "y": 0, "dragging": False}
-        
-        # Bind mouse events
-        self.canvas.bind("<ButtonPress-1>", self.start_drag)
-        self.canvas.bind("<ButtonRelease-1>", self.stop_drag)
-        self.canvas.bind("<B1-Motion>", self.on_drag)
-        
-        # Add double-click to restore window
-        self.canvas.bind("<Double-Button-1>", lambda e: self.restore_from_menu())
+        self._drag_data = {"x": 0, "y": 0, "dragging": False, "float": None}
+        # Motion events are folded into at most one window move per display frame
+        self.drag_mover = WindowMover(self.root.after, self.root.after_cancel)
 
     def start_drag(self, event):
         """Start dragging the window"""
+        record = self.floats.for_widget(event.widget)
+        if record is None:
+            return
         self.is_dragging = True
-        # Destroy any existing notification when starting to drag
-        self.destroy_notification()
+        # Hide any notification when starting to drag
+        self.hide_notification()
         # Record the start position of the drag
-        self._drag_data["x"] = event.x_root - self.root.winfo_x()
-        self._drag_data["y"] = event.y_root - self.root.winfo_y()
+        window = record.widget.window
+        self._drag_data["x"] = event.x_root - window.winfo_x()
+        self._drag_data["y"] = event.y_root - window.winfo_y()
         self._drag_data["dragging"] = True
+        self._drag_data["float"] = record
+        self.drag_mover.begin(record.widget.move, (record.x, record.y))
 
     def stop_drag(self, event):
         """Stop dragging the window"""
+        record = self._drag_data["float"]
+        if self._drag_data["dragging"] and record is not None:
+            # The release position is where the float ends up
+            self.on_drag(event)
+            self.drag_mover.end()
+            self.save_state()
         self.is_dragging = False
         self._drag_data["dragging"] = False
+        self._drag_data["float"] = None
 
     def on_drag(self, event):
-        if self._drag_data["dragging"]:
+        record = self._drag_data["float"]
+        if self._drag_data["dragging"] and record is not None:
             # Calculate new position
             x = event.x_root - self._drag_data["x"]
             y = event.y_root - self._drag_data["y"]
-            self.root.geometry(f"+{x}+{y}")
+            record.x, record.y = x, y
+            self.drag_mover.request(x, y)
 
     def set_speed(self, multiplier):
         # Adjust animation speed
         self.speed_multiplier = multiplier
+        self.animation.set_speed(multiplier)
+        self.save_state()
 
-    def exit_app(self, icon=None, item=None):
-        """Exit the application cleanly"""
+    def exit_app(self):
+        """Exit the application cleanly (UI thread)"""
         # Stop GIF animation first
-        if hasattr(self, 'animation_id'):
-            try:
-                self.root.after_cancel(self.animation_id)
-                self.animation_id = None
-            except:
-                pass
-
-        # Stop tray animation and wait for thread to finish
-        self.tray_animation_running = False
-        if hasattr(self, 'tray_animation_thread'):
+        self.animation.stop()
+        for hwnd in list(self.visibility.floats):
+            self.visibility.remove_float(hwnd)
+
+        # Stop handling hotkey presses
+        self.hotkeys.stop()
+
+        # Save the floats still parked so the next run brings them back
+        self.save_state()
+        self.state.close()
+
+        # Stop watching the floated windows
+        self.window_watcher.unwatch()
+
+        # Drop any resize or theme load still running in the background
+        self.resizer.shutdown()
+        self.themes.shutdown()
+        self.desktops.shutdown()
+        self.frame_cache.close()  # Finish writing the frame sets already scaled
+
+        # Stop tray animation; the thread wakes up immediately
+        if hasattr(self, 'tray_animator'):
             try:
-                self.tray_animation_thread.join(timeout=1.0)
-            except:
-                pass
+                self.tray_animator.stop()
+            except Exception as e:
+                self.metrics.error('exit.tray_animator', e)
 
         # Stop and remove tray icon
         if hasattr(self, 'tray_icon'):
             try:
                 self.tray_icon.stop()
-            except:
-                pass
+            except Exception as e:
+                self.metrics.error('exit.tray_icon', e)
+
+        self.metrics.close()
+        if self.control is not None:
+            self.control.close()
 
         try:
             # Stop any pending Tkinter events
             self.root.after_idle(self._destroy_app)
-        except:
-            pass
+        except Exception as e:
+            self.metrics.error('exit.after_idle', e)
 
     def _destroy_app(self):
         """Helper method to destroy the app after all animations are stopped"""
@@ -382,254 +803,443 @@ class GifMinimizer:
             # Force exit the program
             import sys
             sys.exit(0)
-        except:
-            pass
-
-    def show_properties(self, text):
-        if not self.properties_shown:
-            self.canvas.create_text(
-                self.gif_width//2, 
-                self.gif_height//2, 
-                text=text, 
-                fill="white", 
-                font=("Arial", 8),
-                tags="properties"
+        except Exception as e:
+            self.metrics.error('exit.destroy', e)
+
+    def show_properties(self, text, record=None):
+        record = record or self.menu_float
+        if record is not None:
+            record.widget.renderer.add_text(
+                "properties",
+                text,
+                fill="white",
+                font=("Arial", 8)
             )
-            self.properties_shown = True
-
-    def hide_properties(self):
-        self.canvas.delete("properties")
-        self.properties_shown = False
-        self.animate_gif(0)  # Restart animation
-
-    def restore_from_menu(self):
-        if self.target_window is not None:
-            # Move window back to original desktop
-            app_view = AppView(self.target_window)
-            app_view.move(self.original_desktop)
-            
-            # Bring it to the foreground
-            win32gui.SetForegroundWindow(self.target_window)
-            
-            # Hide the GIF window
-            self.root.withdraw()
-            
-            # Clear the handle
-            self.target_window = None
 
-    def handle_hotkey(self):
+    def hide_properties(self, record=None):
+        # The animation keeps running underneath the overlay
+        record = record or self.menu_float
+        if record is not None:
+            record.widget.renderer.remove("properties")
+
+    def restore_from_menu(self, record=None):
+        record = record or self.menu_float
+        if record is not None:
+            self.restore_floats([record], focus=record)
+
+    def dump_metrics(self):
+        """Append a metrics snapshot to the metrics file and say where it went"""
+        try:
+            path = self.metrics.write_jsonl()
+        except OSError as e:
+            self.metrics.error('dump_metrics', e)
+            return
+        x, y = self.backend.cursor_pos()
+        self.show_notification(f"Metrics saved to {path}", x, y + 20)
+
+    def restore_all(self):
+        """Bring every floated window back, focusing the most recent one"""
+        self.restore_floats(list(self.floats), focus=self.floats.latest())
+
+    def restore_floats(self, records, focus=None):
+        # Move the windows back to the original desktop in one go and focus one of them
+        self.desktops.restore(
+            [record.hwnd for record in records],
+            focus=focus.hwnd if focus is not None else None,
+            on_done=lambda moved: self.finish_restore(records, moved)
+        )
+
+    def finish_restore(self, records, moved):
+        """Drop the floats of the windows that moved back"""
+        moved = set(moved)
+        for record in records:
+            if self.floats.get(record.hwnd) is not record:
+                continue  # Removed while its window was moving
+            if record.hwnd in moved:
+                self.remove_float(record)
+            else:
+                # Closed windows lose their float; anything else stays floated
+                self.monitor_window_state(record.hwnd)
+
+    def float_process(self, record=None):
+        """Float every other window of the app behind a float, fanned out below it"""
+        record = record or self.menu_float
+        if record is not None:
+            threading.Thread(
+                target=self._float_process,
+                args=(record.hwnd, record.x, record.y),
+                daemon=True
+            ).start()
+
+    def _float_process(self, hwnd, x, y):
+        # Runs off the UI thread; the desktop moves happen as one batch
+        hwnds = [h for h in self.desktops.windows_of_process(hwnd) if h not in self.floats]
+        for i, moved in enumerate(self.desktops.park(hwnds), 1):
+            self.root.after(0, self._show_gif_window, x + 24 * i, y + 24 * i, moved)
+
+    def call_ui(self, fn, *args):
+        """Run fn on the UI thread and return its result; waits when called from another thread"""
+        if threading.get_ident() == self._ui_thread:
+            return fn(*args)
+        future = Future()
+
+        def run():
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args))
+                except Exception as e:
+                    future.set_exception(e)
+
+        self.root.after(0, run)
+        try:
+            return future.result(CONTROL_TIMEOUT)
+        finally:
+            future.cancel()  # Too late: don't run it at all
+
+    def run_control(self, commands):
+        # Runs on a control connection thread; see control.py for the commands
+        return dispatch(commands, {
+            'float': self._control_float,
+            'restore': self._control_restore,
+            'restore_all': self._control_restore_all,
+            'set': lambda commands: [self.call_ui(self._control_set, commands[0])],
+            'query': lambda commands: [{'ok': True, 'state': self.call_ui(self._control_query)}],
+        })
+
+    def _control_float(self, commands):
+        # One enumeration resolves every title and process, one park() moves every window
+        windows = self.desktops.windows() if any('hwnd' not in c for c in commands) else []
+        titles = {w.hwnd: w.title for w in windows}
+        claimed = set()
+        targets = []
+        for command in commands:
+            try:
+                hwnds = [h for h in select_windows(command, windows) if h not in claimed and h not in self.floats]
+            except ControlError as e:
+                hwnds = e
+            else:
+                claimed.update(hwnds)
+            targets.append(hwnds)
+        moved = set(self.desktops.park(list(claimed)))
+        
+        # Fan the new floats out from the cursor, or from the position asked for
+        cursor = self.backend.cursor_pos()
+        results = []
+        shown = []
+        for command, hwnds in zip(commands, targets):
+            if isinstance(hwnds, Exception):
+                results.append({'ok': False, 'error': str(hwnds)})
+                continue
+            floated = [h for h in hwnds if h in moved]
+            for i, hwnd in enumerate(floated):
+                if 'x' in command or 'y' in command:
+                    x, y = command.get('x', cursor[0]) + 24 * i, command.get('y', cursor[1]) + 24 * i
+                else:
+                    x, y = cursor[0] + 24 * len(shown), cursor[1] + 24 * len(shown)
+                shown.append((hwnd, titles[hwnd] if hwnd in titles else self.backend.window_title(hwnd), x, y))
+            results.append({'ok': True, 'floated': floated} if floated else {'ok': False, 'error': 'no window floated'})
+        if shown:
+            self.call_ui(self._show_floats, shown)
+        return results
+
+    def _show_floats(self, floats):
+        for hwnd, title, x, y in floats:
+            if hwnd not in self.floats:
+                self.add_float(FloatRecord(hwnd, title, x, y, self.float_size, self.float_opacity))
+
+    def _control_restore(self, commands):
+        # Titles and processes are looked up in one enumeration; the restores are one desktop pass,
+        # waited for here rather than on the UI thread
+        windows = self.desktops.windows() if any('hwnd' not in c for c in commands) else []
+        selected, records = self.call_ui(self._select_floats, commands, windows)
+        moved = set(self.desktops.restore([record.hwnd for record in records])) if records else set()
+        self.call_ui(self.finish_restore, records, moved)
+        results = []
+        for hwnds in selected:
+            if isinstance(hwnds, Exception):
+                results.append({'ok': False, 'error': str(hwnds)})
+            elif not hwnds:
+                results.append({'ok': False, 'error': 'no float matched'})
+            else:
+                restored = [h for h in hwnds if h in moved]
+                results.append({'ok': len(restored) == len(hwnds), 'restored': restored})
+        return results
+
+    def _select_floats(self, commands, windows):
+        windows = [w for w in windows if w.hwnd in self.floats]
+        selected = []
+        for command in commands:
+            try:
+                selected.append([h for h in select_windows(command, windows) if h in self.floats])
+            except ControlError as e:
+                selected.append(e)
+        hwnds = {h for hwnds in selected if not isinstance(hwnds, Exception) for h in hwnds}
+        return selected, [self.floats.get(h) for h in hwnds]
+
+    def _control_restore_all(self, commands):
+        records, focus = self.call_ui(lambda: (list(self.floats), self.floats.latest()))
+        moved = set(self.desktops.restore([record.hwnd for record in records],
+                                          focus=focus.hwnd if focus is not None else None))
+        self.call_ui(self.finish_restore, records, moved)
+        return [{'ok': True, 'restored': [record.hwnd for record in records if record.hwnd in moved]}]
+
+    def _control_set(self, command):
+        # With an hwnd only that float changes, otherwise every float and the default for new ones
+        size, opacity, speed = parse_settings(command, (self.root.winfo_screenwidth(), self.root.winfo_screenheight()))
+        if 'hwnd' in command:
+            record = self.floats.get(command['hwnd'])
+            if record is None:
+                return {'ok': False, 'error': 'no float for that hwnd'}
+            records = [record]
+        else:
+            records = list(self.floats)
+            if size is not None:
+                self.float_size = size
+            if opacity is not None:
+                self.float_opacity = opacity
+        if speed is not None:
+            self.set_speed(speed)
+        for record in records:
+            if opacity is not None:
+                self.set_opacity(opacity, record)
+            if size is not None:
+                self.set_size(size, record)
+        self.save_state()
+        return {'ok': True}
+
+    def _control_query(self):
+        return dict(self.state_snapshot(), visibility=self.visibility.state, frames_ready=bool(self.photos.sizes()))
+
+    def remove_float(self, record):
+        """Destroy a float and forget its window"""
+        self.floats.remove(record.hwnd)
+        self.visibility.remove_float(record.hwnd)
+        if self._drag_data["float"] is record:
+            # Gone mid-drag, so there is nothing left to move
+            self.drag_mover.cancel()
+            self._drag_data["float"] = None
+            self.stop_drag(None)
+        self.window_watcher.unwatch(record.hwnd)
+        self.desktops.forget(record.hwnd)
+        record.widget.destroy()
+        if self.menu_float is record:
+            self.menu_float = None
+        self.photos.release_unused(self.floats.sizes() | {self.float_size})
+        self.save_state()
+
+    def handle_hotkey(self, pressed_at=None):
+        # Runs on the hotkey worker thread
         # Get the currently active window
-        hwnd = win32gui.GetForegroundWindow()
-        if not hwnd:
+        hwnd = self.backend.foreground_window()
+        if not hwnd or hwnd in self.floats:
             return
         
         # Get mouse position
-        cursor_pos = win32gui.GetCursorPos()
+        cursor_pos = self.backend.cursor_pos()
         x, y = cursor_pos[0], cursor_pos[1]
         
-        # If there's already a hidden window, restore it first
-        if self.target_window is not None:
-            try:
-                # Move the previously hidden window back
-                old_app_view = AppView(self.target_window)
-                old_app_view.move(self.original_desktop)
-                
-                # Try to bring it to the foreground
-                try:
-                    win32gui.ShowWindow(self.target_window, win32con.SW_RESTORE)
-                    win32gui.SetForegroundWindow(self.target_window)
-                except:
-                    pass  # Ignore if window can't be brought to foreground
-            except:
-                pass  # Ignore if old window is no longer valid
-        
-        # Store the new window handle
-        self.target_window = hwnd
-        
-        try:
-            # Move new window to hidden desktop
-            app_view = AppView(hwnd)
-            app_view.move(self.hidden_desktop)
-            
+        # Move new window to hidden desktop; if it can't be moved, leave it alone
+        if self.desktops.park([hwnd]):
             # Schedule the Tkinter operations to run in the main thread
-            self.root.after(0, self._show_gif_window, x, y, hwnd)
-        except:
-            # If we can't hide the new window, clear the target
-            self.target_window = None
+            self.root.after(0, self._show_gif_window, x, y, hwnd, pressed_at)
 
-    def monitor_window_state(self):
-        if self.target_window is not None:
-            try:
-                # Check if window exists and is visible on current desktop
-                if win32gui.IsWindowVisible(self.target_window) and VirtualDesktop.current() == self.original_desktop:
-                    # Hide the floating window
-                    self.root.withdraw()
-                    self.target_window = None
-            except win32gui.error:
-                # Window was closed
-                self.root.withdraw()
-                self.target_window = None
-        
-        # Check every 500ms
-        self.root.after(500, self.monitor_window_state)
-
-    def _show_gif_window(self, x, y, hwnd):
-        # Show our GIF window at the same position
-        self.root.deiconify()
-        self.root.geometry(f"+{x}+{y}")
-        
-        # Store the window handle
-        self.hwnd = hwnd
-        
+    def monitor_window_state(self, hwnd):
+        """Remove the float once its window is back or closed; returns True when done watching"""
+        record = self.floats.get(hwnd)
+        if record is None:
+            return True
+        if hwnd not in self.checking_windows:
+            # Check if window exists and is visible on current desktop; the answer comes back through root.after
+            self.checking_windows.add(hwnd)
+            self.desktops.window_back(
+                hwnd,
+                on_done=lambda back: self._window_checked(record, back),
+                on_error=lambda e: self._window_checked(record, e)
+            )
+        return False
+
+    def _window_checked(self, record, back):
+        self.checking_windows.discard(record.hwnd)
+        if isinstance(back, Exception):
+            if not isinstance(back, WindowGoneError):
+                self.metrics.error('monitor_window_state', back)
+                return
+            back = True  # Window was closed
+        if back and self.floats.get(record.hwnd) is record:
+            # Hide the floating window; removing it stops watching the window
+            self.remove_float(record)
+
+    def _show_gif_window(self, x, y, hwnd, pressed_at=None):
         # Get window title
-        window_title = win32gui.GetWindowText(hwnd)
+        window_title = self.backend.window_title(hwnd)
+        
+        # Show a new float at the cursor position
+        self.add_float(FloatRecord(hwnd, window_title, x, y, self.float_size, self.float_opacity))
         
         # Create and show notification window
         self.show_notification(f"{window_title} floated", x, y + 20)  # 20 pixels below cursor
-        
-        # Load GIF and setup if not already done
-        if not hasattr(self, 'frames'):
-            if not self.load_gif():
-                return
-            self.setup_gui()
-            self.set_opacity(0.75)
-            self.set_size((72, 90))
-            self.animate_gif(0)
-            self.setup_drag()
-            
-            # Add hover binding
-            self.canvas.bind("<Enter>", self.on_hover_enter)
-            self.canvas.bind("<Leave>", self.on_hover_leave)
+        self.hotkeys.record_float(pressed_at)
 
-    def show_notification(self, text, x, y):
-        """Show a temporary notification window"""
-        # Destroy any existing notification first
-        if self.current_notification and self.current_notification.winfo_exists():
-            self.current_notification.destroy()
-        
-        notification = tk.Toplevel(self.root)
-        notification.overrideredirect(True)
-        notification.attributes('-topmost', True)
-        notification.configure(bg='#333333')
-        
-        # Create label with padding
-        label = tk.Label(
-            notification,
-            text=text,
-            fg='white',
-            bg='#333333',
-            padx=10,
-            pady=5,
-            font=('Arial', 9)
-        )
-        label.pack()
+    def add_float(self, record):
+        """Show the float of a parked window and start watching the window"""
+        # A float before the startup idle slot needs its frames now
+        self.finish_startup()
         
-        # Position the notification
-        notification.geometry(f"+{x}+{y}")
+        self.floats.add(record)
+        self.create_float(record)
+        record.widget.show(record.x, record.y)
         
-        # Store current notification
-        self.current_notification = notification
+        # Make sure its frames exist
+        if self.photos.get(record.size) is None:
+            self.set_size(record.size, record)
         
-        # Auto-destroy after 2 seconds
-        self.root.after(2000, self.destroy_notification)
+        # Store the window handle
+        self.hwnd = record.hwnd
+        self.tray_animator.poke()
+        self.visibility.set_float(record.hwnd, opacity=record.opacity)
+        self.window_watcher.watch(record.hwnd)
+        self.save_state()
+        return record
+
+    def show_notification(self, text, x, y):
+        """Show a temporary notification, replacing any that is showing"""
+        self.notification.show(text, x, y)
 
-    def destroy_notification(self):
-        """Safely destroy the current notification"""
-        if self.current_notification and self.current_notification.winfo_exists():
-            self.current_notification.destroy()
-            self.current_notification = None
+    def hide_notification(self):
+        self.notification.hide()
 
     def on_hover_enter(self, event=None):
         """Show floating window info on hover"""
-        if self.target_window and not self.is_dragging:
+        record = self.floats.for_widget(event.widget) if event is not None else None
+        if record is not None and not self.is_dragging:
             try:
-                window_title = win32gui.GetWindowText(self.target_window)
+                window_title = self.backend.window_title(record.hwnd)
                 
                 # Get float window position and size
-                x = self.root.winfo_x()
-                y = self.root.winfo_y()
-                float_width = self.root.winfo_width()
-                float_height = self.root.winfo_height()
+                window = record.widget.window
+                x = window.winfo_x()
+                y = window.winfo_y()
+                float_width = window.winfo_width()
+                float_height = window.winfo_height()
                 
                 # Get screen dimensions
                 screen_width = self.root.winfo_screenwidth()
                 screen_height = self.root.winfo_screenheight()
                 
+                # Measure the notification rather than guessing its size
+                text = f"Float - {window_title}"
+                width, height = self.notification.measure(text)
+                
                 # Calculate notification position
                 # Try positions in this order: above, below, right, left
                 positions = [
-                    (x, y - 30),  # above
+                    (x, y - height - 5),  # above
                     (x, y + float_height + 5),  # below
                     (x + float_width + 5, y),  # right
-                    (x - 200, y)  # left (assuming ~200px notification width)
+                    (x - width - 5, y)  # left
                 ]
                 
                 # Find first position that fits on screen
                 for nx, ny in positions:
-                    if (0 <= nx <= screen_width - 200 and  # 200px is approximate notification width
-                        0 <= ny <= screen_height - 30):    # 30px is approximate notification height
-                        self.show_notification(f"Float - {window_title}", nx, ny)
+                    if (0 <= nx <= screen_width - width and
+                        0 <= ny <= screen_height - height):
+                        self.show_notification(text, nx, ny)
                         break
                 else:
                     # If no position works, default to mouse cursor position
-                    cursor_pos = win32gui.GetCursorPos()
-                    self.show_notification(f"Float - {window_title}", cursor_pos[0], cursor_pos[1])
+                    cursor_pos = self.backend.cursor_pos()
+                    self.show_notification(text, cursor_pos[0], cursor_pos[1])
                     
-            except:
-                pass
+            except Exception as e:
+                self.metrics.error('hover', e)
 
     def on_hover_leave(self, event=None):
         """Clean up any hover-related displays"""
-        # The notification will auto-destroy itself
+        # The notification hides itself when its timer runs out
         pass
 
     def setup_virtual_desktop(self):
         """Setup virtual desktop for hiding windows"""
-        # Get current desktop
-        self.original_desktop = VirtualDesktop.current()
-        
-        # Create new desktop for hiding windows
-        desktops = get_virtual_desktops()
-        if len(desktops) == 1:
-            self.hidden_desktop = VirtualDesktop.create()
-        else:
-            # Use the second desktop if it exists
-            self.hidden_desktop = desktops[1]
-
-    def hide_target_window(self):
-        """Hide the target window by moving it to another virtual desktop"""
-        # Find the target window
-        self.target_window = win32gui.FindWindow(None, self.target_window_title)
-        if self.target_window:
-            # Create AppView for the window
-            app_view = AppView(self.target_window)
-            # Move it to hidden desktop
-            app_view.move(self.hidden_desktop)
-
-    def show_target_window(self):
-        """Show the target window by moving it back to the original desktop"""
-        if self.target_window:
-            app_view = AppView(self.target_window)
-            app_view.move(self.original_desktop)
-            # Bring window to front
-            win32gui.SetForegroundWindow(self.target_window)
-
-    def on_double_click(self, event):
-        """Handle double click event"""
-        # ... existing code ...
-        self.show_target_window()
-
-    def create_window(self):
-        # ... existing code ...
-        # After creating the window, hide the target
-        self.hide_target_window()
-
-    def check_hotkey(self, e):
-        """Check if Win+Shift+E is pressed"""
-        if keyboard.is_pressed('windows') and keyboard.is_pressed('shift'):
-            self.handle_hotkey()
+        # Remember the current desktop and pick or create the hidden one, the same as last time if possible
+        self.desktops.setup(self.saved_state.get('hidden_desktop'))
+
+    def apply_settings(self, settings):
+        """Restore the saved settings for new floats, the speed and the theme (before the GIF is loaded)"""
+        try:
+            if settings.get('float_size'):
+                width, height = settings['float_size']
+                self.float_size = (int(width), int(height))
+            self.float_opacity = float(settings.get('float_opacity', self.float_opacity))
+            self.speed_multiplier = float(settings.get('speed', self.speed_multiplier))
+        except (TypeError, ValueError):
+            pass  # Hand-edited or from an older version; keep the defaults
+        self.animation.set_speed(self.speed_multiplier)
+        theme = settings.get('theme')
+        if theme in self.themes.paths and os.path.exists(self.themes.paths[theme]):
+            self.theme_name = theme
+            self.gif_path = self.themes.paths[theme]
+
+    def state_snapshot(self):
+        """Everything needed to pick up where we left off, as plain JSON data"""
+        return {
+            'settings': {
+                'float_size': list(self.float_size),
+                'float_opacity': self.float_opacity,
+                'speed': self.speed_multiplier,
+                'theme': self.theme_name,
+            },
+            'hidden_desktop': self.desktops.hidden_id,
+            'floats': [
+                {
+                    'hwnd': record.hwnd,
+                    'title': record.title,
+                    # Filled in by the state writer when not known yet
+                    'process': record.identity[0] if record.identity else None,
+                    'class_name': record.identity[1] if record.identity else None,
+                    'x': record.x,
+                    'y': record.y,
+                    'size': list(record.pending_size or record.size),
+                    'opacity': record.opacity,
+                }
+                for record in self.floats
+            ],
+        }
+
+    def save_state(self):
+        """Have the current state written out once changes settle"""
+        self.state.save(self.state_snapshot())
+
+    def restore_saved_floats(self):
+        """Float the windows a previous run left parked, e.g. after a crash"""
+        saved = self.saved_state.get('floats')
+        if saved:
+            threading.Thread(target=self._reconcile_floats, args=(saved,), daemon=True).start()
+
+    def _reconcile_floats(self, saved):
+        # Runs off the UI thread; one enumeration matches every saved float
+        try:
+            matches = match_windows(saved, self.desktops.windows())
+        except Exception as e:
+            self.metrics.error('reconcile_floats', e)
+            return
+        self.metrics.count('floats_reconciled', len(matches))
+        for entry, window in matches:
+            self.root.after(0, self._restore_saved_float, entry, window)
+
+    def _restore_saved_float(self, entry, window):
+        if window.hwnd in self.floats:
+            return
+        try:
+            record = FloatRecord(window.hwnd, window.title, int(entry['x']), int(entry['y']),
+                                 tuple(entry['size']), float(entry['opacity']))
+        except (KeyError, TypeError, ValueError):
+            return
+        record.identity = (window.process, window.class_name)
+        self.add_float(record)
+
 
 if __name__ == "__main__":
     root = tk.Tk()
-    app = GifMinimizer(root)
+    # From the startup folder: arm the hotkey and tray first and prepare the frames once things settle
+    app = GifMinimizer(root, defer="--startup" in sys.argv[1:])
     root.mainloop() 
\ No newline at end of file
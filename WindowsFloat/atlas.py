@@ -0,0 +1,219 @@
+"""Frame atlases: sets of RGBA frames in one file, memory-mapped and read without copying
+
+Layout:
+
+    header  <4sIQQ: magic, version, index offset, index length
+    tiles   each frame's raw RGBA rows, or a zlib blob of them
+    index   JSON: metadata, and per set its kind, size, compression and
+            the offset and length of every frame
+
+The index comes last so tiles can be written while a GIF is still being
+decoded. Raw frames are wrapped straight around the mapping, so only the
+pages of frames actually used are ever read in, and the OS can drop them
+again under memory pressure.
+"""
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+
+from PIL import Image
+
+ATLAS_MAGIC = b'WFA1'
+ATLAS_VERSION = 1
+ATLAS_HEADER = struct.Struct('<4sIQQ')
+COMPRESSIONS = ('raw', 'zlib')
+
+
+class AtlasError(Exception):
+    """The file is not a usable frame atlas"""
+
+
+class AtlasWriter:
+    """Writes an atlas; frames of different sets may be added in any order"""
+
+    def __init__(self, path, metadata=None, zlib_level=1):
+        self.path = path
+        self.metadata = dict(metadata or {})
+        self.zlib_level = zlib_level
+        self._sets = []
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, 'wb')
+        self._file.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, 0, 0))
+
+    def add_set(self, kind, size, compression='raw'):
+        """Start a frame set; returns its id for add_frame()"""
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"unknown compression: {compression}")
+        self._sets.append({
+            'kind': kind, 'width': size[0], 'height': size[1],
+            'compression': compression, 'frames': []
+        })
+        return len(self._sets) - 1
+
+    def add_frame(self, set_id, frame):
+        entry = self._sets[set_id]
+        if frame.size != (entry['width'], entry['height']):
+            raise ValueError(f"frame is {frame.size}, set is {entry['width']}x{entry['height']}")
+        data = frame.convert('RGBA').tobytes() if frame.mode != 'RGBA' else frame.tobytes()
+        if entry['compression'] == 'zlib':
+            data = zlib.compress(data, self.zlib_level)
+        entry['frames'].append((self._file.tell(), len(data)))
+        self._file.write(data)
+
+    def repeat_frame(self, set_id, position):
+        """Add a frame showing the same bytes as the set's frame at position, without writing them again"""
+        entry = self._sets[set_id]
+        entry['frames'].append(entry['frames'][position])
+
+    def add_frames(self, set_id, frames):
+        """Add frames in order; an image that appears more than once is stored once"""
+        written = {}
+        for frame in frames:
+            position = written.get(id(frame))
+            if position is None:
+                written[id(frame)] = len(self._sets[set_id]['frames'])
+                self.add_frame(set_id, frame)
+            else:
+                self.repeat_frame(set_id, position)
+
+    def close(self):
+        """Write the index and move the finished file into place"""
+        index_offset = self._file.tell()
+        encoded = json.dumps({'metadata': self.metadata, 'sets': self._sets}).encode('utf-8')
+        self._file.write(encoded)
+        self._file.seek(0)
+        self._file.write(ATLAS_HEADER.pack(ATLAS_MAGIC, ATLAS_VERSION, index_offset, len(encoded)))
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self._tmp_path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, kind, value, traceback):
+        if kind is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class AtlasFrames:
+    """One frame set of an atlas; behaves like a read-only list of RGBA images
+
+    Raw frames share memory with the mapping; zlib frames are inflated on
+    every access.
+    """
+
+    def __init__(self, atlas, entry):
+        self.atlas = atlas
+        self.kind = entry['kind']
+        self.size = (entry['width'], entry['height'])
+        self.compression = entry['compression']
+        self._frames = entry['frames']
+        self.frame_bytes = self.size[0] * self.size[1] * 4
+
+        # Stats
+        self.reads = 0
+
+    @property
+    def nbytes(self):
+        """Size of the whole set once decoded"""
+        return self.frame_bytes * len(self._frames)
+
+    def __len__(self):
+        return len(self._frames)
+
+    def __iter__(self):
+        for index in range(len(self._frames)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        offset, length = self._frames[index]
+        self.reads += 1
+        view = self.atlas.view
+        if view is None:
+            raise AtlasError(f"{self.atlas.path} is closed")
+        data = view[offset:offset + length]
+        if self.compression == 'zlib':
+            data = zlib.decompress(data)
+        if len(data) != self.frame_bytes:
+            raise AtlasError(f"frame {index} of {self.kind} is damaged")
+        return Image.frombuffer('RGBA', self.size, data, 'raw', 'RGBA', 0, 1)
+
+    def durations(self):
+        return list(self.atlas.metadata.get('durations') or [])
+
+    def close(self):
+        pass  # The atlas owns the mapping; see FrameAtlas.close
+
+    def stats(self):
+        return {
+            'frames': len(self._frames),
+            'reads': self.reads,
+            'bytes': self.nbytes,
+            'compression': self.compression,
+        }
+
+
+class FrameAtlas:
+    """A memory-mapped atlas file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise AtlasError("empty file")
+        self.view = memoryview(self._map)
+        self._lock = threading.Lock()
+        try:
+            magic, version, index_offset, index_length = ATLAS_HEADER.unpack_from(self.view)
+            if magic != ATLAS_MAGIC or version != ATLAS_VERSION:
+                raise AtlasError("not a frame atlas")
+            if index_offset + index_length > len(self.view):
+                raise AtlasError("truncated")
+            index = json.loads(bytes(self.view[index_offset:index_offset + index_length]).decode('utf-8'))
+            self.metadata = index.get('metadata', {})
+            self.sets = [AtlasFrames(self, entry) for entry in index['sets']]
+            for frames in self.sets:
+                for offset, length in frames._frames:
+                    if offset + length > index_offset:
+                        raise AtlasError("frame outside the tile area")
+        except (struct.error, ValueError, KeyError, TypeError, AttributeError) as e:
+            self.close()
+            raise AtlasError(str(e))
+        except AtlasError:
+            self.close()
+            raise
+
+    def get(self, kind, size=None):
+        """Return the first set of a kind (and size), or None"""
+        for frames in self.sets:
+            if frames.kind == kind and (size is None or frames.size == tuple(size)):
+                return frames
+        return None
+
+    def sizes(self, kind):
+        return [frames.size for frames in self.sets if frames.kind == kind]
+
+    def close(self):
+        """Unmap the file; frames still in use keep it mapped until they are gone"""
+        with self._lock:
+            if self._map is None:
+                return
+            try:
+                self.view.release()
+                self._map.close()
+            except BufferError:
+                pass  # Images still point into the mapping; it goes with the last of them
+            self.view = self._map = None
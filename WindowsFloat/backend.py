@@ -0,0 +1,494 @@
+import itertools
+import threading
+import time
+from collections import namedtuple, Counter
+
+# The Win+Shift+E chord that floats the foreground window
+HOTKEY = ('windows', 'shift', 'e')
+
+WindowInfo = namedtuple('WindowInfo', 'hwnd title class_name process')
+
+
+class WindowGoneError(Exception):
+    """The window handle no longer refers to a live window"""
+
+
+class PlatformBackend:
+    """Everything GifMinimizer needs from the OS: windows, virtual desktops, cursor and hotkeys"""
+
+    # Windows
+    def enum_windows(self):
+        """Return a WindowInfo for every top-level window"""
+        raise NotImplementedError
+
+    def window_info(self, hwnd):
+        """Return the WindowInfo of one window; raise WindowGoneError if it was closed"""
+        for window in self.enum_windows():
+            if window.hwnd == hwnd:
+                return window
+        raise WindowGoneError(hwnd)
+
+    def window_title(self, hwnd):
+        raise NotImplementedError
+
+    def foreground_window(self):
+        raise NotImplementedError
+
+    def set_foreground(self, hwnd):
+        raise NotImplementedError
+
+    def restore_window(self, hwnd):
+        raise NotImplementedError
+
+    def minimize_window(self, hwnd):
+        raise NotImplementedError
+
+    def is_window_visible(self, hwnd):
+        """Return True if the window is visible; raise WindowGoneError if it was closed"""
+        raise NotImplementedError
+
+    def find_window(self, title):
+        raise NotImplementedError
+
+    # Virtual desktops
+    def current_desktop(self):
+        raise NotImplementedError
+
+    def desktops(self):
+        raise NotImplementedError
+
+    def create_desktop(self):
+        raise NotImplementedError
+
+    def move_to_desktop(self, hwnd, desktop):
+        raise NotImplementedError
+
+    def window_view(self, hwnd):
+        """Return a handle that moves one window between desktops (pyvda's AppView)
+
+        Worth caching when the same window is moved more than once.
+        """
+        return hwnd
+
+    def move_view(self, view, desktop):
+        self.move_to_desktop(view, desktop)
+
+    def desktop_id(self, desktop):
+        """Return a stable, comparable identity for a desktop"""
+        return desktop
+
+    # Input
+    def cursor_pos(self):
+        raise NotImplementedError
+
+    def register_hotkey(self, keys, callback):
+        """Call callback() whenever the key chord is pressed"""
+        raise NotImplementedError
+
+    def subscribe_window_events(self, callback):
+        """Call callback(event, hwnd) on window destroy/show/cloak and foreground changes
+
+        Returns a function that unsubscribes, or None if the backend can't
+        deliver events (callers then have to poll). callback may run on any thread.
+        """
+        return None
+
+    def idle_seconds(self):
+        """Return seconds since the last keyboard or mouse input"""
+        return 0.0
+
+    def on_battery(self):
+        """Return True if the machine is running on battery power"""
+        return False
+
+    def user_presence(self):
+        """Return 'present', 'fullscreen' (an app covers the desktop) or 'away' (locked or screen saver)"""
+        return 'present'
+
+
+class WindowsBackend(PlatformBackend):
+    """The real thing: pywin32, pyvda and keyboard"""
+
+    def __init__(self):
+        import keyboard
+        import win32api
+        import win32con
+        import win32gui
+        import win32process
+        self.keyboard = keyboard
+        self._pyvda = None
+        self.win32api = win32api
+        self.win32con = win32con
+        self.win32gui = win32gui
+        self.win32process = win32process
+
+    @property
+    def pyvda(self):
+        # pyvda pulls in comtypes, which is slow to import; only desktop calls need it
+        if self._pyvda is None:
+            import pyvda
+            self._pyvda = pyvda
+        return self._pyvda
+
+    def _process_name(self, hwnd):
+        try:
+            _, pid = self.win32process.GetWindowThreadProcessId(hwnd)
+            handle = self.win32api.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+            try:
+                path = self.win32process.GetModuleFileNameEx(handle, 0)
+            finally:
+                self.win32api.CloseHandle(handle)
+            return path.rsplit('\\', 1)[-1]
+        except Exception:
+            return ''
+
+    def enum_windows(self):
+        windows = []
+
+        def collect(hwnd, _):
+            windows.append(WindowInfo(
+                hwnd,
+                self.win32gui.GetWindowText(hwnd),
+                self.win32gui.GetClassName(hwnd),
+                self._process_name(hwnd)
+            ))
+            return True
+
+        self.win32gui.EnumWindows(collect, None)
+        return windows
+
+    def window_info(self, hwnd):
+        if not self.win32gui.IsWindow(hwnd):
+            raise WindowGoneError(hwnd)
+        return WindowInfo(
+            hwnd,
+            self.win32gui.GetWindowText(hwnd),
+            self.win32gui.GetClassName(hwnd),
+            self._process_name(hwnd)
+        )
+
+    def window_title(self, hwnd):
+        return self.win32gui.GetWindowText(hwnd)
+
+    def foreground_window(self):
+        return self.win32gui.GetForegroundWindow()
+
+    def set_foreground(self, hwnd):
+        self.win32gui.SetForegroundWindow(hwnd)
+
+    def restore_window(self, hwnd):
+        self.win32gui.ShowWindow(hwnd, self.win32con.SW_RESTORE)
+
+    def minimize_window(self, hwnd):
+        self.win32gui.ShowWindow(hwnd, self.win32con.SW_MINIMIZE)
+
+    def is_window_visible(self, hwnd):
+        if not self.win32gui.IsWindow(hwnd):
+            raise WindowGoneError(hwnd)
+        try:
+            return bool(self.win32gui.IsWindowVisible(hwnd))
+        except self.win32gui.error:
+            raise WindowGoneError(hwnd)
+
+    def find_window(self, title):
+        return self.win32gui.FindWindow(None, title)
+
+    def current_desktop(self):
+        return self.pyvda.VirtualDesktop.current()
+
+    def desktops(self):
+        return self.pyvda.get_virtual_desktops()
+
+    def create_desktop(self):
+        return self.pyvda.VirtualDesktop.create()
+
+    def move_to_desktop(self, hwnd, desktop):
+        self.pyvda.AppView(hwnd).move(desktop)
+
+    def window_view(self, hwnd):
+        if not self.win32gui.IsWindow(hwnd):
+            raise WindowGoneError(hwnd)
+        return self.pyvda.AppView(hwnd)
+
+    def move_view(self, view, desktop):
+        view.move(desktop)
+
+    def desktop_id(self, desktop):
+        return desktop.id
+
+    def cursor_pos(self):
+        return self.win32gui.GetCursorPos()
+
+    def register_hotkey(self, keys, callback):
+        # keyboard matches the whole chord itself, so nothing runs on other keypresses
+        self.keyboard.add_hotkey('+'.join(keys), callback, suppress=False)
+
+    def subscribe_window_events(self, callback):
+        import ctypes
+        from ctypes import wintypes
+
+        user32 = ctypes.windll.user32
+        events = {
+            0x0003: 'foreground',  # EVENT_SYSTEM_FOREGROUND
+            0x0020: 'desktopswitch',  # EVENT_SYSTEM_DESKTOPSWITCH (lock screen, UAC prompt)
+            0x8001: 'destroy',     # EVENT_OBJECT_DESTROY
+            0x8002: 'show',        # EVENT_OBJECT_SHOW
+            0x8017: 'cloaked',     # EVENT_OBJECT_CLOAKED (moved off this desktop)
+            0x8018: 'uncloaked',   # EVENT_OBJECT_UNCLOAKED (back on this desktop)
+        }
+        WinEventProc = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD
+        )
+
+        def handler(hook, event, hwnd, id_object, id_child, thread_id, event_time):
+            # Only whole windows, not the controls inside them
+            if id_object == 0 and id_child == 0:
+                callback(events.get(event), hwnd)
+
+        # run() holds on to proc, so the callback lives as long as the hooks do
+        proc = WinEventProc(handler)
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+        ready = threading.Event()
+        state = {}
+
+        def run():
+            # WinEvent hooks are delivered through this thread's message loop
+            state['thread_id'] = ctypes.windll.kernel32.GetCurrentThreadId()
+            hooks = [
+                user32.SetWinEventHook(event, event, 0, proc, 0, 0, 0x0002)  # WINEVENT_SKIPOWNPROCESS
+                for event in events
+            ]
+            ready.set()
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), 0, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+            for hook in hooks:
+                user32.UnhookWinEvent(hook)
+
+        thread = threading.Thread(target=run, name='window-events', daemon=True)
+        thread.start()
+        ready.wait()
+
+        def unsubscribe():
+            user32.PostThreadMessageW(state['thread_id'], 0x0012, 0, 0)  # WM_QUIT
+
+        return unsubscribe
+
+    def idle_seconds(self):
+        return (self.win32api.GetTickCount() - self.win32api.GetLastInputInfo()) / 1000
+
+    def on_battery(self):
+        return self.win32api.GetSystemPowerStatus()['ACLineStatus'] == 0
+
+    def user_presence(self):
+        import ctypes
+        state = ctypes.c_int()
+        if ctypes.windll.shell32.SHQueryUserNotificationState(ctypes.byref(state)) != 0:
+            return 'present'
+        # QUNS_NOT_PRESENT (locked or screen saver); QUNS_BUSY (a full-screen app or presentation mode) and
+        # QUNS_RUNNING_D3D_FULL_SCREEN cover the floats. QUNS_APP (a Store app in front) doesn't, so it's 'present'
+        return {1: 'away', 2: 'fullscreen', 3: 'fullscreen'}.get(state.value, 'present')
+
+
+class SimulatedWindow:
+    """A window living inside SimulatedBackend"""
+
+    def __init__(self, hwnd, title, class_name='SimWindow', process='sim.exe', desktop=0):
+        self.hwnd = hwnd
+        self.title = title
+        self.class_name = class_name
+        self.process = process
+        self.desktop = desktop
+        self.visible = True
+        self.minimized = False
+
+
+class SimulatedBackend(PlatformBackend):
+    """In-memory windows and desktops for headless benchmarks and tests
+
+    latency maps a method name to the seconds each call should take, so COM
+    round trips and the like can be modelled; calls counts every call.
+    """
+
+    def __init__(self, latency=None, desktop_count=1, events=True):
+        self.latency = dict(latency or {})
+        self.events = events
+        self.listeners = []
+        self.calls = Counter()
+        self.windows = {}
+        self.desktop_ids = list(range(desktop_count))
+        self.current = 0
+        self.foreground = None
+        self.cursor = (100, 100)
+        self.hotkeys = []
+        self.presence = 'present'
+        self._hwnds = itertools.count(0x10000, 4)
+        self._lock = threading.RLock()
+
+    def _call(self, name):
+        self.calls[name] += 1
+        delay = self.latency.get(name)
+        if delay:
+            time.sleep(delay)
+
+    def _window(self, hwnd):
+        window = self.windows.get(hwnd)
+        if window is None:
+            raise WindowGoneError(hwnd)
+        return window
+
+    def _emit(self, event, hwnd):
+        for callback in list(self.listeners):
+            callback(event, hwnd)
+
+    # Simulation controls
+    def open_window(self, title, **kwargs):
+        """Create a window on the current desktop and bring it to the front"""
+        with self._lock:
+            hwnd = next(self._hwnds)
+            kwargs.setdefault('desktop', self.current)
+            self.windows[hwnd] = SimulatedWindow(hwnd, title, **kwargs)
+            self.foreground = hwnd
+            return hwnd
+
+    def close_window(self, hwnd):
+        with self._lock:
+            self.windows.pop(hwnd, None)
+            if self.foreground == hwnd:
+                self.foreground = None
+        self._emit('destroy', hwnd)
+
+    def switch_desktop(self, desktop):
+        with self._lock:
+            self.current = desktop
+            shown = [w.hwnd for w in self.windows.values() if w.desktop == desktop]
+        for hwnd in shown:
+            self._emit('uncloaked', hwnd)
+
+    def set_presence(self, presence):
+        """Lock the session ('away'), cover the desktop ('fullscreen') or go back to 'present'"""
+        self.presence = presence
+        self._emit('desktopswitch', None)
+
+    def remove_desktop(self, desktop):
+        """Close a desktop; like Windows, its windows fall back to the first one"""
+        with self._lock:
+            self.desktop_ids.remove(desktop)
+            fallback = self.desktop_ids[0]
+            for window in self.windows.values():
+                if window.desktop == desktop:
+                    window.desktop = fallback
+            if self.current == desktop:
+                self.current = fallback
+
+    def press_hotkey(self, keys=HOTKEY):
+        """Fire the callbacks registered for keys, like the keyboard hook would"""
+        for registered, callback in list(self.hotkeys):
+            if registered == tuple(keys):
+                callback()
+
+    # PlatformBackend
+    def enum_windows(self):
+        self._call('enum_windows')
+        with self._lock:
+            return [WindowInfo(w.hwnd, w.title, w.class_name, w.process) for w in self.windows.values()]
+
+    def window_info(self, hwnd):
+        self._call('window_info')
+        with self._lock:
+            w = self._window(hwnd)
+            return WindowInfo(w.hwnd, w.title, w.class_name, w.process)
+
+    def window_title(self, hwnd):
+        self._call('window_title')
+        window = self.windows.get(hwnd)
+        return window.title if window else ''
+
+    def foreground_window(self):
+        self._call('foreground_window')
+        return self.foreground or 0
+
+    def set_foreground(self, hwnd):
+        self._call('set_foreground')
+        with self._lock:
+            self._window(hwnd)
+            self.foreground = hwnd
+
+    def restore_window(self, hwnd):
+        self._call('restore_window')
+        with self._lock:
+            self._window(hwnd).minimized = False
+
+    def minimize_window(self, hwnd):
+        self._call('minimize_window')
+        with self._lock:
+            self._window(hwnd).minimized = True
+
+    def is_window_visible(self, hwnd):
+        self._call('is_window_visible')
+        with self._lock:
+            window = self._window(hwnd)
+            # Windows on other desktops are cloaked
+            return window.visible and window.desktop == self.current
+
+    def find_window(self, title):
+        self._call('find_window')
+        with self._lock:
+            for window in self.windows.values():
+                if window.title == title:
+                    return window.hwnd
+        return 0
+
+    def current_desktop(self):
+        self._call('current_desktop')
+        return self.current
+
+    def desktops(self):
+        self._call('desktops')
+        return list(self.desktop_ids)
+
+    def create_desktop(self):
+        self._call('create_desktop')
+        with self._lock:
+            desktop = max(self.desktop_ids) + 1
+            self.desktop_ids.append(desktop)
+            return desktop
+
+    def move_to_desktop(self, hwnd, desktop):
+        self._call('move_to_desktop')
+        with self._lock:
+            if desktop not in self.desktop_ids:
+                raise ValueError(f"no desktop {desktop}")
+            self._window(hwnd).desktop = desktop
+            if self.foreground == hwnd and desktop != self.current:
+                self.foreground = None
+            visible = desktop == self.current
+        self._emit('uncloaked' if visible else 'cloaked', hwnd)
+
+    def window_view(self, hwnd):
+        self._call('window_view')
+        with self._lock:
+            self._window(hwnd)
+        return hwnd
+
+    def cursor_pos(self):
+        self._call('cursor_pos')
+        return self.cursor
+
+    def register_hotkey(self, keys, callback):
+        self._call('register_hotkey')
+        self.hotkeys.append((tuple(keys), callback))
+
+    def subscribe_window_events(self, callback):
+        self._call('subscribe_window_events')
+        if not self.events:
+            return None
+        self.listeners.append(callback)
+        return lambda: self.listeners.remove(callback)
+
+    def user_presence(self):
+        self._call('user_presence')
+        return self.presence
@@ -0,0 +1,145 @@
+"""Prebuilt asset bundles: a GIF's tray and float frames, ready to use without decoding
+
+Build one next to the GIF with
+
+    python bundle.py windowsfloat.gif [--size 72x90 --size 144x180] [--source [--compress]]
+
+and the app loads windowsfloat.wfb at startup instead of decoding the GIF,
+as long as the GIF hasn't changed since. A bundle is a frame atlas (see
+atlas.py), so frames are paged in from the file as they are shown. With
+--source it also carries every full-size frame, and new float sizes are
+scaled from those instead of decoding the GIF again; --compress stores
+them zlib-compressed, which is smaller on disk but costs an inflate per read.
+"""
+import argparse
+import os
+
+from atlas import AtlasError, AtlasWriter, FrameAtlas
+from floats import DEFAULT_SIZE
+from frames import (FrameSource, gif_digest, scale_frame, tray_frame,
+                    DEFAULT_RESAMPLE, DEFAULT_THRESHOLD, DEFAULT_TOLERANCE, TRAY_SIZE)
+
+
+def bundle_path(gif_path):
+    """Return where the bundle for a GIF lives"""
+    return os.path.splitext(gif_path)[0] + '.wfb'
+
+
+def frame_settings():
+    """The scaling settings a bundle's float frames were made with"""
+    return {
+        'resample': int(DEFAULT_RESAMPLE),
+        'threshold': DEFAULT_THRESHOLD,
+        'tolerance': DEFAULT_TOLERANCE,  # Held frames merged, as FrameSource does
+    }
+
+
+class AssetBundle:
+    """Everything startup needs from the GIF: durations, tray frames and float frame sets
+
+    Frame sets are read-only sequences backed by the atlas file; source is
+    the full-size frames, if the bundle was built with them.
+    """
+
+    def __init__(self, digest, durations, tray_frames, frame_sets, settings=None, source=None, atlas=None):
+        self.digest = digest
+        self.durations = durations
+        self.tray_frames = tray_frames
+        self.frame_sets = frame_sets  # {size: frames}
+        self.settings = settings if settings is not None else frame_settings()
+        self.source = source
+        self.atlas = atlas
+
+    def close(self):
+        if self.atlas is not None:
+            self.atlas.close()
+
+
+def build_bundle(gif_path, path=None, sizes=(DEFAULT_SIZE,), source=False, compression='raw'):
+    """Decode the GIF once, writing the tray frames, every float size and optionally the full frames
+
+    Full-size frames go straight to the file as they are decoded, so even
+    a long GIF never has to fit in memory. Returns the bundle's path.
+    """
+    path = path or bundle_path(gif_path)
+    frames = FrameSource(gif_path)
+    try:
+        metadata = {'digest': gif_digest(gif_path), 'settings': frame_settings()}
+        with AtlasWriter(path, metadata) as writer:
+            source_set = writer.add_set('source', frames.size, compression) if source else None
+            tray, scaled = [], {tuple(size): [] for size in sizes}
+            for position, frame in enumerate(frames):
+                # A frame repeating an earlier one points at its bytes and shares its scaled versions
+                first = frames.aliases.get(position)
+                if first is not None:
+                    if source_set is not None:
+                        writer.repeat_frame(source_set, first)
+                    tray.append(tray[first])
+                    for output in scaled.values():
+                        output.append(output[first])
+                    continue
+                if source_set is not None:
+                    writer.add_frame(source_set, frame)
+                tray.append(tray_frame(frame))
+                for size, output in scaled.items():
+                    output.append(scale_frame(frame, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD))
+            writer.add_frames(writer.add_set('tray', TRAY_SIZE), tray)
+            for size, output in scaled.items():
+                writer.add_frames(writer.add_set('float', size), output)
+            # Known once every frame has been compared
+            writer.metadata['durations'] = frames.durations()
+    finally:
+        frames.close()
+    return path
+
+
+def read_bundle(path, digest=None):
+    """Map a bundle; None if it is missing, damaged, or made from another GIF or settings"""
+    try:
+        atlas = FrameAtlas(path)
+    except (OSError, AtlasError):
+        return None
+
+    metadata = atlas.metadata
+    tray_frames = atlas.get('tray')
+    if ((digest is not None and metadata.get('digest') != digest)
+            or metadata.get('settings') != frame_settings()
+            or not tray_frames):
+        atlas.close()
+        return None
+
+    frame_sets = {size: atlas.get('float', size) for size in atlas.sizes('float')}
+    return AssetBundle(metadata['digest'], metadata['durations'], tray_frames, frame_sets,
+                       metadata['settings'], atlas.get('source'), atlas)
+
+
+def parse_size(text):
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prebuild the frames the app needs at startup")
+    parser.add_argument('gif', nargs='?', default='windowsfloat.gif')
+    parser.add_argument('--size', action='append', type=parse_size,
+                        help=f'float size to include, e.g. 144x180 (default {DEFAULT_SIZE[0]}x{DEFAULT_SIZE[1]})')
+    parser.add_argument('--source', action='store_true',
+                        help='include the full-size frames, so other sizes never decode the GIF')
+    parser.add_argument('--compress', action='store_true', help='zlib-compress the full-size frames')
+    parser.add_argument('--output', help='bundle path (default: next to the GIF)')
+    args = parser.parse_args(argv)
+
+    path = build_bundle(args.gif, args.output, args.size or [DEFAULT_SIZE], args.source,
+                        'zlib' if args.compress else 'raw')
+    bundle = read_bundle(path)
+    try:
+        print(f"{path}: {len(bundle.tray_frames)} frames, sizes "
+              + ', '.join(f'{w}x{h}' for w, h in bundle.frame_sets)
+              + (', full size' if bundle.source is not None else '')
+              + f", {os.path.getsize(path) // 1024} KiB")
+    finally:
+        bundle.close()
+
+
+if __name__ == '__main__':
+    main()
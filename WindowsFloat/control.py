@@ -0,0 +1,481 @@
+"""Local control endpoint: drive the app from scripts with JSON commands
+
+Set WINDOWSFLOAT_CONTROL=1 before starting and the app listens on a named
+pipe (Windows, with pywin32), a Unix socket, or failing both a loopback
+TCP port; WINDOWSFLOAT_CONTROL=tcp or tcp:PORT asks for TCP. The address
+is written to control.json next to the saved state.
+
+Every line a client sends is a JSON command, or a list of commands run as
+one batch; every line gets one line back, a result or a list of results,
+in order. Lines may be pipelined: whatever has arrived is run together.
+Over TCP the first line must be {"token": ...} from control.json.
+
+    {"cmd": "float", "hwnd": 1234}                  also "title", "process", "x", "y"
+    {"cmd": "restore", "process": "notepad.exe"}    also "hwnd", "title"
+    {"cmd": "restore_all"}
+    {"cmd": "set", "size": [144, 180], "opacity": 0.5, "speed": 2}   "hwnd" picks one float
+    {"cmd": "query"}
+"""
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+
+from paths import app_data_dir
+from state import write_atomic
+
+# Longest line accepted, so a client can't make us buffer without end
+MAX_LINE = 1 << 20
+PIPE_NAME = r'\\.\pipe\WindowsFloat-control'
+# Consecutive commands of these kinds are run as one desktop pass
+BATCHED = ('float', 'restore')
+
+
+class ControlError(Exception):
+    """A command that can't be run; the message goes back to the client"""
+
+
+def control_info_path():
+    """Return the file the running app's control address is written to"""
+    return os.path.join(app_data_dir(), 'control.json')
+
+
+def default_family():
+    if sys.platform == 'win32':
+        return 'pipe'
+    return 'unix' if hasattr(socket, 'AF_UNIX') else 'tcp'
+
+
+def control_endpoint(environ=os.environ):
+    """Control is opt-in: WINDOWSFLOAT_CONTROL=1, pipe, unix, tcp or tcp:PORT; returns (family, port) or None"""
+    value = environ.get('WINDOWSFLOAT_CONTROL', '')
+    if value in ('', '0'):
+        return None
+    family, _, port = value.partition(':')
+    return family if family in ('pipe', 'unix', 'tcp') else None, int(port) if port.isdigit() else 0
+
+
+def select_windows(command, windows):
+    """Return the hwnds a command names: "hwnd", a "title" substring or a "process" name, case-insensitive
+
+    windows is one enum_windows() result, or None when only hwnds are asked for.
+    """
+    given = [key for key in ('hwnd', 'title', 'process') if key in command]
+    if len(given) != 1:
+        raise ControlError('give one of hwnd, title or process')
+    key, value = given[0], command[given[0]]
+    if key == 'hwnd':
+        hwnds = value if isinstance(value, list) else [value]
+        if not all(isinstance(hwnd, int) for hwnd in hwnds):
+            raise ControlError('hwnd is a window handle or a list of them')
+        return hwnds
+    if not isinstance(value, str) or not value:
+        raise ControlError(f"{key} is a non-empty string")
+    value = value.lower()
+    if key == 'title':
+        return [w.hwnd for w in windows if w.title and value in w.title.lower()]
+    return [w.hwnd for w in windows if w.title and (w.process or '').lower() == value]
+
+
+def parse_settings(command, max_size):
+    """Check a set command; returns the (size, opacity, speed) it changes, None for the others
+
+    A size can be no larger than max_size, the screen's (width, height):
+    every frame of the GIF is scaled to it and kept in memory.
+    """
+    size = command.get('size')
+    if size is not None:
+        if (not isinstance(size, list) or len(size) != 2
+                or not all(isinstance(n, int) and 0 < n <= limit for n, limit in zip(size, max_size))):
+            raise ControlError(f"size is [width, height], at most {max_size[0]}x{max_size[1]}")
+        size = tuple(size)
+    opacity = command.get('opacity')
+    if opacity is not None and (not isinstance(opacity, (int, float)) or not 0 < opacity <= 1):
+        raise ControlError('opacity is above 0 and at most 1')
+    speed = command.get('speed')
+    if speed is not None and (not isinstance(speed, (int, float)) or speed <= 0):
+        raise ControlError('speed is above 0')
+    if size is None and opacity is None and speed is None:
+        raise ControlError('set needs size, opacity or speed')
+    return size, opacity, speed
+
+
+def dispatch(commands, handlers):
+    """Run commands in order and return one result per command
+
+    handlers maps a command name to fn(commands) returning one result per
+    command. Runs of consecutive BATCHED commands reach their handler
+    together, everything else one at a time. A ControlError (or any other
+    failure) becomes an error result for the commands it was raised for.
+    """
+    results = []
+    i = 0
+    while i < len(commands):
+        name = commands[i].get('cmd')
+        end = i + 1
+        if name in BATCHED:
+            while end < len(commands) and commands[end].get('cmd') == name:
+                end += 1
+        group = commands[i:end]
+        handler = handlers.get(name)
+        try:
+            if handler is None:
+                raise ControlError(f"unknown command {name!r}")
+            results.extend(handler(group))
+        except Exception as e:
+            results.extend({'ok': False, 'error': str(e) or type(e).__name__} for _ in group)
+        i = end
+    for command, result in zip(commands, results):
+        if 'id' in command:
+            result['id'] = command['id']
+    return results
+
+
+class SocketStream:
+    def __init__(self, sock):
+        self.sock = sock
+
+    def recv(self):
+        return self.sock.recv(65536)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class PipeStream:
+    """One client's instance of the named pipe"""
+
+    def __init__(self, handle):
+        import pywintypes
+        import win32file
+        import win32pipe
+        self.handle = handle
+        self.error = pywintypes.error
+        self.win32file = win32file
+        self.win32pipe = win32pipe
+
+    def recv(self):
+        try:
+            return self.win32file.ReadFile(self.handle, 65536)[1]
+        except self.error:
+            return b''  # Client went away
+
+    def send(self, data):
+        try:
+            self.win32file.WriteFile(self.handle, data)
+        except self.error as e:
+            raise OSError(str(e))
+
+    def close(self):
+        try:
+            self.win32pipe.DisconnectNamedPipe(self.handle)
+        except self.error:
+            pass
+        self.win32file.CloseHandle(self.handle)
+
+
+class ControlServer:
+    """Accepts control connections and answers their lines, one thread per client
+
+    run(commands) gets every command that has arrived on a connection so
+    far, in order, and returns one result per command; it runs on that
+    connection's thread. family is 'pipe', 'unix' or 'tcp' (default: the
+    best this platform has); a pipe or Unix socket that can't be set up
+    falls back to TCP on 127.0.0.1.
+    """
+
+    def __init__(self, run, family=None, port=0, info_path=None):
+        self.run = run
+        self.family = family or default_family()
+        self.port = port
+        self.info_path = info_path or control_info_path()
+        self.address = None
+        self.token = None
+        self._listener = None
+        self._closed = False
+        self._lock = threading.Lock()
+
+        # Stats
+        self.connections = 0
+        self.lines = 0
+        self.commands = 0
+        self.passes = 0  # Calls to run(); pipelined lines share one
+        self.errors = 0
+
+    def start(self):
+        """Start listening; returns the address clients connect to"""
+        if self.family == 'pipe':
+            try:
+                self._start_pipe()
+            except (ImportError, OSError):
+                self.family = 'tcp'
+        elif self.family == 'unix':
+            try:
+                self._start_unix()
+            except OSError:
+                self.family = 'tcp'
+        if self.family == 'tcp':
+            self._start_tcp()
+        self._write_info()
+        return self.address
+
+    # Endpoints
+    def _start_pipe(self):
+        import pywintypes
+        import win32pipe
+        self.address = PIPE_NAME
+        try:
+            # The first instance claims the name, so another process can't be listening on it already
+            first = self._create_pipe(0x00080000)  # FILE_FLAG_FIRST_PIPE_INSTANCE
+        except pywintypes.error as e:
+            raise OSError(str(e))
+        self._listener = win32pipe
+        threading.Thread(target=self._accept_pipe, args=(first,), name='control', daemon=True).start()
+
+    def _create_pipe(self, flags=0):
+        import win32pipe
+        return win32pipe.CreateNamedPipe(
+            self.address,
+            win32pipe.PIPE_ACCESS_DUPLEX | flags,
+            win32pipe.PIPE_TYPE_BYTE | win32pipe.PIPE_READMODE_BYTE | win32pipe.PIPE_WAIT
+            | 0x00000008,  # PIPE_REJECT_REMOTE_CLIENTS
+            win32pipe.PIPE_UNLIMITED_INSTANCES, 65536, 65536, 0, None
+        )
+
+    def _accept_pipe(self, handle):
+        import pywintypes
+        import win32pipe
+        while True:
+            try:
+                win32pipe.ConnectNamedPipe(handle, None)
+            except pywintypes.error:
+                pass  # ERROR_PIPE_CONNECTED: the client beat us to it, which is fine
+            if self._closed:
+                PipeStream(handle).close()
+                return
+            self._serve(PipeStream(handle))
+            try:
+                handle = self._create_pipe()
+            except pywintypes.error:
+                return
+
+    def _start_unix(self):
+        path = os.path.join(os.path.dirname(self.info_path), 'control.sock')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(path)  # Left behind by a run that crashed
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        os.chmod(path, 0o600)
+        sock.listen()
+        self.address = path
+        self._listener = sock
+        threading.Thread(target=self._accept_sockets, name='control', daemon=True).start()
+
+    def _start_tcp(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.bind(('127.0.0.1', self.port))
+        sock.listen()
+        # Any local process (or web page) can reach a loopback port, so clients prove they can read our files
+        self.token = secrets.token_hex(16)
+        self.address = f"127.0.0.1:{sock.getsockname()[1]}"
+        self._listener = sock
+        threading.Thread(target=self._accept_sockets, name='control', daemon=True).start()
+
+    def _accept_sockets(self):
+        while not self._closed:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                return  # Closed
+            self._serve(SocketStream(sock))
+
+    def _write_info(self):
+        info = {'family': self.family, 'address': self.address, 'pid': os.getpid()}
+        if self.token is not None:
+            info['token'] = self.token
+        write_atomic(self.info_path, json.dumps(info).encode('utf-8'))
+
+    # Connections
+    def _serve(self, stream):
+        with self._lock:
+            self.connections += 1
+        threading.Thread(target=self._connection, args=(stream,), name='control-client', daemon=True).start()
+
+    def _connection(self, stream):
+        buffer = b''
+        authorized = self.token is None
+        try:
+            while not self._closed:
+                data = stream.recv()
+                if not data:
+                    return
+                buffer += data
+                if b'\n' not in buffer:
+                    if len(buffer) > MAX_LINE:
+                        return
+                    continue
+                *lines, buffer = buffer.split(b'\n')
+                lines = [line for line in lines if line.strip()]
+                if not authorized:
+                    if not lines:
+                        continue  # Only blank lines so far; the token is still to come
+                    authorized = self._check_token(lines.pop(0))
+                    stream.send(json.dumps({'ok': authorized}).encode('utf-8') + b'\n')
+                    if not authorized:
+                        return
+                if lines:
+                    stream.send(b''.join(json.dumps(reply).encode('utf-8') + b'\n' for reply in self._answer(lines)))
+        except OSError:
+            pass
+        finally:
+            stream.close()
+
+    def _check_token(self, line):
+        try:
+            return secrets.compare_digest(str(json.loads(line).get('token')), self.token)
+        except (ValueError, AttributeError):
+            return False
+
+    def _answer(self, lines):
+        """Run every command of the lines in one pass and return one reply per line"""
+        parsed = []
+        commands = []
+        for line in lines:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                parsed.append(ControlError('not JSON'))
+                continue
+            batch = request if isinstance(request, list) else [request]
+            if not all(isinstance(command, dict) for command in batch):
+                parsed.append(ControlError('a command is a JSON object'))
+                continue
+            parsed.append((isinstance(request, list), len(commands), len(batch)))
+            commands.extend(batch)
+
+        results = []
+        if commands:
+            try:
+                results = self.run(commands)
+            except Exception as e:
+                results = [{'ok': False, 'error': str(e)} for _ in commands]
+
+        with self._lock:
+            self.lines += len(lines)
+            self.commands += len(commands)
+            self.passes += 1 if commands else 0
+            self.errors += sum(1 for r in results if not r.get('ok')) + sum(
+                1 for p in parsed if isinstance(p, ControlError))
+
+        replies = []
+        for entry in parsed:
+            if isinstance(entry, ControlError):
+                replies.append({'ok': False, 'error': str(entry)})
+            else:
+                is_batch, start, count = entry
+                replies.append(results[start:start + count] if is_batch else results[start])
+        return replies
+
+    def close(self):
+        self._closed = True
+        if self.family == 'pipe' and self._listener is not None:
+            # Wake the thread waiting for a client
+            try:
+                open(self.address, 'r+b', buffering=0).close()
+            except OSError:
+                pass
+        elif self._listener is not None:
+            self._listener.close()
+            if self.family == 'unix':
+                try:
+                    os.remove(self.address)
+                except OSError:
+                    pass
+        try:
+            os.remove(self.info_path)
+        except OSError:
+            pass
+
+    def stats(self):
+        with self._lock:
+            return {
+                'family': self.family,
+                'connections': self.connections,
+                'lines': self.lines,
+                'commands': self.commands,
+                'passes': self.passes,
+                'errors': self.errors,
+            }
+
+
+class ControlClient:
+    """Talks to a running app; send() pipelines lines, request() is one round trip
+
+    Reads the address from control.json unless given family and address.
+    """
+
+    def __init__(self, family=None, address=None, token=None, info_path=None):
+        if address is None:
+            with open(info_path or control_info_path()) as f:
+                info = json.load(f)
+            family, address, token = info['family'], info['address'], info.get('token')
+        if family == 'pipe':
+            self._file = open(address, 'r+b', buffering=0)
+            self._send, self._recv = self._file.write, lambda: self._file.read(65536)
+        else:
+            if family == 'unix':
+                self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                self._sock.connect(address)
+            else:
+                host, port = address.rsplit(':', 1)
+                self._sock = socket.create_connection((host, int(port)))
+            self._send, self._recv = self._sock.sendall, lambda: self._sock.recv(65536)
+        self._buffer = b''
+        if token is not None and not self.send([{'token': token}])[0].get('ok'):
+            raise ConnectionError('control token refused')
+
+    def send(self, requests):
+        """Send every request (a command, or a list for one batch) at once; returns their replies in order"""
+        self._send(b''.join(json.dumps(request).encode('utf-8') + b'\n' for request in requests))
+        replies = []
+        while len(replies) < len(requests):
+            while b'\n' not in self._buffer:
+                data = self._recv()
+                if not data:
+                    raise ConnectionError('control connection closed')
+                self._buffer += data
+            line, self._buffer = self._buffer.split(b'\n', 1)
+            replies.append(json.loads(line))
+        return replies
+
+    def request(self, request):
+        return self.send([request])[0]
+
+    def close(self):
+        if hasattr(self, '_file'):
+            self._file.close()
+        else:
+            self._sock.close()
+
+
+def main(argv=None):
+    """Send commands from the command line: python control.py '{"cmd": "query"}' ..."""
+    client = ControlClient()
+    try:
+        for reply in client.send([json.loads(arg) for arg in (argv if argv is not None else sys.argv[1:])]):
+            print(json.dumps(reply))
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
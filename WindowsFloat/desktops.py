@@ -0,0 +1,257 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import WindowGoneError
+
+
+class CallTimer:
+    """Count and time calls by name"""
+
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.counts = {}
+        self._lock = threading.Lock()
+
+    def call(self, name, fn, *args):
+        start = self.clock()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = (self.clock() - start) * 1000
+            with self._lock:
+                count, total, worst = self.counts.get(name, (0, 0.0, 0.0))
+                self.counts[name] = (count + 1, total + elapsed, max(worst, elapsed))
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {'calls': count, 'total_ms': total, 'mean_ms': total / count, 'max_ms': worst}
+                for name, (count, total, worst) in self.counts.items()
+            }
+
+
+class DesktopManager:
+    """Parks windows on a hidden virtual desktop and brings them back
+
+    Every desktop call runs on one thread of its own, so the AppView
+    objects cached per hwnd never cross COM apartments and callers on the
+    UI and hotkey threads can share them. Other threads wait for the
+    result; the UI thread passes on_done instead and gets it through post,
+    since the backend may call window event listeners (which post to the
+    UI thread themselves) from the desktop thread. The hidden and original
+    desktops are checked against the live list at most every
+    validate_interval seconds, and again whenever a move fails. Failures
+    it gets past (a window that won't move, the foreground refused) go to
+    on_error(exc), on the desktop thread.
+    """
+
+    def __init__(self, backend, post=None, validate_interval=2.0, clock=time.monotonic, on_error=None):
+        self.backend = backend
+        self.post = post
+        self.on_error = on_error
+        self.validate_interval = validate_interval
+        self.clock = clock
+        self.timer = CallTimer()
+
+        self.hidden = None
+        self.original = None
+        self.hidden_id = None  # str(desktop_id) of the hidden desktop, for saving and picking it again
+        self._views = {}
+        self._validated_at = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='desktops')
+        self._thread = None
+
+        # Stats
+        self.view_hits = 0
+        self.view_misses = 0
+        self.revalidations = 0
+        self.retries = 0
+        self.failed_moves = 0
+        self.focus_errors = 0
+
+    def _run(self, fn, *args, on_done=None, on_error=None):
+        """Run fn on the desktop thread
+
+        Waits for its result, or with on_done returns at once and later
+        hands the result to on_done (or the error to on_error, else raises
+        it) on the UI thread.
+        """
+        if threading.current_thread() is self._thread:
+            return fn(*args)
+        future = self._executor.submit(self._enter, fn, *args)
+        if on_done is None:
+            return future.result()
+        future.add_done_callback(lambda future: self.post(lambda: self._deliver(future, on_done, on_error)))
+
+    def _deliver(self, future, on_done, on_error):
+        # Runs on the UI thread
+        try:
+            result = future.result()
+        except Exception as e:
+            if on_error is None:
+                raise
+            on_error(e)
+        else:
+            on_done(result)
+
+    def _enter(self, fn, *args):
+        self._thread = threading.current_thread()
+        return fn(*args)
+
+    def _call(self, name, *args):
+        return self.timer.call(name, getattr(self.backend, name), *args)
+
+    # Desktops
+    def setup(self, hidden_id=None):
+        """Remember the current desktop and pick (or create) the hidden one
+
+        hidden_id prefers the desktop used last time, if it still exists.
+        Doesn't wait for it; whatever is asked of the desktop thread next runs afterwards.
+        """
+        self.hidden_id = hidden_id
+        self._executor.submit(self._enter, self._validate, True)
+
+    def _validate(self, force=False):
+        now = self.clock()
+        if not force and self._validated_at is not None and now - self._validated_at < self.validate_interval:
+            return
+        self._validated_at = now
+        self.revalidations += 1
+
+        desktops = self._call('desktops')
+        ids = [self.backend.desktop_id(d) for d in desktops]
+        if self.original is None or self.backend.desktop_id(self.original) not in ids:
+            self.original = self._call('current_desktop')
+        if self.hidden is None or self.backend.desktop_id(self.hidden) not in ids:
+            # Use the desktop from last time, else the second desktop if it exists, otherwise make one
+            original = self.backend.desktop_id(self.original)
+            previous = [d for d, i in zip(desktops, ids) if str(i) == self.hidden_id and i != original]
+            if previous:
+                self.hidden = previous[0]
+            elif len(desktops) > 1:
+                self.hidden = desktops[1]
+            else:
+                self.hidden = self._call('create_desktop')
+            self.hidden_id = str(self.backend.desktop_id(self.hidden))
+
+    def _on_original_desktop(self):
+        self._validate()
+        current = self._call('current_desktop')
+        return self.backend.desktop_id(current) == self.backend.desktop_id(self.original)
+
+    def window_back(self, hwnd, on_done=None, on_error=None):
+        """Return True if a window is visible on the desktop the user is looking at, the original one
+
+        Raises WindowGoneError once the window is closed.
+        """
+        return self._run(self._window_back, hwnd, on_done=on_done, on_error=on_error)
+
+    def _window_back(self, hwnd):
+        return self._call('is_window_visible', hwnd) and self._on_original_desktop()
+
+    # Windows
+    def _view(self, hwnd):
+        view = self._views.get(hwnd)
+        if view is None:
+            self.view_misses += 1
+            view = self._views[hwnd] = self._call('window_view', hwnd)
+        else:
+            self.view_hits += 1
+        return view
+
+    def forget(self, hwnd):
+        """Drop the cached view of a window, e.g. once it is destroyed; doesn't wait"""
+        try:
+            self._executor.submit(self._enter, self._views.pop, hwnd, None)
+        except RuntimeError:
+            pass  # Shut down, and the views with it
+
+    def _move(self, hwnds, target):
+        moved = []
+        self._validate()
+        for hwnd in hwnds:
+            try:
+                self._call('move_view', self._view(hwnd), target())
+            except WindowGoneError:
+                self._views.pop(hwnd, None)
+                continue
+            except Exception:
+                # The view or the desktop went stale: look both up again and retry once
+                self.retries += 1
+                self._views.pop(hwnd, None)
+                self._validate(True)
+                try:
+                    self._call('move_view', self._view(hwnd), target())
+                except Exception as e:
+                    self._views.pop(hwnd, None)
+                    self.failed_moves += 1
+                    self._report(e)
+                    continue
+            moved.append(hwnd)
+        return moved
+
+    def park(self, hwnds, on_done=None, on_error=None):
+        """Move windows to the hidden desktop; returns the ones that moved"""
+        return self._run(self._move, list(hwnds), lambda: self.hidden, on_done=on_done, on_error=on_error)
+
+    def restore(self, hwnds, focus=None, on_done=None, on_error=None):
+        """Move windows back to the original desktop, then focus one of them
+
+        Returns the ones that moved.
+        """
+        return self._run(self._restore, list(hwnds), focus, on_done=on_done, on_error=on_error)
+
+    def _restore(self, hwnds, focus):
+        moved = self._move(hwnds, lambda: self.original)
+        if focus in moved:
+            try:
+                self._call('set_foreground', focus)
+            except Exception as e:
+                # Windows only lets us take the foreground sometimes
+                self.focus_errors += 1
+                self._report(e)
+        return moved
+
+    def _report(self, error):
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def windows(self):
+        """Return a WindowInfo for every top-level window, from one enumeration"""
+        return self._run(self._call, 'enum_windows')
+
+    def windows_of_process(self, hwnd):
+        """Return the visible, titled windows on this desktop from the same process as hwnd"""
+        return self._run(self._windows_of_process, hwnd)
+
+    def _windows_of_process(self, hwnd):
+        windows = self._call('enum_windows')
+        process = next((w.process for w in windows if w.hwnd == hwnd), None)
+        if not process:
+            return []
+        found = []
+        for window in windows:
+            if window.process != process or not window.title:
+                continue
+            try:
+                if self._call('is_window_visible', window.hwnd):
+                    found.append(window.hwnd)
+            except WindowGoneError:
+                pass
+        return found
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        return {
+            'calls': self.timer.stats(),
+            'cached_views': len(self._views),
+            'view_hits': self.view_hits,
+            'view_misses': self.view_misses,
+            'revalidations': self.revalidations,
+            'retries': self.retries,
+            'failed_moves': self.failed_moves,
+            'focus_errors': self.focus_errors,
+        }
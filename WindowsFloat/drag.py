@@ -0,0 +1,98 @@
+import math
+import time
+
+# One display frame at 60 Hz; moving a window more often than this only costs recomposites
+FRAME_MS = 16
+
+
+class WindowMover:
+    """Moves the window being dragged at most once per display frame
+
+    Mice can report hundreds of motion events a second, and every move of
+    a layered (alpha, transparent colour) window is a recomposite that
+    competes with the animation ticks. request() only records the latest
+    position: the first move of a frame happens at once, later ones are
+    folded into a single move when the frame is over. end() applies the
+    final position straight away. after/after_cancel are the Tk root's.
+    """
+
+    def __init__(self, after, after_cancel, frame_ms=FRAME_MS, clock=time.monotonic):
+        self.after = after
+        self.after_cancel = after_cancel
+        self.frame_ms = frame_ms
+        self.clock = clock
+        self._move = None
+        self._target = None
+        self._position = None
+        self._last_move = None
+        self._after_id = None
+
+        # Stats
+        self.requested = 0
+        self.applied = 0
+        self.drags = 0
+
+    @property
+    def active(self):
+        return self._move is not None
+
+    def begin(self, move, position):
+        """Start a drag; move(x, y) puts the window at position (x, y)"""
+        self.end()
+        self._move = move
+        self._position = tuple(position)
+        self.drags += 1
+
+    def request(self, x, y):
+        """Ask for the window at (x, y) as soon as this frame allows"""
+        if self._move is None:
+            return
+        self.requested += 1
+        self._target = (x, y)
+        if self._after_id is not None:
+            return
+        wait_ms = 0 if self._last_move is None else self.frame_ms - (self.clock() - self._last_move) * 1000
+        if wait_ms <= 0:
+            self._apply()
+        else:
+            self._after_id = self.after(int(math.ceil(wait_ms)), self._on_frame)
+
+    def _on_frame(self):
+        self._after_id = None
+        self._apply()
+
+    def _apply(self):
+        target, self._target = self._target, None
+        if target is None or target == self._position:
+            return
+        self._move(*target)
+        self._position = target
+        self._last_move = self.clock()
+        self.applied += 1
+
+    def end(self):
+        """Apply the last requested position now and finish the drag"""
+        if self._move is None:
+            return
+        self._cancel_timer()
+        self._apply()
+        self._move = None
+
+    def cancel(self):
+        """Finish the drag without moving again (the window is going away)"""
+        self._cancel_timer()
+        self._target = None
+        self._move = None
+
+    def _cancel_timer(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+
+    def stats(self):
+        return {
+            'drags': self.drags,
+            'moves_requested': self.requested,
+            'moves_applied': self.applied,
+            'coalesced_ratio': 1 - self.applied / self.requested if self.requested else 0.0,
+        }
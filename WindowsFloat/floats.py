@@ -0,0 +1,280 @@
+import time
+import tkinter as tk
+from collections import OrderedDict
+
+from PIL import ImageTk
+
+from render import CanvasRenderer
+
+# New floats start at this size
+DEFAULT_SIZE = (72, 90)
+
+# Choices offered in the float menu
+OPACITY_PRESETS = [5, 10, 15, 20, 25, 50, 75, 100]
+SIZE_PRESETS = [(360, 450), (288, 360), (216, 270), (144, 180), (72, 90), (56, 70)]
+SPEED_PRESETS = [0.25, 0.5, 1, 1.5, 2]
+
+# Bytes of PhotoImages per size before its frames are streamed through one image instead
+PHOTO_BUDGET = 32 << 20
+
+
+def set_window_attribute(window, name, value):
+    """Set a wm attribute that only some platforms have (e.g. -toolwindow on Windows)"""
+    try:
+        window.wm_attributes(name, value)
+    except tk.TclError:
+        pass
+
+
+class FloatRecord:
+    """Everything we keep per floated window"""
+
+    __slots__ = ('hwnd', 'title', 'x', 'y', 'size', 'opacity', 'pending_size', 'widget', 'identity')
+
+    def __init__(self, hwnd, title, x, y, size, opacity):
+        self.hwnd = hwnd
+        self.title = title
+        self.x = x
+        self.y = y
+        self.size = size
+        self.opacity = opacity
+        self.pending_size = None  # Size being prepared in the background
+        self.widget = None
+        self.identity = None  # (process, class name), to find the window again after a restart
+
+
+class FloatRegistry:
+    """Floated windows by hwnd, in the order they were floated"""
+
+    def __init__(self):
+        self._records = OrderedDict()
+
+    def add(self, record):
+        self._records[record.hwnd] = record
+        return record
+
+    def remove(self, hwnd):
+        return self._records.pop(hwnd, None)
+
+    def get(self, hwnd):
+        return self._records.get(hwnd)
+
+    def for_widget(self, widget):
+        """Return the record whose float window contains widget"""
+        for record in self._records.values():
+            if record.widget is not None and record.widget.owns(widget):
+                return record
+        return None
+
+    def latest(self):
+        """Return the most recently floated record, or None"""
+        return next(reversed(self._records.values()), None)
+
+    def sizes(self):
+        """Return every size in use or being prepared"""
+        sizes = set()
+        for record in self._records.values():
+            sizes.add(record.size)
+            if record.pending_size is not None:
+                sizes.add(record.pending_size)
+        return sizes
+
+    def __contains__(self, hwnd):
+        return hwnd in self._records
+
+    def __iter__(self):
+        return iter(list(self._records.values()))
+
+    def __len__(self):
+        return len(self._records)
+
+
+class StreamingPhotos:
+    """A single PhotoImage that each frame is pasted into when it is shown
+
+    Stands in for the list of PhotoImages of a large frame set: indexing
+    returns the same image, updated in place, so only the frames (which
+    may be mapped from an atlas) stay around rather than a Tk copy of each.
+    """
+
+    def __init__(self, frames, size):
+        self.frames = frames
+        self.photo = ImageTk.PhotoImage('RGBA', size)
+        self.index = None
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+        if index != self.index:
+            self.photo.paste(self.frames[index])
+            self.index = index
+        return self.photo
+
+
+class ProgressivePhotos:
+    """PhotoImages for a frame set whose proper frames are still being scaled
+
+    A frame not refined yet is shown from preview(index), a cheap resize
+    made the first time it comes up; refine(index, frame) then swaps the
+    proper frame into the same PhotoImage, so the floats showing it pick it
+    up without being touched. Past budget bytes the set is streamed
+    through one image, as with StreamingPhotos.
+    """
+
+    def __init__(self, size, count, preview, budget=PHOTO_BUDGET):
+        self.size = size
+        self.preview = preview
+        self.done = [False] * count
+        self.streaming = count * size[0] * size[1] * 4 > budget
+        if self.streaming:
+            self.frames = [None] * count  # Refined frames, pasted when shown
+            self.photo = ImageTk.PhotoImage('RGBA', size)
+            self.index = None
+        else:
+            self.photos = [None] * count
+
+        # Stats
+        self.refined = 0
+        self.previews = 0
+        self.preview_ms = 0.0
+
+    @property
+    def complete(self):
+        return self.refined == len(self.done)
+
+    def __len__(self):
+        return len(self.done)
+
+    def _preview(self, index):
+        start = time.perf_counter()
+        frame = self.preview(index)
+        self.previews += 1
+        self.preview_ms += (time.perf_counter() - start) * 1000
+        return frame
+
+    def __getitem__(self, index):
+        if self.streaming:
+            if index != self.index:
+                frame = self.frames[index]
+                self.photo.paste(frame if frame is not None else self._preview(index))
+                self.index = index
+            return self.photo
+        photo = self.photos[index]
+        if photo is None:
+            photo = self.photos[index] = ImageTk.PhotoImage(self._preview(index))
+        return photo
+
+    def refine(self, index, frame):
+        """Swap in the proper frame for index"""
+        if not self.done[index]:
+            self.done[index] = True
+            self.refined += 1
+        if self.streaming:
+            self.frames[index] = frame
+            if index == self.index:
+                self.photo.paste(frame)
+        elif self.photos[index] is None:
+            self.photos[index] = ImageTk.PhotoImage(frame)
+        else:
+            self.photos[index].paste(frame)
+
+    def stats(self):
+        return {
+            'frames': len(self.done),
+            'refined': self.refined,
+            'previews': self.previews,
+            'preview_ms': self.preview_ms,
+            'streaming': self.streaming,
+        }
+
+
+def make_photos(frames, size, budget=PHOTO_BUDGET):
+    """Return PhotoImages for a frame set: one per frame, or streamed if that would exceed budget bytes"""
+    if len(frames) * size[0] * size[1] * 4 > budget:
+        return StreamingPhotos(frames, size)
+    # A frame repeated in the set (see share_repeats) gets one PhotoImage
+    made = {}
+    photos = []
+    for frame in frames:
+        photo = made.get(id(frame))
+        if photo is None:
+            photo = made[id(frame)] = ImageTk.PhotoImage(frame)
+        photos.append(photo)
+    return photos
+
+
+class PhotoStore:
+    """One list of PhotoImages per size, shared by every float of that size"""
+
+    def __init__(self):
+        self._sets = {}
+
+    def get(self, size):
+        return self._sets.get(size)
+
+    def put(self, size, photos):
+        self._sets[size] = photos
+
+    def sizes(self):
+        return set(self._sets)
+
+    def release_unused(self, in_use):
+        """Drop the sets no float is using any more"""
+        for size in list(self._sets):
+            if size not in in_use:
+                del self._sets[size]
+
+
+class FloatWidget:
+    """The borderless, always-on-top window that stands in for one parked window"""
+
+    def __init__(self, master, size, opacity):
+        self.window = tk.Toplevel(master)
+        self.window.withdraw()
+
+        # Make the window always on top and remove window decorations
+        self.window.overrideredirect(True)
+        self.window.attributes('-topmost', True)
+
+        # Keep it out of the taskbar and switcher, with a transparent background
+        set_window_attribute(self.window, "-toolwindow", 1)
+        set_window_attribute(self.window, "-transparentcolor", "white")
+        self.set_opacity(opacity)
+
+        # Create a canvas for the GIF with the correct dimensions
+        width, height = size
+        self.canvas = tk.Canvas(
+            self.window,
+            bg='white',
+            highlightthickness=0,
+            bd=0,
+            width=width,
+            height=height
+        )
+        self.canvas.pack()
+
+        # Frames are drawn into one persistent image item
+        self.renderer = CanvasRenderer(self.canvas, width, height)
+
+    def owns(self, widget):
+        return widget is self.canvas or widget is self.window
+
+    def show(self, x, y):
+        self.window.deiconify()
+        self.window.geometry(f"+{x}+{y}")
+
+    def move(self, x, y):
+        self.window.geometry(f"+{x}+{y}")
+
+    def set_size(self, size):
+        width, height = size
+        self.window.geometry(f"{width}x{height}")
+        self.canvas.config(width=width, height=height)
+        self.renderer.set_size(width, height)
+
+    def set_opacity(self, value):
+        self.window.attributes("-alpha", value)
+
+    def destroy(self):
+        self.window.destroy()
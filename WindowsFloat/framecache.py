@@ -0,0 +1,207 @@
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from frames import DEFAULT_TOLERANCE
+from paths import app_data_dir
+
+# On-disk frame set layout: magic, width, height, frame count, then the
+# zlib-compressed RGBA bytes of every frame back to back. Version 2 sets
+# have held frames merged (see FrameSource), so version 1 sets are rebuilt.
+# A GIF's tray set is stored the same way under TRAY_MAGIC, with the
+# display time of every frame (uint32 milliseconds) between the header and
+# the pixels, so a warm start needs no decode pass at all.
+CACHE_MAGIC = b'WFC2'
+TRAY_MAGIC = b'WFT1'
+CACHE_HEADER = struct.Struct('<4sIII')
+
+
+def default_cache_dir():
+    """Return the per-user directory for cached frame sets"""
+    return os.path.join(app_data_dir(), 'frames')
+
+
+class FrameCache:
+    """LRU cache of pre-scaled RGBA frame sets, backed by files on disk"""
+
+    def __init__(self, cache_dir=None, max_entries=8):
+        self.cache_dir = cache_dir if cache_dir is not None else default_cache_dir()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.write_errors = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Compressing a frame set takes long enough to stall the UI, so files are written on one thread
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='framecache')
+        self._pending = {}
+        self._closed = False
+
+    @staticmethod
+    def make_key(digest, size, resample, threshold, tolerance=DEFAULT_TOLERANCE):
+        """Build a cache key for a GIF scaled to the given size"""
+        return (digest, size[0], size[1], int(resample), threshold, tolerance)
+
+    @staticmethod
+    def tray_key(digest, tolerance=DEFAULT_TOLERANCE):
+        """Build the cache key for a GIF's tray frames and frame durations"""
+        return (digest, 'tray', tolerance)
+
+    def _path_for(self, key):
+        if key[1] == 'tray':
+            digest, _, tolerance = key
+            return os.path.join(self.cache_dir, f"{digest}_tray{f'_d{tolerance}' if tolerance else ''}.wfc")
+        digest, width, height, resample, threshold, tolerance = key
+        name = f"{digest}_{width}x{height}_r{resample}_t{threshold}{f'_d{tolerance}' if tolerance else ''}.wfc"
+        return os.path.join(self.cache_dir, name)
+
+    def get(self, key):
+        """Return the cached frames for key, or None"""
+        with self._lock:
+            frames = self._entries.get(key)
+            if frames is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return frames
+
+        frames = self._read(key)
+        if frames is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, frames)
+        return frames
+
+    def get_tray(self, digest):
+        """Return the cached (tray frames, durations) of a GIF, or None"""
+        return self.get(self.tray_key(digest))
+
+    def put_tray(self, digest, frames, durations):
+        """Store a GIF's tray frames with the durations of its frames, like put()"""
+        if len(durations) != len(frames):
+            raise ValueError(f'{len(frames)} tray frames but {len(durations)} durations')
+        self.put(self.tray_key(digest), (list(frames), list(durations)))
+
+    def peek(self, key):
+        """Return the frames for key if they are in memory, without reading the disk or counting"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, frames, persist=True):
+        """Store frames in memory and, unless persist is False, queue them to be written to disk"""
+        self._remember(key, frames)
+        if not persist or not frames:
+            return
+        with self._lock:
+            if self._closed or key in self._pending:
+                return  # Shutting down, or the same set is already on its way to disk
+            durations = None
+            if key[1] == 'tray':
+                frames, durations = frames
+            self._pending[key] = self._writer.submit(self._write_quietly, key, frames, durations)
+
+    def flush(self):
+        """Wait until every queued frame set is on disk"""
+        with self._lock:
+            pending = list(self._pending.values())
+        for future in pending:
+            future.result()
+
+    def close(self):
+        """Write what is queued and stop the writer thread; later sets stay in memory only"""
+        with self._lock:
+            self._closed = True
+        self._writer.shutdown(wait=True)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'write_errors': self.write_errors,
+            'pending_writes': len(self._pending),
+        }
+
+    def clear(self):
+        """Drop every in-memory entry"""
+        with self._lock:
+            self._entries.clear()
+
+    def forget(self, digest):
+        """Drop the in-memory entries of one GIF; its files stay on disk"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == digest]:
+                del self._entries[key]
+
+    def _remember(self, key, frames):
+        with self._lock:
+            self._entries[key] = frames
+            self._entries.move_to_end(key)
+            # Evict the least recently used frame sets
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _read(self, key):
+        path = self._path_for(key)
+        tray = key[1] == 'tray'
+        try:
+            with open(path, 'rb') as f:
+                magic, width, height, count = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+                durations = list(struct.unpack(f'<{count}I', f.read(4 * count))) if tray else None
+                data = zlib.decompress(f.read())
+        except (OSError, struct.error, zlib.error):
+            return None
+
+        frame_bytes = width * height * 4
+        if magic != (TRAY_MAGIC if tray else CACHE_MAGIC) or len(data) != frame_bytes * count:
+            return None
+
+        frames = [
+            Image.frombuffer('RGBA', (width, height), data[i * frame_bytes:(i + 1) * frame_bytes],
+                             'raw', 'RGBA', 0, 1)
+            for i in range(count)
+        ]
+        return (frames, durations) if tray else frames
+
+    def _write_quietly(self, key, frames, durations=None):
+        try:
+            self._write(key, frames, durations)
+        except OSError:
+            with self._lock:
+                self.write_errors += 1  # The in-memory copy is still usable
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def _write(self, key, frames, durations=None):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        width, height = frames[0].size
+        data = b''.join(frame.tobytes() for frame in frames)
+
+        # Write to a temporary file of its own first so readers never see a partial set,
+        # and other writers (a second copy of the app) never write into it
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                if durations is None:
+                    f.write(CACHE_HEADER.pack(CACHE_MAGIC, width, height, len(frames)))
+                else:
+                    f.write(CACHE_HEADER.pack(TRAY_MAGIC, width, height, len(frames)))
+                    f.write(struct.pack(f'<{len(durations)}I', *durations))
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, self._path_for(key))
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
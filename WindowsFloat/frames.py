@@ -0,0 +1,332 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from PIL import Image, ImageChops
+
+from scheduler import DEFAULT_DURATION
+
+# numpy adds ~100 ms to startup, so it is only imported once the batched path runs
+np = None
+_numpy_missing = False
+
+# Default settings for the float frames
+DEFAULT_RESAMPLE = Image.Resampling.LANCZOS
+DEFAULT_THRESHOLD = 128
+TRAY_SIZE = (32, 32)
+
+# Consecutive frames that differ by no more than this in any channel are shown as one (0: identical only)
+DEFAULT_TOLERANCE = 0
+
+# Stand-in frames shown while the proper ones are scaled
+PREVIEW_RESAMPLE = Image.Resampling.NEAREST
+
+
+def load_numpy():
+    """Return numpy, importing it on first use; None if it isn't installed"""
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            _numpy_missing = True  # Fall back to the Pillow-only path
+    return np
+
+
+def first_frame(path):
+    """Return the GIF's first frame as RGBA without reading the rest of it"""
+    with Image.open(path) as gif:
+        return gif.convert('RGBA')
+
+
+def gif_digest(path):
+    """Return a content hash of the GIF file"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _resize_rgba(frame, size, resample):
+    # Ensure the frame is in RGBA mode
+    if frame.mode != 'RGBA':
+        frame = frame.convert('RGBA')
+
+    # Pillow resizes RGBA premultiplied (every filter but NEAREST), so transparent pixels don't bleed in
+    return frame.resize(size, resample)
+
+
+def scale_frame(frame, size, resample=DEFAULT_RESAMPLE, threshold=DEFAULT_THRESHOLD):
+    """Resize a single frame and remove semi-transparent edge pixels"""
+    # Ensure the frame is in RGBA mode
+    if frame.mode != 'RGBA':
+        frame = frame.convert('RGBA')
+
+    # Create a mask from the alpha channel
+    mask = frame.split()[-1]
+
+    # Resize the image with high-quality downscaling
+    resized_img = _resize_rgba(frame, size, resample)
+
+    # Resize the mask separately
+    resized_mask = mask.resize(size, resample)
+
+    # Apply the mask to remove any semi-transparent edge pixels
+    resized_img.putalpha(resized_mask.point(lambda p: 255 if p > threshold else 0))
+    return resized_img
+
+
+def preview_frame(frame, size, threshold=DEFAULT_THRESHOLD):
+    """Resize a frame as cheaply as possible, to show until scale_frame's version is ready
+
+    Nearest-neighbour is best fed a frame already scaled to another size;
+    the alpha threshold is applied again so the edges stay hard either way.
+    """
+    if frame.mode != 'RGBA':
+        frame = frame.convert('RGBA')
+    resized = frame.resize(size, PREVIEW_RESAMPLE)
+    resized.putalpha(resized.getchannel('A').point(lambda p: 255 if p > threshold else 0))
+    return resized
+
+
+def scale_frames_numpy(frames, size, resample=DEFAULT_RESAMPLE, threshold=DEFAULT_THRESHOLD):
+    """Resize all frames, then threshold the alpha of the whole stack at once"""
+    np = load_numpy()
+    resized = [np.asarray(_resize_rgba(frame, size, resample)) for frame in frames]
+    if not resized:
+        return []
+
+    # The resized alpha channel is the resized mask, so one resize per frame is enough
+    stack = np.stack(resized)
+    stack[..., 3] = np.where(stack[..., 3] > threshold, 255, 0).astype(np.uint8)
+    return [Image.fromarray(frame) for frame in stack]
+
+
+def scale_frames(frames, size, resample=DEFAULT_RESAMPLE, threshold=DEFAULT_THRESHOLD, batched=None):
+    """Resize all frames of the GIF with edge preservation"""
+    # Use the vectorized path whenever NumPy is installed
+    if batched is None:
+        batched = load_numpy() is not None
+    if batched:
+        scaled = scale_frames_numpy(frames, size, resample, threshold)
+    else:
+        scaled = [scale_frame(frame, size, resample, threshold) for frame in frames]
+    return share_repeats(scaled, getattr(frames, 'aliases', None) or {})
+
+
+def tray_frame(frame, size=TRAY_SIZE):
+    """Resize a frame for the tray icon"""
+    return frame.resize(size, Image.Resampling.LANCZOS)
+
+
+def frame_fingerprint(frame):
+    """Return a hash of a frame's pixels"""
+    # SHA-256 has hardware support on current CPUs, making it the cheapest of hashlib's here
+    return hashlib.sha256(frame.tobytes()).digest()
+
+
+def frames_match(a, b, tolerance=DEFAULT_TOLERANCE):
+    """True if no channel of any pixel differs by more than tolerance between two frames of the same size"""
+    if tolerance <= 0:
+        return a.tobytes() == b.tobytes()
+    return max(high for _, high in ImageChops.difference(a, b).getextrema()) <= tolerance
+
+
+def share_repeats(frames, aliases):
+    """Point every repeated frame of a set at its first showing, so each picture is held once"""
+    for position, first in aliases.items():
+        frames[position] = frames[first]
+    return frames
+
+
+def render_frames(frames, renderers):
+    """Run every renderer over each decoded frame in a single pass
+
+    Frames a FrameSource already knows to be repeats are rendered once.
+    """
+    aliases = getattr(frames, 'aliases', None) or {}
+    outputs = [[] for _ in renderers]
+    for position, frame in enumerate(frames):
+        first = aliases.get(position)
+        for output, render in zip(outputs, renderers):
+            output.append(render(frame) if first is None else output[first])
+    # Repeats found during this pass share their first showing's output too
+    aliases = getattr(frames, 'aliases', None)
+    if aliases:
+        for output in outputs:
+            share_repeats(output, aliases)
+    return outputs
+
+
+class FrameSource:
+    """Lazily decoded GIF frames, keeping only a small window of them in memory
+
+    Frames are compared as they are decoded: a run of identical (or, with
+    tolerance, nearly identical) consecutive frames is shown as its first
+    frame for the whole run, and a frame repeating an earlier one is listed
+    in aliases. Indexing, iteration and durations() are over the frames
+    shown; frame_count is the GIF's own count. Frames are only compared as
+    far as they are asked for, so len() is frame_count (an upper bound)
+    until the last one has been; durations() finishes the pass.
+
+    The window holds window frames for every iterator running at once, kept
+    around where each one is, so readers interleaved by different threads
+    don't evict each other's frames.
+    """
+
+    def __init__(self, path, window=8, tolerance=DEFAULT_TOLERANCE):
+        self.path = path
+        self.window = max(1, window)
+        self.tolerance = tolerance
+        self._opened = time.perf_counter()
+        self.gif = Image.open(path)
+        self.size = self.gif.size
+        self.info = dict(self.gif.info)
+        self.frame_count = getattr(self.gif, 'n_frames', 1)
+        self._frames = OrderedDict()
+        self._lock = threading.RLock()
+        self._readers = {}  # {iterator: GIF index it read last}
+
+        # Each GIF frame's own delay, read as the frame is decoded
+        self._raw_durations = [None] * self.frame_count
+
+        # The frames shown so far: GIF frame index, duration, and {position: earlier position} for repeats
+        self._timeline = []
+        self._durations = []
+        self.aliases = {}
+        self._compared = 0
+        self._kept = None
+        self._kept_fingerprint = None
+        self._first_shown = {}  # {fingerprint: position}
+
+        # Stats for benchmarks
+        self.decoded = 0
+        self.peak_window = 0
+        self.first_frame_ms = None
+
+    @property
+    def complete(self):
+        """True once every frame of the GIF has been compared"""
+        return self._compared == self.frame_count
+
+    def __len__(self):
+        return len(self._timeline) if self.complete else self.frame_count
+
+    def __iter__(self):
+        reader = object()
+        with self._lock:
+            self._readers[reader] = 0
+        try:
+            position = 0
+            while True:
+                frame = self._shown(position, reader)
+                if frame is None:
+                    return
+                yield frame
+                position += 1
+        finally:
+            with self._lock:
+                del self._readers[reader]
+
+    def __getitem__(self, index):
+        frame = self._shown(index) if index >= 0 else None
+        if frame is None:
+            raise IndexError(index)
+        return frame
+
+    def _shown(self, position, reader=None):
+        # The frame at a position of the timeline, comparing frames until it is known; None past the end
+        with self._lock:
+            self._compare(until=position)
+            if position >= len(self._timeline):
+                return None
+            index = self._timeline[position]
+            if reader is not None:
+                self._readers[reader] = index
+            return self._frame(index)
+
+    def _compare(self, until):
+        """Extend the timeline past position until (or to the end, with None)"""
+        with self._lock:
+            while not self.complete and (until is None or len(self._timeline) <= until):
+                index = self._compared
+                frame = self._frame(index)
+                fingerprint = frame_fingerprint(frame)
+                duration = self._raw_durations[index]
+                self._compared += 1
+                if self._kept is not None and (fingerprint == self._kept_fingerprint or (
+                        self.tolerance > 0 and frames_match(self._kept, frame, self.tolerance))):
+                    # A hold: the frame already showing stays up for this one's time too
+                    self._durations[-1] = (self._durations[-1] or DEFAULT_DURATION) + (duration or DEFAULT_DURATION)
+                    continue
+                position = len(self._timeline)
+                self._timeline.append(index)
+                self._durations.append(duration)
+                first = self._first_shown.setdefault(fingerprint, position)
+                if first != position:
+                    self.aliases[position] = first
+                self._kept, self._kept_fingerprint = frame, fingerprint
+            if self.complete:
+                self._kept = None
+
+    def _frame(self, index):
+        """The GIF's frame at index, decoded if it isn't in the window"""
+        with self._lock:
+            frame = self._frames.get(index)
+            if frame is None:
+                frame = self._decode(index)
+                self._frames[index] = frame
+                self._evict(index)
+            return frame
+
+    def _decode(self, index):
+        # Pillow (9 and later) draws each frame over the ones before it as their disposal methods say, and
+        # replays from the start when going back, so its RGBA conversion is the frame as shown
+        self.gif.seek(index)
+        self._raw_durations[index] = self.gif.info.get('duration', self.info.get('duration', 100))
+        frame = self.gif.convert('RGBA')
+
+        self.decoded += 1
+        if self.first_frame_ms is None:
+            self.first_frame_ms = (time.perf_counter() - self._opened) * 1000
+        return frame
+
+    def _evict(self, index):
+        # Drop the frames furthest (in playback order) from the current one and from where every reader is
+        positions = {index, *self._readers.values()}
+
+        def distance(i):
+            return min((i - position) % self.frame_count for position in positions)
+
+        while len(self._frames) > self.window * max(1, len(self._readers)):
+            del self._frames[max(self._frames, key=distance)]
+        self.peak_window = max(self.peak_window, len(self._frames))
+
+    def durations(self):
+        """Return the display time of every frame shown in milliseconds, holds merged"""
+        self._compare(until=None)
+        return list(self._durations)
+
+    def close(self):
+        with self._lock:
+            self._frames.clear()
+            self.gif.close()
+
+    def stats(self):
+        """Return decode and memory stats for this source"""
+        return {
+            'frames': self.frame_count,
+            'decoded': self.decoded,
+            'window': len(self._frames),
+            'peak_window': self.peak_window,
+            'peak_window_bytes': self.peak_window * self.size[0] * self.size[1] * 4,
+            'first_frame_ms': self.first_frame_ms,
+            'compared': self._compared,
+            'shown_frames': len(self._timeline),
+            'unique_frames': len(self._timeline) - len(self.aliases),
+            # Share of the GIF's frames that needed no picture of their own
+            'dedup_ratio': 1 - (len(self._timeline) - len(self.aliases)) / self._compared if self._compared else 0.0,
+        }
@@ -0,0 +1,87 @@
+import queue
+import threading
+import time
+
+from metrics import LatencyHistogram
+
+class HotkeyPipeline:
+    """Takes hotkey presses off the keyboard hook thread and handles them on a worker
+
+    press() is what the hook calls; it only timestamps and enqueues the
+    press. The worker calls handler(pressed_at) for each press that isn't a
+    repeat within debounce seconds of the last one it handled.
+    """
+
+    def __init__(self, handler, debounce=0.25, on_error=None, clock=time.perf_counter):
+        self.handler = handler
+        self.on_error = on_error
+        self.debounce = debounce
+        self.clock = clock
+        self._queue = queue.Queue()
+        self._thread = None
+        self._last_handled = None
+
+        # Stats
+        self.presses = 0
+        self.handled = 0
+        self.coalesced = 0
+        self.queue_latency = LatencyHistogram()  # Hook to worker
+        self.float_latency = LatencyHistogram()  # Hook to float on screen
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='hotkey-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._queue.put(None)
+
+    def press(self, *args):
+        """Keyboard hook callback: do as little as possible"""
+        self._queue.put(self.clock())
+
+    def record_float(self, pressed_at):
+        """Note that the float for a press is now on screen"""
+        if pressed_at is not None:
+            self.float_latency.record((self.clock() - pressed_at) * 1000)
+
+    def _run(self):
+        while True:
+            pressed_at = self._queue.get()
+            if pressed_at is None:
+                return
+            self.presses += 1
+
+            # Coalesce presses that queued up while we were busy
+            while True:
+                try:
+                    extra = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if extra is None:
+                    return
+                self.presses += 1
+                self.coalesced += 1
+
+            # Key repeat while the chord is held fires again and again
+            if self._last_handled is not None and pressed_at - self._last_handled < self.debounce:
+                self.coalesced += 1
+                continue
+
+            self._last_handled = pressed_at
+            self.queue_latency.record((self.clock() - pressed_at) * 1000)
+            self.handled += 1
+            try:
+                self.handler(pressed_at)
+            except Exception as e:
+                # Keep the worker alive for the next press
+                if self.on_error is not None:
+                    self.on_error(e)
+
+    def stats(self):
+        return {
+            'presses': self.presses,
+            'handled': self.handled,
+            'coalesced': self.coalesced,
+            'queue_latency_ms': self.queue_latency.snapshot(),
+            'float_latency_ms': self.float_latency.snapshot(),
+        }
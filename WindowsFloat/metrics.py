@@ -0,0 +1,271 @@
+import bisect
+import functools
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter, deque
+
+from paths import app_data_dir
+
+# Histogram bucket upper bounds in milliseconds
+LATENCY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, float('inf'))
+# Longest a scrape waits for the UI thread to take its snapshot
+SNAPSHOT_TIMEOUT = 2.0
+
+
+def metrics_enabled(environ=os.environ):
+    """Timing is opt-in: set WINDOWSFLOAT_METRICS=1 to turn it on"""
+    return environ.get('WINDOWSFLOAT_METRICS', '') not in ('', '0')
+
+
+def default_metrics_path():
+    """Return the per-user file snapshots are appended to"""
+    return os.path.join(app_data_dir(), 'metrics.jsonl')
+
+
+class LatencyHistogram:
+    """Bucketed latency counts plus a window of recent samples for percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS, samples=256):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.recent = deque(maxlen=samples)
+        self.total = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, ms):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+            self.recent.append(ms)
+            self.total += 1
+            self.sum += ms
+            self.max = max(self.max, ms)
+
+    def percentile(self, p):
+        with self._lock:
+            samples = sorted(self.recent)
+        if not samples:
+            return 0.0
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total, total_ms, worst = self.total, self.sum, self.max
+        return {
+            'count': total,
+            'sum_ms': total_ms,
+            'max_ms': worst,
+            'buckets': {('+Inf' if b == float('inf') else b): c for b, c in zip(self.buckets, counts)},
+            'p50': self.percentile(50),
+            'p90': self.percentile(90),
+            'p99': self.percentile(99),
+        }
+
+
+def _metric_name(name):
+    return re.sub(r'[^a-zA-Z0-9_]', '_', str(name))
+
+
+def _flatten(prefix, value, out):
+    """Collect the numeric leaves of a nested stats dict"""
+    if isinstance(value, bool):
+        out[prefix] = int(value)
+    elif isinstance(value, (int, float)):
+        out[prefix] = value
+    elif isinstance(value, dict):
+        for key, item in value.items():
+            _flatten(f"{prefix}_{_metric_name(key)}", item, out)
+
+
+class Metrics:
+    """Timers, counters and error counts for the app's hot paths
+
+    Timers and counters only run when enabled; wrap() hands functions back
+    untouched otherwise, so there is no cost when instrumentation is off.
+    Errors are counted either way, since they replace silent swallows.
+    Components register their own stats() with add_source() and show up in
+    every snapshot.
+    """
+
+    def __init__(self, enabled=False, samples=1024, clock=time.perf_counter):
+        self.enabled = enabled
+        self.clock = clock
+        self.samples = deque(maxlen=samples)  # (wall time, name, ms)
+        self.timers = {}
+        self.counters = Counter()
+        self.errors = Counter()
+        self.last_errors = {}
+        self.sources = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def wrap(self, name, fn):
+        """Return fn timed under name, or fn itself if metrics are off"""
+        if not self.enabled:
+            return fn
+
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = self.clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.observe(name, (self.clock() - start) * 1000)
+
+        return timed
+
+    def observe(self, name, ms):
+        """Record a duration in milliseconds under name"""
+        if not self.enabled:
+            return
+        with self._lock:
+            timer = self.timers.get(name)
+            if timer is None:
+                timer = self.timers[name] = LatencyHistogram()
+            self.samples.append((time.time(), name, ms))
+        timer.record(ms)
+
+    def count(self, name, n=1):
+        if self.enabled:
+            with self._lock:
+                self.counters[name] += n
+
+    def error(self, where, exc):
+        """Count an exception we are choosing to survive"""
+        key = f"{where}:{type(exc).__name__}"
+        with self._lock:
+            self.errors[key] += 1
+            self.last_errors[key] = str(exc)
+
+    def add_source(self, name, stats):
+        """Include stats() from a component in every snapshot"""
+        self.sources[name] = stats
+
+    def snapshot(self):
+        with self._lock:
+            timers = dict(self.timers)
+            counters = dict(self.counters)
+            errors = dict(self.errors)
+            last_errors = dict(self.last_errors)
+            samples = list(self.samples)
+        sources = {}
+        for name, stats in list(self.sources.items()):
+            try:
+                sources[name] = stats()
+            except Exception as e:
+                self.error(f"stats.{name}", e)
+        return {
+            'time': time.time(),
+            'enabled': self.enabled,
+            'timers': {name: timer.snapshot() for name, timer in timers.items()},
+            'counters': counters,
+            'errors': errors,
+            'last_errors': last_errors,
+            'sources': sources,
+            'samples': samples,
+        }
+
+    def write_jsonl(self, path=None):
+        """Append a snapshot as one JSON line; returns the path written"""
+        path = path or default_metrics_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.snapshot(), default=str) + '\n')
+        return path
+
+    def prometheus(self, snapshot=None):
+        """Render a snapshot (by default the current one) in the Prometheus text format"""
+        snapshot = snapshot if snapshot is not None else self.snapshot()
+        lines = []
+        if snapshot['timers']:
+            lines.append('# TYPE windowsfloat_duration_ms histogram')
+        for name, timer in snapshot['timers'].items():
+            label = f'name="{_metric_name(name)}"'
+            cumulative = 0
+            for bound, count in timer['buckets'].items():
+                cumulative += count
+                lines.append(f'windowsfloat_duration_ms_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f'windowsfloat_duration_ms_sum{{{label}}} {timer["sum_ms"]}')
+            lines.append(f'windowsfloat_duration_ms_count{{{label}}} {timer["count"]}')
+        if snapshot['counters']:
+            lines.append('# TYPE windowsfloat_events_total counter')
+        for name, count in snapshot['counters'].items():
+            lines.append(f'windowsfloat_events_total{{name="{_metric_name(name)}"}} {count}')
+        if snapshot['errors']:
+            lines.append('# TYPE windowsfloat_errors_total counter')
+        for key, count in snapshot['errors'].items():
+            where, kind = key.rsplit(':', 1)
+            lines.append(f'windowsfloat_errors_total{{where="{_metric_name(where)}",type="{kind}"}} {count}')
+        gauges = {}
+        for name, stats in snapshot['sources'].items():
+            _flatten(f"windowsfloat_{_metric_name(name)}", stats, gauges)
+        for name, value in gauges.items():
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot_via(self, post, timeout=SNAPSHOT_TIMEOUT):
+        """Take a snapshot on the thread post(callback) runs callbacks on; None if it doesn't within timeout
+
+        The sources read state owned by that thread (the UI thread's floats
+        and photo sets), which can't safely be walked while it changes them.
+        """
+        taken = []
+        ready = threading.Event()
+
+        def take():
+            try:
+                taken.append(self.snapshot())
+            finally:
+                ready.set()
+
+        post(take)
+        ready.wait(timeout)
+        return taken[0] if taken else None
+
+    def serve(self, port=0, host='127.0.0.1', post=None):
+        """Serve /metrics (Prometheus text) and /snapshot (JSON) on localhost; returns the port
+
+        With post, snapshots are taken on the thread that owns the sources (see snapshot_via).
+        """
+        # Only imported when asked for; http.server is slow to import
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/metrics', '/snapshot'):
+                    self.send_error(404)
+                    return
+                snapshot = metrics.snapshot_via(post) if post is not None else metrics.snapshot()
+                if snapshot is None:
+                    self.send_error(503, 'UI thread busy')
+                    return
+                if self.path == '/metrics':
+                    body, kind = metrics.prometheus(snapshot), 'text/plain; version=0.0.4'
+                else:
+                    body, kind = json.dumps(snapshot, default=str), 'application/json'
+                data = body.encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', kind)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name='metrics-server', daemon=True).start()
+        return self._server.server_address[1]
+
+    def close(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
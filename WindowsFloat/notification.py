@@ -0,0 +1,93 @@
+import tkinter as tk
+import tkinter.font as tkfont
+
+from floats import set_window_attribute
+
+NOTIFICATION_MS = 2000
+
+
+class NotificationWindow:
+    """The one small label window every notification is shown in
+
+    It is created once, withdrawn, and from then on only retexted, moved
+    and shown or hidden. A single dismissal timer is restarted by every
+    show(), so an older notification's timer never hides a newer one.
+    """
+
+    def __init__(self, master, font=('Arial', 9), padx=10, pady=5, bg='#333333', fg='white'):
+        self.window = tk.Toplevel(master)
+        self.window.withdraw()
+        self.window.overrideredirect(True)
+        self.window.attributes('-topmost', True)
+        set_window_attribute(self.window, "-toolwindow", 1)
+        self.window.configure(bg=bg)
+
+        self.label = tk.Label(self.window, text='', fg=fg, bg=bg, padx=padx, pady=pady, bd=0, font=font)
+        self.label.pack()
+        self.font = tkfont.Font(root=master, font=font)
+        self.padding = (2 * padx, 2 * pady)
+
+        self.visible = False
+        self.text = None
+        self.position = None
+        self._after_id = None
+        self._measured = {}
+
+        # Stats
+        self.shown = 0
+        self.retexts = 0
+        self.moves = 0
+
+    def measure(self, text):
+        """Return the (width, height) in pixels the notification takes up for text"""
+        size = self._measured.get(text)
+        if size is None:
+            lines = text.split('\n')
+            width = max(self.font.measure(line) for line in lines) + self.padding[0]
+            height = self.font.metrics('linespace') * len(lines) + self.padding[1]
+            if len(self._measured) > 64:
+                self._measured.clear()
+            size = self._measured[text] = (width, height)
+        return size
+
+    def show(self, text, x, y, duration_ms=NOTIFICATION_MS):
+        """Show text at (x, y) and hide it again after duration_ms"""
+        self.shown += 1
+        if text != self.text:
+            self.label.configure(text=text)
+            self.text = text
+            self.retexts += 1
+        if (x, y) != self.position:
+            self.window.geometry(f"+{x}+{y}")
+            self.position = (x, y)
+            self.moves += 1
+        if not self.visible:
+            self.window.deiconify()
+            self.visible = True
+        self.window.lift()
+
+        self._cancel_timer()
+        self._after_id = self.window.after(duration_ms, self.hide)
+
+    def hide(self):
+        self._cancel_timer()
+        if self.visible:
+            self.window.withdraw()
+            self.visible = False
+
+    def _cancel_timer(self):
+        if self._after_id is not None:
+            self.window.after_cancel(self._after_id)
+            self._after_id = None
+
+    def destroy(self):
+        self._cancel_timer()
+        self.window.destroy()
+
+    def stats(self):
+        return {
+            'shown': self.shown,
+            'retexts': self.retexts,
+            'moves': self.moves,
+            'visible': self.visible,
+        }
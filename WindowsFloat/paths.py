@@ -0,0 +1,10 @@
+import os
+
+
+def app_data_dir():
+    """Return the per-user directory the app keeps its files in
+
+    %LOCALAPPDATA%\\WindowsFloat on Windows, ~/.cache/WindowsFloat elsewhere.
+    """
+    base = os.environ.get('LOCALAPPDATA') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'WindowsFloat')
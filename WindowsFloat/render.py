@@ -0,0 +1,69 @@
+import tkinter as tk
+
+
+class CanvasRenderer:
+    """Draws frames into one persistent canvas image item, with overlays kept on top"""
+
+    OVERLAY_TAG = "overlay"
+
+    def __init__(self, canvas, width, height):
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        self.image_item = None
+        self.current_image = None
+
+        # Stats
+        self.frames_rendered = 0
+        self.frames_dropped = 0
+
+    def set_size(self, width, height):
+        """Re-center the image and overlays for a new canvas size"""
+        dx = width // 2 - self.width // 2
+        dy = height // 2 - self.height // 2
+        self.width, self.height = width, height
+        if self.image_item is not None:
+            self.canvas.coords(self.image_item, width // 2, height // 2)
+        self.canvas.move(self.OVERLAY_TAG, dx, dy)
+
+    def show(self, image):
+        """Display a frame, reusing the existing canvas item"""
+        if self.image_item is None:
+            self.image_item = self.canvas.create_image(
+                self.width // 2,
+                self.height // 2,
+                image=image,
+                anchor=tk.CENTER
+            )
+            # Keep overlays above the animation
+            self.canvas.tag_raise(self.OVERLAY_TAG)
+        elif image is not self.current_image:
+            self.canvas.itemconfig(self.image_item, image=image)
+
+        self.current_image = image
+        self.frames_rendered += 1
+
+    def drop(self, count=1):
+        """Record frames that were skipped instead of drawn"""
+        self.frames_dropped += count
+
+    def add_text(self, tag, text, **options):
+        """Draw a text overlay that stays on top of the animation"""
+        self.canvas.delete(tag)
+        return self.canvas.create_text(
+            self.width // 2,
+            self.height // 2,
+            text=text,
+            tags=(tag, self.OVERLAY_TAG),
+            **options
+        )
+
+    def remove(self, tag):
+        """Remove an overlay"""
+        self.canvas.delete(tag)
+
+    def stats(self):
+        return {
+            'frames_rendered': self.frames_rendered,
+            'frames_dropped': self.frames_dropped,
+        }
@@ -0,0 +1,195 @@
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from frames import scale_frames, share_repeats
+
+
+def refine_order(source, start):
+    """Yield (index, frame) from start to the end of source, then from the beginning up to start
+
+    Walks to the end instead of asking len(), which for a FrameSource would
+    compare every frame before the first one could be scaled.
+    """
+    index = start
+    while True:
+        try:
+            frame = source[index]
+        except IndexError:
+            break
+        yield index, frame
+        index += 1
+    for index in range(min(start, index)):
+        yield index, source[index]
+
+
+class FrameResizer:
+    """Rescales frame sets on worker threads and hands the results back to the UI thread"""
+
+    def __init__(self, post, cache=None, workers=2, chunk_size=8):
+        # post(callback) must run callback on the UI thread, e.g. root.after(0, ...)
+        self.post = post
+        self.cache = cache
+        self.chunk_size = chunk_size
+        # One thread walks the GIF in order, the pool scales the decoded chunks
+        self._decoder = ThreadPoolExecutor(max_workers=1, thread_name_prefix='decode')
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resize')
+        self._tokens = itertools.count()
+        self._live = set()
+        self._lock = threading.Lock()
+
+        # Stats for the progressive pass
+        self.refines = 0
+        self.refined_frames = 0
+        self.refine_ms = 0.0
+
+    def resize(self, source, size, on_done, key=None, supersede=True, on_error=None, **settings):
+        """Scale every frame of source in the background and call on_done(frames) on the UI thread
+
+        Unless supersede is False, a newer request supersedes any that are
+        still running and their results are dropped. If the resize fails,
+        on_error(exc) runs on the UI thread instead; without one the
+        exception is raised there, for Tk to report.
+        """
+        with self._lock:
+            generation = next(self._tokens)
+            if supersede:
+                self._live.clear()
+            self._live.add(generation)
+
+        future = self._decoder.submit(self._run, generation, source, size, key, settings)
+        future.add_done_callback(lambda f: self.post(lambda: self._deliver(generation, f, on_done, on_error)))
+        return future
+
+    def refine(self, source, size, on_frames, on_done=None, key=None, start=0, on_error=None, **settings):
+        """Scale every frame of source in the background, beginning at frame start and wrapping around
+
+        on_frames(indices, frames) runs on the UI thread for each chunk as soon
+        as it is scaled, so the frames about to be shown are swapped in first;
+        on_done(frames) gets the whole set, or on_error(exc) the failure, as
+        with resize(). Never supersedes other requests; cancel() drops the
+        rest of it.
+        """
+        with self._lock:
+            generation = next(self._tokens)
+            self._live.add(generation)
+            self.refines += 1
+
+        future = self._decoder.submit(self._run_refine, generation, source, size, on_frames, key, start, settings)
+        on_done = on_done or (lambda frames: None)
+        future.add_done_callback(lambda f: self.post(lambda: self._deliver(generation, f, on_done, on_error)))
+        return future
+
+    def _run_refine(self, generation, source, size, on_frames, key, start, settings):
+        order = refine_order(source, start)
+        pending = []
+        count, chunk_size = 0, 1
+        while True:
+            # Chunks start at one frame and double, so the next frames on screen are refined first
+            indices, chunk = [], []
+            for index, frame in itertools.islice(order, chunk_size):
+                if not self.is_current(generation):
+                    return None
+                indices.append(index)
+                chunk.append(frame)
+            if not chunk:
+                break
+            count = max(count, indices[-1] + 1)
+            chunk_size = min(chunk_size * 2, self.chunk_size)
+            part = self._pool.submit(self._refine_chunk, generation, chunk, size, settings)
+            part.add_done_callback(lambda f, indices=indices: self._post_chunk(generation, f, indices, on_frames))
+            pending.append((indices, part))
+
+        frames = [None] * count
+        for indices, part in pending:
+            for index, frame in zip(indices, part.result()):
+                frames[index] = frame
+        share_repeats(frames, getattr(source, 'aliases', None) or {})
+        if self.cache is not None and key is not None and self.is_current(generation):
+            self.cache.put(key, frames)
+        return frames
+
+    def _refine_chunk(self, generation, chunk, size, settings):
+        if not self.is_current(generation):
+            return [None] * len(chunk)
+        started = time.perf_counter()
+        frames = scale_frames(chunk, size, **settings)
+        with self._lock:
+            self.refined_frames += len(frames)
+            self.refine_ms += (time.perf_counter() - started) * 1000
+        return frames
+
+    def _post_chunk(self, generation, future, indices, on_frames):
+        if future.cancelled() or future.exception() is not None:
+            return
+        frames = future.result()
+
+        def deliver():
+            if self.is_current(generation):
+                on_frames(indices, frames)
+        self.post(deliver)
+
+    def is_current(self, generation):
+        with self._lock:
+            return generation in self._live
+
+    def _run(self, generation, source, size, key, settings):
+        chunk, pending = [], []
+        for frame in source:
+            if not self.is_current(generation):
+                return None
+            chunk.append(frame)
+            if len(chunk) == self.chunk_size:
+                pending.append(self._pool.submit(scale_frames, chunk, size, **settings))
+                chunk = []
+        if chunk:
+            pending.append(self._pool.submit(scale_frames, chunk, size, **settings))
+
+        frames = []
+        for part in pending:
+            frames.extend(part.result())
+        share_repeats(frames, getattr(source, 'aliases', None) or {})
+
+        # Remember the set so switching back is a cache lookup
+        if self.cache is not None and key is not None:
+            self.cache.put(key, frames)
+        return frames
+
+    def _deliver(self, generation, future, on_done, on_error):
+        with self._lock:
+            current = generation in self._live
+            self._live.discard(generation)
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            # Even a superseded request's failure is reported, so nothing waits on it forever
+            if on_error is None:
+                raise error
+            on_error(error)
+            return
+        if not current:
+            return
+        frames = future.result()
+        if frames is not None:
+            on_done(frames)
+
+    def cancel(self):
+        """Drop the result of any request still in flight"""
+        with self._lock:
+            self._live.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'refines': self.refines,
+                'refined_frames': self.refined_frames,
+                'refine_ms': self.refine_ms,
+            }
+
+    def shutdown(self):
+        """Stop accepting work and drop anything still queued"""
+        self.cancel()
+        self._decoder.shutdown(wait=False)
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,154 @@
+import time
+import tkinter as tk
+from collections import deque
+
+# GIFs often leave the delay at 0; browsers show those frames for 100ms too
+DEFAULT_DURATION = 100
+MIN_DURATION = 20
+
+
+class AnimationScheduler:
+    """Owns the single animation loop and times it against a monotonic clock
+
+    after/after_cancel are the Tk root's methods (or anything that behaves like
+    them). on_frame(index) draws a frame; on_skip(count) is told about frames
+    that were skipped because the loop fell behind. A tick that can't be
+    cancelled (the root is already gone) goes to on_error(exc).
+    """
+
+    def __init__(self, after, after_cancel, on_frame, on_skip=None, clock=time.monotonic, samples=240,
+                 on_error=None):
+        self.after = after
+        self.after_cancel = after_cancel
+        self.on_frame = on_frame
+        self.on_skip = on_skip
+        self.on_error = on_error
+        self.clock = clock
+        self.speed_multiplier = 1.0
+        self.durations = []
+        self.index = 0
+        self.after_id = None
+        self._deadline = None
+        self.suspended = False
+        self._suspended_at = None
+
+        # Stats
+        self.ticks = 0
+        self.skipped = 0
+        self.suspends = 0
+        self.suspended_seconds = 0.0
+        self.lateness = deque(maxlen=samples)
+
+    @property
+    def running(self):
+        return self.after_id is not None
+
+    def start(self, durations, frame=0):
+        """(Re)start the loop with a new list of frame durations in milliseconds"""
+        self.stop()
+        if not durations:
+            return
+        self.durations = [d if d else DEFAULT_DURATION for d in durations]
+        self.index = frame % len(self.durations)
+        self._deadline = self.clock()
+        if not self.suspended:
+            self.after_id = self.after(0, self._tick)
+
+    def resume(self):
+        """Continue from the current frame after stop()"""
+        if self.durations and not self.running:
+            self.start(self.durations, self.index)
+
+    def stop(self):
+        """Cancel the pending tick, if any"""
+        if self.after_id is not None:
+            try:
+                self.after_cancel(self.after_id)
+            except tk.TclError as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+            self.after_id = None
+
+    def suspend(self):
+        """Stop ticking, with nothing left scheduled, until unsuspend()
+
+        start() meanwhile only records where the animation begins.
+        """
+        if self.suspended:
+            return
+        self.suspended = True
+        self._suspended_at = self.clock()
+        self.suspends += 1
+        self.stop()
+
+    def unsuspend(self):
+        """Start ticking again at the frame that would be showing had the loop kept running"""
+        if not self.suspended:
+            return
+        self.suspended = False
+        now = self.clock()
+        self.suspended_seconds += now - self._suspended_at
+        if self.durations and self._deadline is not None:
+            loop = sum(self.frame_time(i) for i in range(len(self.durations)))
+            behind = max(0.0, now - self._deadline) % loop
+            while behind >= self.frame_time(self.index):
+                behind -= self.frame_time(self.index)
+                self.index = (self.index + 1) % len(self.durations)
+        self.resume()
+
+    def set_speed(self, multiplier):
+        self.speed_multiplier = multiplier
+
+    def frame_time(self, index):
+        """Display time of a frame in seconds at the current speed"""
+        return max(self.durations[index], MIN_DURATION) / self.speed_multiplier / 1000
+
+    def _advance(self):
+        self._deadline += self.frame_time(self.index)
+        self.index = (self.index + 1) % len(self.durations)
+
+    def _tick(self):
+        now = self.clock()
+
+        # Skip frames whose whole display slot has already passed
+        skipped = 0
+        while now - self._deadline >= self.frame_time(self.index):
+            self._advance()
+            skipped += 1
+            if skipped >= len(self.durations):
+                # More than a full loop behind (e.g. after a sleep), so start over from now
+                self._deadline = now
+                break
+
+        if skipped:
+            self.skipped += skipped
+            if self.on_skip is not None:
+                self.on_skip(skipped)
+
+        self.lateness.append(now - self._deadline)
+        self.ticks += 1
+        self.on_frame(self.index)
+
+        # Schedule against the deadline rather than relative to now, so delays don't add up
+        self._advance()
+        delay = max(0, int(round((self._deadline - self.clock()) * 1000)))
+        self.after_id = self.after(delay, self._tick)
+
+    def stats(self):
+        """Return tick, skip, jitter and drift stats in milliseconds"""
+        samples = [late * 1000 for late in self.lateness]
+        mean = sum(samples) / len(samples) if samples else 0.0
+        jitter = (sum((s - mean) ** 2 for s in samples) / len(samples)) ** 0.5 if samples else 0.0
+        return {
+            'ticks': self.ticks,
+            'skipped': self.skipped,
+            'lateness_ms_mean': mean,
+            'lateness_ms_max': max(samples) if samples else 0.0,
+            'jitter_ms': jitter,
+            'drift_ms': samples[-1] if samples else 0.0,
+            'running': self.running,
+            'suspended': self.suspended,
+            'suspends': self.suspends,
+            'suspended_seconds': self.suspended_seconds + (
+                self.clock() - self._suspended_at if self.suspended else 0.0),
+        }
@@ -0,0 +1,179 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from backend import WindowGoneError
+from paths import app_data_dir
+
+STATE_VERSION = 1
+
+# Changes are written once things have been quiet this long, but never later than MAX_DELAY_MS
+SAVE_DELAY_MS = 1000
+MAX_DELAY_MS = 5000
+
+
+def default_state_path():
+    """Return the per-user file the app's state is kept in"""
+    return os.path.join(app_data_dir(), 'state.json')
+
+
+def write_atomic(path, data):
+    """Write bytes so that path holds either the old or the new contents, even after a crash"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def match_windows(saved, windows):
+    """Pair saved floats with live windows; returns [(entry, WindowInfo)]
+
+    A window matches by handle if its process and class are unchanged
+    (handles get reused), otherwise by process, class and title. Each
+    window is claimed once. windows is one enum_windows() result.
+    """
+    by_hwnd = {w.hwnd: w for w in windows}
+    by_identity = {}
+    for window in windows:
+        by_identity.setdefault((window.process, window.class_name, window.title), []).append(window)
+
+    claimed = set()
+    matches = []
+    rest = []
+    for entry in saved:
+        window = by_hwnd.get(entry.get('hwnd'))
+        if (window is not None and window.process == entry.get('process')
+                and window.class_name == entry.get('class_name')):
+            claimed.add(window.hwnd)
+            matches.append((entry, window))
+        else:
+            rest.append(entry)
+    for entry in rest:
+        candidates = by_identity.get((entry.get('process'), entry.get('class_name'), entry.get('title')), [])
+        window = next((w for w in candidates if w.hwnd not in claimed), None)
+        if window is not None:
+            claimed.add(window.hwnd)
+            matches.append((entry, window))
+    return matches
+
+
+class StateStore:
+    """The app's settings and floated windows, kept in one JSON file
+
+    save(snapshot) may be called on every change: the snapshot is written
+    once changes have stopped for delay_ms (or max_delay_ms after the first
+    unsaved one), on a thread of its own. after/after_cancel are the Tk
+    root's. identify(hwnd) returns the WindowInfo of a float whose process
+    and class aren't known yet; it runs on the writer thread.
+    """
+
+    def __init__(self, after, after_cancel, path=None, identify=None, delay_ms=SAVE_DELAY_MS,
+                 max_delay_ms=MAX_DELAY_MS, clock=time.monotonic):
+        self.after = after
+        self.after_cancel = after_cancel
+        self.path = path or default_state_path()
+        self.identify = identify
+        self.delay_ms = delay_ms
+        self.max_delay_ms = max_delay_ms
+        self.clock = clock
+        self._pending = None
+        self._dirty_since = None
+        self._after_id = None
+        self._identities = {}  # {hwnd: (process, class_name)}, writer thread only
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='state')
+
+        # Stats
+        self.requests = 0
+        self.writes = 0
+        self.write_errors = 0
+        self.write_ms = 0.0
+
+    def load(self):
+        """Return the saved state, or None if there is none or it can't be read"""
+        try:
+            with open(self.path, 'rb') as f:
+                state = json.loads(f.read().decode('utf-8'))
+        except (OSError, ValueError):
+            return None
+        if not isinstance(state, dict) or state.get('version') != STATE_VERSION:
+            return None
+        return state
+
+    def save(self, snapshot):
+        """Write snapshot soon, replacing any snapshot still waiting (UI thread)"""
+        self.requests += 1
+        self._pending = snapshot
+        now = self.clock()
+        if self._dirty_since is None:
+            self._dirty_since = now
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+        waited_ms = (now - self._dirty_since) * 1000
+        self._after_id = self.after(int(max(0, min(self.delay_ms, self.max_delay_ms - waited_ms))), self.flush)
+
+    def flush(self, wait=False):
+        """Write the waiting snapshot now; with wait, return once it is on disk"""
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        snapshot, self._pending, self._dirty_since = self._pending, None, None
+        if snapshot is None:
+            return
+        future = self._writer.submit(self._write, snapshot)
+        if wait:
+            future.result()
+
+    def _write(self, snapshot):
+        start = time.perf_counter()
+        floats = snapshot.get('floats', [])
+        for entry in floats:
+            self._identify(entry)
+        # Windows closed since the snapshot are dropped rather than saved without an identity
+        snapshot = dict(snapshot, version=STATE_VERSION, floats=[e for e in floats if e.get('process') is not None])
+        live = {entry['hwnd'] for entry in floats}
+        for hwnd in list(self._identities):
+            if hwnd not in live:
+                del self._identities[hwnd]
+        try:
+            write_atomic(self.path, json.dumps(snapshot, indent=1).encode('utf-8'))
+        except OSError:
+            with self._lock:
+                self.write_errors += 1
+            return
+        with self._lock:
+            self.writes += 1
+            self.write_ms += (time.perf_counter() - start) * 1000
+
+    def _identify(self, entry):
+        if entry.get('process') is not None:
+            self._identities[entry['hwnd']] = (entry['process'], entry['class_name'])
+            return
+        identity = self._identities.get(entry['hwnd'])
+        if identity is None and self.identify is not None:
+            try:
+                info = self.identify(entry['hwnd'])
+            except WindowGoneError:
+                return
+            identity = self._identities[entry['hwnd']] = (info.process, info.class_name)
+        if identity is not None:
+            entry['process'], entry['class_name'] = identity
+
+    def close(self):
+        """Write anything waiting and stop the writer"""
+        self.flush(wait=True)
+        self._writer.shutdown(wait=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'writes': self.writes,
+                'write_errors': self.write_errors,
+                'write_ms': self.write_ms,
+            }
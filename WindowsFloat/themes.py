@@ -0,0 +1,264 @@
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from atlas import AtlasFrames
+from bundle import bundle_path, read_bundle
+from framecache import FrameCache
+from frames import (FrameSource, gif_digest, render_frames, scale_frame, tray_frame,
+                    DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+
+# Extra animations live here, one GIF (and optionally its bundle) per theme
+DEFAULT_THEME_DIR = 'themes'
+
+# Frame memory inactive themes may keep before the least recently used are dropped
+DEFAULT_THEME_BUDGET = 64 << 20
+
+
+def theme_budget(environ=os.environ):
+    """Read the budget for inactive themes from WINDOWSFLOAT_THEME_BUDGET_MB"""
+    try:
+        return int(float(environ['WINDOWSFLOAT_THEME_BUDGET_MB']) * 2**20)
+    except (KeyError, ValueError):
+        return DEFAULT_THEME_BUDGET
+
+
+def scan_themes(directory, default_path):
+    """Return {name: GIF path}, the default GIF first, then the theme directory's GIFs by name"""
+    themes = OrderedDict()
+    themes[os.path.splitext(os.path.basename(default_path))[0]] = default_path
+    try:
+        names = sorted(os.listdir(directory))
+    except OSError:
+        names = []
+    for filename in names:
+        name, ext = os.path.splitext(filename)
+        if ext.lower() == '.gif' and name not in themes:
+            themes[name] = os.path.join(directory, filename)
+    return themes
+
+
+def _frame_bytes(frames):
+    # Mapped atlas sets count at their full size too: the pages shown stay in, and the mapping holds the file open
+    if isinstance(frames, AtlasFrames):
+        return frames.nbytes
+    if not isinstance(frames, list) or not frames:
+        return 0
+    width, height = frames[0].size
+    return width * height * 4 * len(frames)
+
+
+class Theme:
+    """One animation, with everything needed to swap it into the running app"""
+
+    def __init__(self, name, path, digest, durations, tray_frames, source=None, frame_sets=None, atlas=None):
+        self.name = name
+        self.path = path
+        self.digest = digest
+        self.durations = durations
+        self.tray_frames = tray_frames
+        self.source = source  # Full-size frames for scaling new sizes
+        self.frame_sets = frame_sets or {}  # {size: frames}
+        self.atlas = atlas  # The bundle mapping the frames come from, if any
+
+    @property
+    def nbytes(self):
+        """Frame memory this theme keeps alive"""
+        return _frame_bytes(self.tray_frames) + sum(_frame_bytes(f) for f in self.frame_sets.values())
+
+    def close(self, keep=None):
+        """Close the source and unmap the bundle, except what keep (the theme replacing this one) still uses"""
+        if self.source is not None and (keep is None or keep.source is not self.source):
+            self.source.close()
+        if self.atlas is not None and (keep is None or keep.atlas is not self.atlas):
+            self.atlas.close()
+
+
+def load_theme(name, path, sizes, cache):
+    """Decode a GIF (or map its bundle) and scale it to every size, in one pass
+
+    Scaled sets already in the cache are reused; new ones are added to it.
+    """
+    digest = gif_digest(path)
+    bundle = read_bundle(bundle_path(path), digest)
+    if bundle is not None:
+        durations, tray_frames, atlas = bundle.durations, bundle.tray_frames, bundle.atlas
+        source = bundle.source if bundle.source is not None else FrameSource(path)
+        frame_sets = dict(bundle.frame_sets)
+    else:
+        durations, tray_frames, atlas, source, frame_sets = None, None, None, FrameSource(path), {}
+        cached = cache.get_tray(digest)
+        if cached is not None:
+            tray_frames, durations = cached
+
+    keys = {size: FrameCache.make_key(digest, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+            for size in sizes}
+    missing = []
+    for size in sizes:
+        if size not in frame_sets:
+            cached = cache.get(keys[size])
+            if cached is None:
+                missing.append(size)
+            else:
+                frame_sets[size] = cached
+
+    renderers = [] if tray_frames is not None else [tray_frame]
+    renderers += [
+        lambda frame, size=size: scale_frame(frame, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+        for size in missing
+    ]
+    built_tray = tray_frames is None
+    if renderers:
+        outputs = render_frames(source, renderers)
+        if built_tray:
+            tray_frames = outputs.pop(0)
+        for size, frames in zip(missing, outputs):
+            frame_sets[size] = frames
+            cache.put(keys[size], frames)
+
+    if durations is None:
+        durations = source.durations()
+    if built_tray:
+        cache.put_tray(digest, tray_frames, durations)
+    return Theme(name, path, digest, durations, tray_frames, source, frame_sets, atlas)
+
+
+class ThemeLibrary:
+    """The available themes, the ones loaded so far, and a worker that preloads them
+
+    Only the UI thread uses a library; loading runs on the worker and
+    post(callback) hands the result back, like FrameResizer does.
+    Inactive themes are kept, most recently used first, until their
+    frames exceed budget bytes. Every failed load also goes to
+    on_error(exc), on the UI thread.
+    """
+
+    def __init__(self, paths, cache, post, budget=DEFAULT_THEME_BUDGET, on_error=None):
+        self.paths = paths  # {name: GIF path}
+        self.cache = cache
+        self.post = post
+        self.budget = budget
+        self.on_error = on_error
+        self._themes = OrderedDict()  # Least recently used first
+        self.active = None
+        self._loading = {}  # {name: [(on_done, on_error)]}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='themes')
+
+        # Stats
+        self.loads = 0
+        self.load_ms = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_errors = 0
+
+    def names(self):
+        return list(self.paths)
+
+    def next_name(self, name):
+        """The theme after name, wrapping around"""
+        names = self.names()
+        return names[(names.index(name) + 1) % len(names)] if name in names else names[0]
+
+    def get(self, name):
+        """Return the loaded theme, or None"""
+        theme = self._themes.get(name)
+        if theme is None:
+            self.misses += 1
+            return None
+        self._themes.move_to_end(name)
+        self.hits += 1
+        return theme
+
+    def add(self, theme):
+        """Keep a theme as the most recently used"""
+        old = self._themes.get(theme.name)
+        if old is not None and old is not theme:
+            old.close(keep=theme)
+        self._themes[theme.name] = theme
+        self._themes.move_to_end(theme.name)
+
+    def activate(self, theme, previous=None):
+        """Record the theme now shown, keeping the one it replaces for a quick swap back"""
+        if previous is not None:
+            self.add(previous)
+        self.add(theme)
+        self.active = theme.name
+        self.evict()
+
+    def preload(self, name, sizes, on_done=None, on_error=None):
+        """Load a theme in the background, scaled to sizes
+
+        on_done(theme), or on_error(exc) if it can't be loaded, runs on the UI thread.
+        """
+        theme = self._themes.get(name)
+        if theme is not None and all(size in theme.frame_sets for size in sizes):
+            if on_done is not None:
+                on_done(theme)
+            return
+        callbacks = self._loading.get(name)
+        if callbacks is not None:
+            callbacks.append((on_done, on_error))
+            return
+        self._loading[name] = [(on_done, on_error)]
+        future = self._executor.submit(self._load, name, self.paths[name], sorted(set(sizes)))
+        future.add_done_callback(lambda f: self.post(lambda: self._loaded(name, f)))
+
+    def _load(self, name, path, sizes):
+        start = time.perf_counter()
+        theme = load_theme(name, path, sizes, self.cache)
+        return theme, (time.perf_counter() - start) * 1000
+
+    def _loaded(self, name, future):
+        callbacks = self._loading.pop(name, [])
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            self.load_errors += 1
+            if self.on_error is not None:
+                self.on_error(error)
+            for _, on_error in callbacks:
+                if on_error is not None:
+                    on_error(error)
+            return
+        theme, elapsed = future.result()
+        self.loads += 1
+        self.load_ms += elapsed
+        self.add(theme)
+        self.evict()
+        for on_done, _ in callbacks:
+            if on_done is not None:
+                on_done(theme)
+
+    def evict(self):
+        """Drop the least recently used inactive themes until the rest fit the budget"""
+        inactive = [name for name in self._themes if name != self.active]
+        total = sum(self._themes[name].nbytes for name in inactive)
+        for name in inactive:
+            if total <= self.budget:
+                break
+            theme = self._themes.pop(name)
+            total -= theme.nbytes
+            theme.close()
+            # The scaled sets stay on disk, so loading it again is quick
+            self.cache.forget(theme.digest)
+            self.evictions += 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        return {
+            'available': len(self.paths),
+            'loaded': len(self._themes),
+            'loaded_bytes': sum(theme.nbytes for theme in self._themes.values()),
+            'budget_bytes': self.budget,
+            'loads': self.loads,
+            'load_ms': self.load_ms,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'load_errors': self.load_errors,
+        }
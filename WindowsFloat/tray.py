@@ -0,0 +1,226 @@
+import os
+import tempfile
+import threading
+import time
+
+
+class PillowIconEncoder:
+    """Hands PIL images to pystray as they are (works with every backend)"""
+
+    def encode(self, frame):
+        return frame
+
+    def apply(self, icon, encoded):
+        icon.icon = encoded
+
+    def release(self, encoded):
+        pass
+
+
+class Win32IconEncoder:
+    """Turns each frame into an HICON once and updates the tray with it directly
+
+    Setting icon.icon makes pystray's win32 backend write a temporary .ico
+    file and load it again on every frame, so we skip that and send
+    NIM_MODIFY with our own handles instead. That goes through pystray's
+    private icon._message(); should it be missing or take other arguments,
+    the frames go through icon.icon like PillowIconEncoder from then on.
+    """
+
+    def __init__(self):
+        import win32con
+        import win32gui
+        self.win32con = win32con
+        self.win32gui = win32gui
+        self.direct = True
+
+    def encode(self, frame):
+        fd, path = tempfile.mkstemp(suffix='.ico')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                frame.save(f, format='ICO', sizes=[frame.size])
+            hicon = self.win32gui.LoadImage(
+                None, path, self.win32con.IMAGE_ICON, 0, 0,
+                self.win32con.LR_DEFAULTSIZE | self.win32con.LR_LOADFROMFILE
+            )
+        finally:
+            os.remove(path)
+        return hicon, frame
+
+    def apply(self, icon, encoded):
+        hicon, frame = encoded
+        if self.direct:
+            try:
+                # pystray keeps its own handle for the first frame; we never replace it
+                icon._message(self.win32gui.NIM_MODIFY, self.win32gui.NIF_ICON, hIcon=hicon)
+                return
+            except (AttributeError, TypeError):
+                self.direct = False  # Not the pystray this was written against
+        icon.icon = frame
+
+    def release(self, encoded):
+        try:
+            self.win32gui.DestroyIcon(encoded[0])
+        except Exception:
+            pass
+
+
+def encoder_for(icon):
+    """Pick the fastest encoder the icon's pystray backend supports"""
+    if type(icon).__module__.endswith('_win32') and callable(getattr(icon, '_message', None)):
+        try:
+            return Win32IconEncoder()
+        except ImportError:
+            pass
+    return PillowIconEncoder()
+
+
+class TrayAnimator:
+    """Animates the tray icon on its own thread, slowing down or pausing when nobody is around
+
+    idle_seconds() returns how long the user has been idle and on_battery()
+    whether we are running on battery; both are optional. After active_for
+    seconds without a poke(), or while idle or on battery, the animation runs
+    at low_power_fps, or pauses entirely if that is 0. Failures of those
+    checks go to on_error(exc).
+    """
+
+    def __init__(self, icon, frames, durations, encoder=None, idle_seconds=None, on_battery=None,
+                 idle_after=300, active_for=None, low_power_fps=0, poll_interval=5.0,
+                 on_error=None, clock=time.monotonic):
+        self.icon = icon
+        self.frames = frames
+        self.durations = [d if d else 100 for d in durations] or [100]
+        self.encoder = encoder if encoder is not None else encoder_for(icon)
+        self.idle_seconds = idle_seconds
+        self.on_battery = on_battery
+        self.idle_after = idle_after
+        self.active_for = active_for
+        self.low_power_fps = low_power_fps
+        self.poll_interval = poll_interval
+        self.on_error = on_error
+        self.clock = clock
+
+        self.encoded = []
+        self.index = 0
+        self._frames_changed = True  # Encode on the animation thread
+        self._running = False
+        self._woken = False  # Set by stop(), set_frames() and poke() so no wake-up is missed
+        self._last_poke = clock()
+        self._wake = threading.Condition()
+        self._thread = None
+
+        # Stats
+        self.updates = 0
+        self.paused_waits = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='tray-animation', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the animation; returns as soon as the thread has noticed
+
+        The thread releases the encoded frames as it exits, so they are
+        never released while it may still be applying one, even if the
+        join times out.
+        """
+        with self._wake:
+            self._running = False
+            self._wake_up()
+        if self._thread is None:
+            self._release()
+        elif self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def _release(self):
+        for encoded in self.encoded:
+            self.encoder.release(encoded)
+        self.encoded = []
+
+    def set_frames(self, frames, durations):
+        """Swap in a new animation, e.g. the whole GIF once startup has finished"""
+        with self._wake:
+            self.frames = frames
+            self.durations = [d if d else 100 for d in durations] or [100]
+            self._frames_changed = True
+            self._wake_up()
+
+    def poke(self):
+        """Note user activity so the full frame rate resumes"""
+        with self._wake:
+            self._last_poke = self.clock()
+            self._wake_up()
+
+    def _wake_up(self):
+        # Call with _wake held
+        self._woken = True
+        self._wake.notify_all()
+
+    def _sleep(self, seconds):
+        """Wait up to seconds, or until woken; doesn't wait at all if woken since the last sleep"""
+        with self._wake:
+            if self._running:
+                self._wake.wait_for(lambda: self._woken, seconds)
+            self._woken = False
+
+    def stats(self):
+        return {'updates': self.updates, 'paused_waits': self.paused_waits}
+
+    def low_power(self):
+        """Return True if the animation should slow down or pause"""
+        if self.active_for is not None and self.clock() - self._last_poke > self.active_for:
+            return True
+        try:
+            if self.idle_seconds is not None and self.idle_seconds() > self.idle_after:
+                return True
+            if self.on_battery is not None and self.on_battery():
+                return True
+        except Exception as e:
+            if self.on_error is not None:
+                self.on_error(e)
+        return False
+
+    def _encode(self, frames):
+        # Encode every frame once, up front
+        encoded = [self.encoder.encode(frame) for frame in frames]
+        for old in self.encoded:
+            self.encoder.release(old)
+        self.encoded = encoded
+        self.index = 0
+
+    def _run(self):
+        try:
+            self._animate()
+        finally:
+            self._release()
+
+    def _animate(self):
+        # The lock only guards the shared fields: the idle, battery and tray calls are made without it,
+        # so a slow one never holds up poke(), set_frames() or stop()
+        while True:
+            with self._wake:
+                if not self._running:
+                    return
+                frames = self.frames if self._frames_changed else None
+                self._frames_changed = False
+                delay = self.durations[self.index % len(self.durations)] / 1000
+            if frames is not None:
+                self._encode(frames)
+                delay = self.durations[0] / 1000
+
+            if self.low_power():
+                if not self.low_power_fps:
+                    # Paused: sleep until poked, stopped or it's time to re-check
+                    self.paused_waits += 1
+                    self._sleep(self.poll_interval)
+                    continue
+                delay = max(delay, 1 / self.low_power_fps)
+
+            self.encoder.apply(self.icon, self.encoded[self.index])
+            self.updates += 1
+            self.index = (self.index + 1) % len(self.encoded)
+
+            # Wait for the frame duration, or less if we are stopped or get new frames
+            self._sleep(delay)
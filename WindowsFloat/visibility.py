@@ -0,0 +1,148 @@
+import threading
+import time
+
+# Floats fainter than this count as invisible
+MIN_VISIBLE_OPACITY = 0.1
+
+# Visibility states, most important first: the first that applies wins
+LOCKED = 'locked'            # Session locked, screen saver, or another user switched in
+OBSCURED = 'obscured'        # A full-screen (D3D) app is covering the desktop
+WITHDRAWN = 'withdrawn'      # No float on screen
+TRANSPARENT = 'transparent'  # Floats on screen, but all below MIN_VISIBLE_OPACITY
+SHOWN = 'shown'
+STATES = (LOCKED, OBSCURED, WITHDRAWN, TRANSPARENT, SHOWN)
+
+# Events after which the user's presence is checked again
+PRESENCE_EVENTS = ('foreground', 'desktopswitch')
+
+
+class VisibilityTracker:
+    """Works out whether anything the float animation draws can be seen
+
+    The floats report in with set_float()/remove_float(); the session and
+    full-screen state come from backend.user_presence(), checked again on
+    foreground and desktop-switch events (or every poll_interval seconds
+    if the backend has no events) for as long as any float exists. events
+    is where those come from, e.g. a SharedWindowEvents; the backend by
+    default. on_change(visible) runs on the UI thread whenever that flips.
+    """
+
+    def __init__(self, backend, after, after_cancel, on_change, min_opacity=MIN_VISIBLE_OPACITY,
+                 poll_interval=2.0, clock=time.monotonic, events=None):
+        self.backend = backend
+        self.events = events if events is not None else backend
+        self.after = after
+        self.after_cancel = after_cancel
+        self.on_change = on_change
+        self.min_opacity = min_opacity
+        self.poll_interval = poll_interval
+        self.clock = clock
+
+        self.floats = {}  # {key: (shown, opacity)}
+        self.presence = 'present'
+        self.state = WITHDRAWN
+        self._since = clock()
+        self._unsubscribe = None
+        self._poll_id = None
+        self._refresh_pending = False
+        self._lock = threading.Lock()
+
+        # Stats
+        self.transitions = 0
+        self.presence_checks = 0
+        self.seconds = dict.fromkeys(STATES, 0.0)
+
+    @property
+    def visible(self):
+        return self.state == SHOWN
+
+    # Floats
+    def set_float(self, key, shown=True, opacity=1.0):
+        first = not self.floats
+        self.floats[key] = (shown, opacity)
+        if first:
+            self._start_watching()
+        self._update()
+
+    def remove_float(self, key):
+        self.floats.pop(key, None)
+        if not self.floats:
+            self._stop_watching()
+        self._update()
+
+    # Presence
+    def _start_watching(self):
+        self._unsubscribe = self.events.subscribe_window_events(self._on_event)
+        self.refresh()
+
+    def _stop_watching(self):
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    def _on_event(self, event, hwnd):
+        # Runs on the hook thread; collapse bursts into one check on the UI thread
+        if event not in PRESENCE_EVENTS:
+            return
+        with self._lock:
+            if self._refresh_pending:
+                return
+            self._refresh_pending = True
+        self.after(0, self.refresh)
+
+    def refresh(self):
+        """Check the session and full-screen state again (UI thread)"""
+        with self._lock:
+            self._refresh_pending = False
+        self.presence_checks += 1
+        try:
+            self.presence = self.backend.user_presence()
+        except Exception:
+            self.presence = 'present'  # When in doubt, keep animating
+        self._update()
+        if self._unsubscribe is None and self.floats and self._poll_id is None:
+            self._poll_id = self.after(int(self.poll_interval * 1000), self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        self.refresh()
+
+    # State
+    def _current_state(self):
+        if self.presence == 'away':
+            return LOCKED
+        if self.presence == 'fullscreen':
+            return OBSCURED
+        shown = [opacity for is_shown, opacity in self.floats.values() if is_shown]
+        if not shown:
+            return WITHDRAWN
+        if max(shown) < self.min_opacity:
+            return TRANSPARENT
+        return SHOWN
+
+    def _update(self):
+        state = self._current_state()
+        if state == self.state:
+            return
+        now = self.clock()
+        self.seconds[self.state] += now - self._since
+        self._since = now
+        was_visible = self.visible
+        self.state = state
+        self.transitions += 1
+        if self.visible != was_visible:
+            self.on_change(self.visible)
+
+    def stats(self):
+        seconds = dict(self.seconds)
+        seconds[self.state] += self.clock() - self._since
+        return {
+            'state': self.state,
+            'floats': len(self.floats),
+            'transitions': self.transitions,
+            'presence_checks': self.presence_checks,
+            'seconds': seconds,
+        }
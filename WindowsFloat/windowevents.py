@@ -0,0 +1,178 @@
+import threading
+
+# Events that can mean a floated window is back or gone
+WINDOW_EVENTS = ('destroy', 'show', 'uncloaked')
+GLOBAL_EVENTS = ('foreground',)
+
+
+class SharedWindowEvents:
+    """One backend window event subscription, shared by every listener
+
+    Each backend subscription may start a hook thread of its own, so the
+    window watcher and the visibility tracker subscribe here instead: the
+    backend is subscribed while anyone listens, and every event goes to
+    every listener on the thread it arrives on.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._listeners = ()  # Replaced, never changed in place, so the hook thread can read it without the lock
+        self._unsubscribe = None
+        self._lock = threading.Lock()
+
+        # Stats
+        self.subscriptions = 0
+
+    def subscribe_window_events(self, callback):
+        """Like backend.subscribe_window_events: returns an unsubscribe function, or None to poll"""
+        with self._lock:
+            if self._unsubscribe is None:
+                self._unsubscribe = self.backend.subscribe_window_events(self._dispatch)
+                if self._unsubscribe is None:
+                    return None
+                self.subscriptions += 1
+            self._listeners += (callback,)
+        return lambda: self._remove(callback)
+
+    def _remove(self, callback):
+        with self._lock:
+            listeners = list(self._listeners)
+            listeners.remove(callback)
+            self._listeners = tuple(listeners)
+            if listeners or self._unsubscribe is None:
+                return
+            unsubscribe, self._unsubscribe = self._unsubscribe, None
+        unsubscribe()
+
+    def _dispatch(self, event, hwnd):
+        for callback in self._listeners:
+            callback(event, hwnd)
+
+    def stats(self):
+        return {'listeners': len(self._listeners), 'subscriptions': self.subscriptions}
+
+
+class WindowWatcher:
+    """Runs check(hwnd) on the UI thread when a floated window may have changed
+
+    Uses the backend's window events when it has them; otherwise polls,
+    starting at min_interval and backing off to max_interval while nothing
+    happens. While no window is watched nothing is scheduled at all.
+    check(hwnd) returns True once it is done with that window.
+    """
+
+    def __init__(self, backend, after, after_cancel, check, min_interval=0.2, max_interval=1.0, backoff=1.5):
+        self.backend = backend
+        self.after = after
+        self.after_cancel = after_cancel
+        self.check = check
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+
+        self.hwnds = set()
+        self._watched = frozenset()  # A copy of hwnds for the hook thread
+        self.interval = min_interval
+        self._poll_id = None
+        self._unsubscribe = None
+        self._pending = set()
+        self._check_all = False
+        self._check_pending = False
+        self._lock = threading.Lock()
+
+        # Stats
+        self.events = 0
+        self.checks = 0
+        self.polls = 0
+
+    @property
+    def event_driven(self):
+        return self._unsubscribe is not None
+
+    def watch(self, hwnd):
+        """Start watching a floated window"""
+        first = not self.hwnds
+        self.hwnds.add(hwnd)
+        self._update_watched()
+        self.interval = self.min_interval
+        if first:
+            self._unsubscribe = self.backend.subscribe_window_events(self._on_event)
+        if not self.event_driven:
+            # Poll again soon, since a new float is when things tend to change
+            self._cancel_poll()
+            self._schedule_poll()
+
+    def unwatch(self, hwnd=None):
+        """Stop watching one window, or all of them; nothing stays scheduled once none are left"""
+        if hwnd is None:
+            self.hwnds.clear()
+        else:
+            self.hwnds.discard(hwnd)
+        self._update_watched()
+        if self.hwnds:
+            return
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self._cancel_poll()
+
+    def _update_watched(self):
+        with self._lock:
+            self._watched = frozenset(self.hwnds)
+
+    def _on_event(self, event, hwnd):
+        # May run on the hook thread: filter cheaply, then hand over to the UI thread.
+        # Only the copy of hwnds is read here; the UI thread changes hwnds itself.
+        with self._lock:
+            if event in GLOBAL_EVENTS:
+                self._check_all = True
+            elif event in WINDOW_EVENTS and hwnd in self._watched:
+                self._pending.add(hwnd)
+            else:
+                return
+            self.events += 1
+            if self._check_pending:
+                return
+            self._check_pending = True
+        self.after(0, self._run_checks)
+
+    def _run_checks(self, hwnds=None):
+        if hwnds is None:
+            with self._lock:
+                hwnds, self._pending = self._pending, set()
+                if self._check_all:
+                    hwnds |= self.hwnds
+                self._check_all = False
+                self._check_pending = False
+        for hwnd in hwnds:
+            if hwnd not in self.hwnds:
+                continue
+            self.checks += 1
+            if self.check(hwnd):
+                self.unwatch(hwnd)
+
+    def _schedule_poll(self):
+        self._poll_id = self.after(int(self.interval * 1000), self._poll)
+
+    def _cancel_poll(self):
+        if self._poll_id is not None:
+            self.after_cancel(self._poll_id)
+            self._poll_id = None
+
+    def _poll(self):
+        self._poll_id = None
+        self.polls += 1
+        self._run_checks(set(self.hwnds))
+        if self.hwnds and not self.event_driven:
+            # Nothing happened yet, so look less often
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+            self._schedule_poll()
+
+    def stats(self):
+        return {
+            'watched': len(self.hwnds),
+            'event_driven': self.event_driven,
+            'events': self.events,
+            'checks': self.checks,
+            'polls': self.polls,
+        }
@@ -0,0 +1,104 @@
+"""Compare the memory of frame sets held as lists of images with sets mapped from an atlas
+
+Each mode runs in a fresh process and reports how much its resident set
+grew: anonymous memory (what the process owns) and file-backed memory
+(mapped atlas pages, which the OS can drop and read back at will).
+
+    list        every frame of the set copied into memory, as the frame cache holds them
+    atlas-few   the set mapped from a raw atlas, with one second of frames shown
+    atlas-all   the same, with every frame shown once
+    atlas-zlib  a zlib-compressed set, every frame shown once
+
+Linux only (reads /proc/self/status).
+
+Usage: python benchmarks/bench_atlas.py [frame count]
+"""
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from synthetic import make_gif
+
+from atlas import AtlasWriter, FrameAtlas
+from frames import FrameSource
+
+SIZE = (360, 450)
+SHOWN_FEW = 24
+
+
+def rss():
+    """Return (anonymous, file-backed) resident memory in bytes"""
+    values = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            key, _, value = line.partition(':')
+            if key in ('RssAnon', 'RssFile'):
+                values[key] = int(value.split()[0]) * 1024
+    return values['RssAnon'], values['RssFile']
+
+
+def show(frame):
+    # Reads every pixel, as pasting into a PhotoImage would
+    frame.getbbox()
+
+
+def child(mode, atlas_path):
+    atlas = FrameAtlas(atlas_path)
+    frames = atlas.get('float', SIZE) if mode != 'atlas-zlib' else atlas.get('zlib', SIZE)
+    before = rss()
+    start = time.perf_counter()
+    if mode == 'list':
+        held = [frame.copy() for frame in frames]
+        for frame in held:
+            show(frame)
+    else:
+        count = SHOWN_FEW if mode == 'atlas-few' else len(frames)
+        for index in range(count):
+            show(frames[index])
+    elapsed = (time.perf_counter() - start) * 1000
+    after = rss()
+    print(after[0] - before[0], after[1] - before[1], elapsed)
+
+
+def build(gif_path, atlas_path):
+    source = FrameSource(gif_path)
+    try:
+        with AtlasWriter(atlas_path) as writer:
+            raw = writer.add_set('float', SIZE)
+            packed = writer.add_set('zlib', SIZE, 'zlib')
+            for frame in source:
+                writer.add_frame(raw, frame)
+                writer.add_frame(packed, frame)
+    finally:
+        source.close()
+
+
+def main():
+    if sys.argv[1:2] == ['--child']:
+        child(sys.argv[2], sys.argv[3])
+        return
+    if not os.path.exists('/proc/self/status'):
+        sys.exit("bench_atlas.py reads /proc/self/status and only runs on Linux")
+
+    frame_count = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    with tempfile.TemporaryDirectory() as tmp:
+        gif_path = make_gif(os.path.join(tmp, 'bench.gif'), size=SIZE, frame_count=frame_count)
+        atlas_path = os.path.join(tmp, 'bench.wfa')
+        start = time.perf_counter()
+        build(gif_path, atlas_path)
+        print(f"{frame_count} frames at {SIZE[0]}x{SIZE[1]}, {frame_count * SIZE[0] * SIZE[1] * 4 / 2**20:.0f} MB "
+              f"decoded; atlas built in {time.perf_counter() - start:.1f} s, "
+              f"{os.path.getsize(atlas_path) / 2**20:.0f} MB on disk")
+
+        print(f"{'mode':>11} {'anon MB':>9} {'file MB':>9} {'ms':>9}")
+        for mode in ('list', 'atlas-few', 'atlas-all', 'atlas-zlib'):
+            output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode, atlas_path],
+                                    check=True, capture_output=True, text=True).stdout
+            anon, file_backed, elapsed = output.split()
+            print(f"{mode:>11} {int(anon) / 2**20:>9.1f} {int(file_backed) / 2**20:>9.1f} {float(elapsed):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""Control socket throughput: one command per round trip vs pipelined vs batched
+
+Floats and restores ROUNDS windows by title through ControlServer,
+against DesktopManager on SimulatedBackend with the COM latencies of
+bench_desktops.py plus a window enumeration. The float windows themselves
+are left out (bench_float_flow.py times those under Tk), so what is timed
+is the socket, the selector lookup and the desktop passes.
+
+Usage: python benchmarks/bench_control.py [pipe|unix|tcp]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from bench_desktops import LATENCY
+
+from backend import SimulatedBackend
+from control import ControlClient, ControlServer, dispatch, select_windows
+from desktops import DesktopManager
+
+ROUNDS = 50
+
+
+class Runner:
+    """The float and restore handlers of GifMinimizer.run_control, without the UI"""
+
+    def __init__(self, desktops):
+        self.desktops = desktops
+        self.floats = set()
+        self.passes = 0
+        self.enumerations = 0
+
+    def run(self, commands):
+        return dispatch(commands, {'float': self.float, 'restore': self.restore})
+
+    def _select(self, commands, keep):
+        self.enumerations += 1
+        windows = self.desktops.windows()
+        return [[h for h in select_windows(command, windows) if keep(h)] for command in commands]
+
+    def float(self, commands):
+        selected = self._select(commands, lambda h: h not in self.floats)
+        self.passes += 1
+        moved = set(self.desktops.park([h for hwnds in selected for h in hwnds]))
+        self.floats |= moved
+        return [{'ok': True, 'floated': [h for h in hwnds if h in moved]} for hwnds in selected]
+
+    def restore(self, commands):
+        selected = self._select(commands, lambda h: h in self.floats)
+        self.passes += 1
+        moved = set(self.desktops.restore([h for hwnds in selected for h in hwnds]))
+        self.floats -= moved
+        return [{'ok': True, 'restored': [h for h in hwnds if h in moved]} for hwnds in selected]
+
+
+def run(mode, family, tmp):
+    backend = SimulatedBackend(latency=dict(LATENCY, enum_windows=0.002), desktop_count=2)
+    for i in range(ROUNDS):
+        backend.open_window(f'Report {i:02}', process='app.exe')
+    desktops = DesktopManager(backend)
+    desktops.setup()
+    runner = Runner(desktops)
+    server = ControlServer(runner.run, family, info_path=os.path.join(tmp, f'{mode}.json'))
+    server.start()
+    client = ControlClient(info_path=server.info_path)
+
+    elapsed = {}
+    for name, done in (('float', 'floated'), ('restore', 'restored')):
+        commands = [{'cmd': name, 'title': f'Report {i:02}'} for i in range(ROUNDS)]
+        start = time.perf_counter()
+        if mode == 'one by one':
+            replies = [client.request(command) for command in commands]
+        elif mode == 'pipelined':
+            replies = client.send(commands)
+        else:
+            replies = client.request(commands)
+        elapsed[name] = (time.perf_counter() - start) * 1000
+        assert all(len(reply[done]) == 1 for reply in replies), replies
+
+    client.close()
+    server.close()
+    desktops.shutdown()
+    return elapsed, runner, server.stats()
+
+
+def main():
+    family = sys.argv[1] if len(sys.argv) > 1 else None
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{ROUNDS} windows floated and restored by title")
+        print(f"{'':11} {'float ms':>9} {'restore ms':>11} {'cmds/s':>8} {'lines':>6} {'passes':>7} {'enums':>6}")
+        for mode in ('one by one', 'pipelined', 'one batch'):
+            elapsed, runner, stats = run(mode, family, tmp)
+            rate = 2 * ROUNDS / (sum(elapsed.values()) / 1000)
+            print(f"{mode:11} {elapsed['float']:9.1f} {elapsed['restore']:11.1f} {rate:8.0f} "
+                  f"{stats['lines']:6} {runner.passes:7} {runner.enumerations:6}")
+        print(f"endpoint: {stats['family']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Parking and restoring windows: a fresh AppView per move vs DesktopManager
+
+SimulatedBackend models the COM round trips (creating an AppView, moving
+it, listing desktops). The old code built an AppView for every move; the
+manager caches one per window, moves batches on one thread and only
+re-lists desktops every couple of seconds or after a failure.
+
+Usage: python benchmarks/bench_desktops.py
+"""
+import json
+import time
+
+import synthetic  # noqa: F401  (sets up the import path)
+
+from backend import SimulatedBackend
+from desktops import DesktopManager
+
+LATENCY = {
+    'window_view': 0.002,      # AppView(hwnd)
+    'move_to_desktop': 0.004,  # AppView.move
+    'desktops': 0.003,
+    'current_desktop': 0.001,
+    'create_desktop': 0.02,
+}
+
+
+def make_backend(count):
+    backend = SimulatedBackend(latency=LATENCY, desktop_count=2)
+    hwnds = [backend.open_window(f'W{i}', process='app.exe') for i in range(count)]
+    return backend, hwnds
+
+
+def run_legacy(count, cycles):
+    backend, hwnds = make_backend(count)
+    hidden, original = backend.desktops()[1], backend.current_desktop()
+    start = time.perf_counter()
+    for _ in range(cycles):
+        for hwnd in hwnds:
+            backend.move_view(backend.window_view(hwnd), hidden)
+        for hwnd in hwnds:
+            backend.move_view(backend.window_view(hwnd), original)
+    return (time.perf_counter() - start) * 1000, backend.calls
+
+
+def run_manager(count, cycles):
+    backend, hwnds = make_backend(count)
+    manager = DesktopManager(backend)
+    manager.setup()
+    start = time.perf_counter()
+    for _ in range(cycles):
+        manager.park(hwnds)
+        manager.restore(hwnds, focus=hwnds[-1])
+    elapsed = (time.perf_counter() - start) * 1000
+    manager.shutdown()
+    return elapsed, backend.calls, manager.stats()
+
+
+def run_desktop_removed():
+    """The hidden desktop is closed by the user while windows are floated"""
+    backend, hwnds = make_backend(3)
+    manager = DesktopManager(backend)
+    manager.setup()
+    manager.park(hwnds[:1])
+    backend.remove_desktop(1)
+    moved = manager.park(hwnds[1:])
+    manager.shutdown()
+    return moved == hwnds[1:], manager.hidden, manager.stats()['retries']
+
+
+def main(count=10, cycles=5):
+    legacy_ms, legacy_calls = run_legacy(count, cycles)
+    manager_ms, manager_calls, stats = run_manager(count, cycles)
+
+    print(f"{count} windows, {cycles} park/restore cycles")
+    print(f"{'':10} {'total ms':>9} {'AppViews':>9} {'moves':>6}")
+    print(f"{'per call':10} {legacy_ms:9.1f} {legacy_calls['window_view']:9} {legacy_calls['move_to_desktop']:6}")
+    print(f"{'manager':10} {manager_ms:9.1f} {manager_calls['window_view']:9} {manager_calls['move_to_desktop']:6}")
+    print("manager stats:")
+    print(json.dumps(stats, indent=2))
+
+    ok, hidden, retries = run_desktop_removed()
+    print(f"hidden desktop removed: batch moved={ok}, new hidden desktop={hidden}, retries={retries}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Replay a high-rate mouse drag against the float's window moves
+
+A synthetic motion stream (1000 Hz by default, as gaming mice report) is
+fed through the app's drag path on a real-time after() loop, once moving
+the window on every event as on_drag used to and once through
+WindowMover. Each move busy-waits MOVE_COST_MS to stand in for the
+layered-window recomposite. Reports moves requested and applied, time
+spent moving, and checks the window ends where the button was released.
+
+Usage: python benchmarks/bench_drag.py [seconds] [events per second]
+"""
+import sys
+import time
+
+from synthetic import EventLoop
+
+from drag import WindowMover
+
+MOVE_COST_MS = 0.3
+
+
+class FakeWindow:
+    def __init__(self):
+        self.position = (0, 0)
+        self.moves = 0
+        self.move_ms = 0.0
+
+    def move(self, x, y):
+        start = time.perf_counter()
+        while (time.perf_counter() - start) * 1000 < MOVE_COST_MS:
+            pass
+        self.position = (x, y)
+        self.moves += 1
+        self.move_ms += (time.perf_counter() - start) * 1000
+
+
+def motion(t):
+    # A quick loop around the screen
+    return 400 + int(300 * t) % 600, 300 + int(200 * t * t) % 400
+
+
+def replay(seconds, rate, coalesce):
+    loop = EventLoop()
+    window = FakeWindow()
+    mover = WindowMover(loop.after, loop.after_cancel)
+    events = int(seconds * rate)
+    if coalesce:
+        mover.begin(window.move, window.position)
+        on_motion, on_release = mover.request, lambda x, y: (mover.request(x, y), mover.end())
+    else:
+        on_motion = on_release = window.move
+    for i in range(events):
+        callback = on_release if i == events - 1 else on_motion
+        loop.after(i * 1000 / rate, callback, *motion(i / rate))
+    start = time.perf_counter()
+    loop.run(seconds + 0.1)
+    elapsed = time.perf_counter() - start
+    assert window.position == motion((events - 1) / rate), (window.position, motion((events - 1) / rate))
+    return events, window, elapsed
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    rate = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    print(f"{seconds:.0f} s drag at {rate} events/s, {MOVE_COST_MS} ms per window move")
+    print(f"{'path':>12} {'requested':>10} {'applied':>8} {'moves/s':>8} {'move ms':>8}")
+    for label, coalesce in (('every event', False), ('WindowMover', True)):
+        events, window, elapsed = replay(seconds, rate, coalesce)
+        print(f"{label:>12} {events:>10} {window.moves:>8} {window.moves / elapsed:>8.0f} {window.move_ms:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark the float/restore flow of GifMinimizer against SimulatedBackend
+
+Needs a display; on Linux run it under Xvfb, e.g.
+
+    xvfb-run python benchmarks/bench_float_flow.py
+
+Each desktop move is given a simulated COM latency to show how it adds up.
+"""
+import os
+import statistics
+import tempfile
+import time
+
+from synthetic import have_display, make_gif
+
+import tkinter as tk
+
+from backend import SimulatedBackend
+
+ROUNDS = 50
+LATENCY = {'move_to_desktop': 0.004, 'current_desktop': 0.001, 'set_foreground': 0.001}
+
+
+def pump(root, done, timeout=5.0):
+    """Run the Tk loop until done() is true"""
+    deadline = time.perf_counter() + timeout
+    while not done() and time.perf_counter() < deadline:
+        root.update()
+
+
+def main():
+    if not have_display():
+        print("skipped without a display; on Linux run it under xvfb-run")
+        return
+    # Imported here since pystray connects to the display as it is imported
+    from WindowsFloat import GifMinimizer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['LOCALAPPDATA'] = tmp  # Keep the frame cache out of the real profile
+        os.chdir(tmp)
+        make_gif('windowsfloat.gif', frame_count=12)
+
+        backend = SimulatedBackend(latency=LATENCY, desktop_count=2)
+        root = tk.Tk()
+        start = time.perf_counter()
+        app = GifMinimizer(root, backend=backend)
+        print(f"startup: {(time.perf_counter() - start) * 1000:.1f} ms")
+        app.hotkeys.debounce = 0  # We press far faster than key repeat
+
+        float_ms, restore_ms = [], []
+        for i in range(ROUNDS):
+            hwnd = backend.open_window(f"Window {i}")
+
+            start = time.perf_counter()
+            backend.press_hotkey()
+            pump(root, lambda: hwnd in app.floats)
+            float_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            app.restore_from_menu(app.floats.get(hwnd))
+            pump(root, lambda: hwnd not in app.floats)
+            restore_ms.append((time.perf_counter() - start) * 1000)
+            backend.close_window(hwnd)
+
+        for name, samples in (('hotkey to visible', float_ms), ('restore', restore_ms)):
+            print(f"{name:>18}: median {statistics.median(samples):.2f} ms, max {max(samples):.2f} ms")
+        print(f"backend calls: {dict(backend.calls)}")
+
+        app.exit_app()
+        pump(root, lambda: False, timeout=0.2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Measure memory and CPU cost per additional float
+
+Floats 0, 1, 5, 10 and 20 simulated windows and reports resident memory
+and CPU time per second of animation. Needs a display; on Linux run it
+under Xvfb:
+
+    xvfb-run python benchmarks/bench_floats.py
+"""
+import os
+import tempfile
+import time
+
+from synthetic import have_display, make_gif
+
+import tkinter as tk
+
+from backend import SimulatedBackend
+
+COUNTS = [0, 1, 5, 10, 20]
+SAMPLE_SECONDS = 2.0
+
+
+def rss_mb():
+    """Resident set size of this process (Linux only)"""
+    with open('/proc/self/statm') as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf('SC_PAGE_SIZE') / 2**20
+
+
+def run_for(root, seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        root.update()
+        time.sleep(0.001)
+
+
+def main():
+    if not have_display():
+        print("skipped without a display; on Linux run it under xvfb-run")
+        return
+    # Imported here since pystray connects to the display as it is imported
+    from WindowsFloat import GifMinimizer
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['LOCALAPPDATA'] = tmp  # Keep the frame cache out of the real profile
+        os.chdir(tmp)
+        make_gif('windowsfloat.gif', frame_count=24)
+
+        backend = SimulatedBackend(desktop_count=2)
+        root = tk.Tk()
+        app = GifMinimizer(root, backend=backend)
+        app.hotkeys.debounce = 0  # We press far faster than key repeat
+        run_for(root, 0.5)
+
+        print(f"{'floats':>6} {'RSS MB':>8} {'MB/float':>9} {'CPU ms/s':>9} {'ticks/s':>8}")
+        base_rss = None
+        for count in COUNTS:
+            while len(app.floats) < count:
+                hwnd = backend.open_window(f"Window {len(app.floats)}")
+                backend.press_hotkey()
+                while hwnd not in app.floats:
+                    root.update()
+
+            run_for(root, 0.5)
+            ticks = app.animation.ticks
+            cpu = time.process_time()
+            run_for(root, SAMPLE_SECONDS)
+            cpu_ms = (time.process_time() - cpu) * 1000 / SAMPLE_SECONDS
+            tick_rate = (app.animation.ticks - ticks) / SAMPLE_SECONDS
+
+            rss = rss_mb()
+            if base_rss is None:
+                base_rss = rss
+            per_float = (rss - base_rss) / count if count else 0.0
+            print(f"{count:>6} {rss:>8.1f} {per_float:>9.2f} {cpu_ms:>9.1f} {tick_rate:>8.1f}")
+
+        app.exit_app()
+        run_for(root, 0.2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""Compare eager decoding of every frame with the lazy FrameSource
+
+Reports time-to-first-frame, total time for one animation loop and the peak
+amount of decoded RGBA frame data held for each approach.
+
+Usage: python benchmarks/bench_frame_source.py [path/to/gif]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import make_gif
+
+from PIL import Image, ImageSequence
+
+from frames import FrameSource
+
+
+def eager(path):
+    """What load_gif used to do, minus the PhotoImage wrapping"""
+    start = time.perf_counter()
+    first = None
+    frames = []
+    with Image.open(path) as gif:
+        for frame in ImageSequence.Iterator(gif):
+            frames.append(frame.convert('RGBA'))
+            if first is None:
+                first = (time.perf_counter() - start) * 1000
+    # The animation can only start once everything is decoded
+    first = (time.perf_counter() - start) * 1000
+    return first, frames
+
+
+def lazy(path):
+    """Play one loop through a FrameSource"""
+    source = FrameSource(path)
+    source[0]
+    first = source.first_frame_ms
+    for _ in source:
+        pass
+    return first, source
+
+
+def measure(func, path):
+    start = time.perf_counter()
+    first, result = func(path)
+    total = (time.perf_counter() - start) * 1000
+    # Pillow keeps pixel data outside the Python heap, so count it directly
+    if isinstance(result, FrameSource):
+        peak = result.stats()['peak_window_bytes']
+    else:
+        peak = sum(frame.width * frame.height * 4 for frame in result)
+    return first, total, peak, result
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = make_gif(os.path.join(tmp, 'bench.gif'), size=(512, 640), frame_count=120)
+
+        print(f"{'mode':>6} {'first ms':>10} {'loop ms':>10} {'peak MB':>10}")
+        for name, func in (('eager', eager), ('lazy', lazy)):
+            first, total, peak, result = measure(func, path)
+            print(f"{name:>6} {first:>10.1f} {total:>10.1f} {peak / 2**20:>10.1f}")
+            if isinstance(result, FrameSource):
+                print(f"       {result.stats()}")
+                result.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""Time spent on the keyboard hook thread per hotkey press, inline vs HotkeyPipeline
+
+Uses SimulatedBackend with a slow move_to_desktop (the pyvda COM call) and
+holds the chord down so key repeat fires a burst of presses. Reports how long
+each hook callback blocks, how many presses get handled, and the
+hook-to-float latency histogram.
+
+Usage: python benchmarks/bench_hotkey.py
+"""
+import json
+import statistics
+import time
+
+import synthetic  # noqa: F401  (sets up the import path)
+
+from backend import HOTKEY, SimulatedBackend
+from hotkeys import HotkeyPipeline
+
+MOVE_LATENCY = 0.04  # Seconds per move_to_desktop
+BURST = 10           # Presses per held chord
+REPEAT = 0.03        # Key repeat interval
+
+
+def make_handler(backend, pipeline=None):
+    """A stand-in for GifMinimizer.handle_hotkey that posts straight to the 'UI'"""
+
+    def handle(pressed_at=None):
+        hwnd = backend.foreground_window()
+        if not hwnd:
+            return
+        backend.cursor_pos()
+        backend.move_to_desktop(hwnd, 1)
+        if pipeline is not None:
+            pipeline.record_float(pressed_at)
+        backend.open_window('next')  # So the next hold has something to float
+
+    return handle
+
+
+def hold_chord(backend, holds):
+    blocked = []
+    for _ in range(holds):
+        for _ in range(BURST):
+            start = time.perf_counter()
+            backend.press_hotkey()
+            blocked.append((time.perf_counter() - start) * 1000)
+            time.sleep(REPEAT)
+        time.sleep(0.3)
+    return blocked
+
+
+def run_inline(holds):
+    backend = SimulatedBackend(latency={'move_to_desktop': MOVE_LATENCY}, desktop_count=2)
+    backend.open_window('first')
+    backend.register_hotkey(HOTKEY, make_handler(backend))
+    blocked = hold_chord(backend, holds)
+    return blocked, backend.calls['move_to_desktop']
+
+
+def run_pipeline(holds):
+    backend = SimulatedBackend(latency={'move_to_desktop': MOVE_LATENCY}, desktop_count=2)
+    backend.open_window('first')
+    pipeline = HotkeyPipeline(None)
+    pipeline.handler = make_handler(backend, pipeline)
+    pipeline.start()
+    backend.register_hotkey(HOTKEY, pipeline.press)
+    blocked = hold_chord(backend, holds)
+    time.sleep(0.2)
+    pipeline.stop()
+    return blocked, backend.calls['move_to_desktop'], pipeline.stats()
+
+
+def main(holds=5):
+    inline_blocked, inline_moves = run_inline(holds)
+    pipe_blocked, pipe_moves, stats = run_pipeline(holds)
+
+    print(f"{holds} holds x {BURST} presses, move_to_desktop {MOVE_LATENCY * 1000:.0f} ms")
+    print(f"{'':10} {'hook mean ms':>13} {'hook max ms':>12} {'desktop moves':>14}")
+    for name, blocked, moves in (('inline', inline_blocked, inline_moves),
+                                 ('pipeline', pipe_blocked, pipe_moves)):
+        print(f"{name:10} {statistics.mean(blocked):13.3f} {max(blocked):12.3f} {moves:14}")
+    print("pipeline stats:")
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Check that the UI loop keeps its tick rate while a resize is in flight
+
+A small queue-driven loop stands in for the Tk main loop: it ticks every
+TICK_MS like animate_gif and runs callbacks posted by FrameResizer like
+root.after(0, ...). The same resize is then done inline for comparison.
+Exits with status 1 if a tick comes more than MAX_GAP_MS late during the
+background resize; the suite's resize_worker case tracks the same gap.
+
+Usage: python benchmarks/bench_resize_worker.py [path/to/gif]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import TickLoop, make_gif
+
+from frames import FrameSource, scale_frames
+from resizer import FrameResizer
+
+TICK_MS = 16
+MAX_GAP_MS = 4 * TICK_MS  # A dropped frame or two, not a stall
+SIZE = (288, 360)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = make_gif(os.path.join(tmp, 'bench.gif'), size=(512, 640), frame_count=60)
+
+        # Background resize
+        loop = TickLoop(TICK_MS)
+        resizer = FrameResizer(loop.post)
+        result = []
+        start = time.perf_counter()
+        resizer.resize(FrameSource(path), SIZE, result.append)
+        loop.run_until(lambda: result)
+        background_ms = (time.perf_counter() - start) * 1000
+        resizer.shutdown()
+
+        # Inline resize, as set_size used to do it on the UI thread
+        loop_inline = TickLoop(TICK_MS)
+        loop_inline.post(lambda: result.append(scale_frames(FrameSource(path), SIZE)))
+        start = time.perf_counter()
+        loop_inline.run_until(lambda: len(result) > 1)
+        inline_ms = (time.perf_counter() - start) * 1000
+
+        print(f"{'mode':>10} {'total ms':>10} {'ticks':>6} {'worst gap ms':>13}")
+        print(f"{'worker':>10} {background_ms:>10.1f} {len(loop.ticks):>6} {loop.worst_gap_ms():>13.1f}")
+        print(f"{'inline':>10} {inline_ms:>10.1f} {len(loop_inline.ticks):>6} {loop_inline.worst_gap_ms():>13.1f}")
+
+        if len(result) != 2 or [f.tobytes() for f in result[0]] != [f.tobytes() for f in result[1]]:
+            print('FAIL: the worker and the inline resize disagree')
+            return 1
+        if loop.worst_gap_ms() > MAX_GAP_MS:
+            print(f'FAIL: the UI loop stalled for {loop.worst_gap_ms():.1f} ms during the background resize'
+                  f' (at most {MAX_GAP_MS} ms)')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""Compare the per-frame Pillow resize path with the batched NumPy path
+
+Uses a 200-frame 512x640 GIF unless one is given on the command line.
+
+Usage: python benchmarks/bench_scale_paths.py [path/to/gif]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import make_gif
+
+from PIL import ImageChops
+
+import frames
+from frames import FrameSource, scale_frames
+
+SIZES = [(360, 450), (72, 90)]
+
+
+def timed(source, size, **kwargs):
+    start = time.perf_counter()
+    result = scale_frames(source, size, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def differing_pixels(a, b):
+    """Count pixels that differ between two frame lists"""
+    total = 0
+    for x, y in zip(a, b):
+        histogram = ImageChops.difference(x, y).convert('L').histogram()
+        total += sum(histogram) - histogram[0]
+    return total
+
+
+def main():
+    if frames.load_numpy() is None:
+        print("NumPy is not installed; only the Pillow path is available")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = make_gif(os.path.join(tmp, 'bench.gif'), size=(512, 640), frame_count=200)
+
+        # Decode everything up front so only the resize paths are timed
+        source = FrameSource(path, window=10000)
+        list(source)
+
+        print(f"{'size':>10} {'pillow ms':>10} {'numpy ms':>10} {'diff px':>10}")
+        for size in SIZES:
+            pillow_ms, pillow_frames = timed(source, size, batched=False)
+            numpy_ms, numpy_frames = timed(source, size, batched=True)
+            diff = differing_pixels(pillow_frames, numpy_frames)
+            print(f"{size[0]:>4}x{size[1]:<5} {pillow_ms:>10.1f} {numpy_ms:>10.1f} {diff:>10}")
+        source.close()
+
+
+if __name__ == '__main__':
+    main()
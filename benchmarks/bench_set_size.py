@@ -0,0 +1,65 @@
+"""Measure set_size frame preparation latency with a cold and a warm frame cache
+
+The preview column is what a progressive resize costs before the new size
+is on screen: one quick frame made from the set at the default float size.
+The cold column is then the refine, which runs in the background.
+
+Usage: python benchmarks/bench_set_size.py [path/to/gif]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from synthetic import make_gif
+
+from floats import DEFAULT_SIZE
+from frames import FrameSource, gif_digest, preview_frame, scale_frames, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD
+from framecache import FrameCache
+
+SIZES = [(360, 450), (288, 360), (216, 270), (144, 180), (72, 90), (56, 70)]
+
+
+def prepare(cache, gif, digest, size):
+    """The frame preparation part of GifMinimizer.set_size"""
+    key = FrameCache.make_key(digest, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+    frames = cache.get(key)
+    if frames is None:
+        frames = scale_frames(gif, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+        cache.put(key, frames)
+    return frames
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        gif_path = sys.argv[1] if len(sys.argv) > 1 else make_gif(os.path.join(tmp, 'bench.gif'))
+        digest = gif_digest(gif_path)
+        cache_dir = os.path.join(tmp, 'cache')
+
+        gif = FrameSource(gif_path)
+        cache = FrameCache(cache_dir)
+        try:
+            base = scale_frames(gif, DEFAULT_SIZE, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+            print(f"{'size':>10} {'preview ms':>10} {'cold ms':>10} {'memory ms':>10} {'disk ms':>10}")
+            for size in SIZES:
+                preview = timed(preview_frame, base[0], size)
+                cold = timed(prepare, cache, gif, digest, size)
+                warm = timed(prepare, cache, gif, digest, size)
+                cache.flush()
+
+                # A fresh cache simulates starting the app again
+                disk = timed(prepare, FrameCache(cache_dir), gif, digest, size)
+                print(f"{size[0]:>4}x{size[1]:<5} {preview:>10.3f} {cold:>10.1f} {warm:>10.3f} {disk:>10.1f}")
+        finally:
+            cache.close()
+            gif.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Exercise TrayAnimator against a fake pystray backend
+
+Reports how long stop() takes compared with the old sleep loop, how many
+icon updates happen at full rate and in low-power mode, and the cost of
+re-serializing the icon on every assignment the way pystray does.
+
+Usage: python benchmarks/bench_tray.py
+"""
+import threading
+import time
+
+from synthetic import FakeIcon
+
+from PIL import Image
+
+from tray import PillowIconEncoder, TrayAnimator
+
+
+def make_frames(count=12):
+    return [Image.new('RGBA', (32, 32), (i * 20, 100, 200, 255)) for i in range(count)]
+
+
+def old_loop(icon, frames, state):
+    index = 0
+    while state['running']:
+        icon.icon = frames[index]
+        index = (index + 1) % len(frames)
+        time.sleep(1.0)  # A slow GIF frame
+
+
+def main():
+    frames = make_frames()
+
+    # Stop latency of the old sleep loop
+    icon = FakeIcon()
+    state = {'running': True}
+    thread = threading.Thread(target=old_loop, args=(icon, frames, state), daemon=True)
+    thread.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    state['running'] = False
+    thread.join(timeout=1.0)
+    old_stop = (time.perf_counter() - start) * 1000
+
+    # Stop latency of the animator with the same slow frames
+    animator = TrayAnimator(FakeIcon(), frames, [1000] * len(frames), encoder=PillowIconEncoder())
+    animator.start()
+    time.sleep(0.05)
+    start = time.perf_counter()
+    animator.stop()
+    new_stop = (time.perf_counter() - start) * 1000
+    print(f"stop latency: sleep loop {old_stop:.1f} ms, TrayAnimator {new_stop:.1f} ms")
+
+    # Update rate at full speed and in low-power modes over one second
+    for label, kwargs in (
+        ('full rate', {}),
+        ('idle, 2 fps', {'idle_seconds': lambda: 600, 'low_power_fps': 2}),
+        ('on battery, paused', {'on_battery': lambda: True, 'low_power_fps': 0}),
+    ):
+        icon = FakeIcon()
+        animator = TrayAnimator(icon, frames, [50] * len(frames), encoder=PillowIconEncoder(), **kwargs)
+        animator.start()
+        time.sleep(1.0)
+        animator.stop()
+        per_update = icon.serialize_ms / icon.updates if icon.updates else 0.0
+        print(f"{label:>20}: {icon.updates:>3} updates/s, {per_update:.3f} ms serializing each")
+
+
+if __name__ == '__main__':
+    main()
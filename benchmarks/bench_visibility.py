@@ -0,0 +1,60 @@
+"""Show that the float animation costs nothing while no float can be seen
+
+Runs AnimationScheduler and VisibilityTracker on a minimal real-time
+after() loop (sleeping until the next callback, as Tk's event loop does)
+against SimulatedBackend, for a few seconds in each visibility state, and
+reports the callbacks run, frames drawn and CPU time used in each.
+
+Usage: python benchmarks/bench_visibility.py [seconds per state]
+"""
+import sys
+import time
+
+from synthetic import EventLoop
+
+from backend import SimulatedBackend
+from scheduler import AnimationScheduler
+from visibility import VisibilityTracker
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 2.0
+    loop = EventLoop()
+    backend = SimulatedBackend()
+    drawn = []
+    animation = AnimationScheduler(loop.after, loop.after_cancel, drawn.append)
+    animation.set_speed(1.5)
+    visibility = VisibilityTracker(
+        backend, loop.after, loop.after_cancel,
+        lambda visible: animation.unsuspend() if visible else animation.suspend()
+    )
+    animation.suspend()
+    animation.start([80] * 24)  # synthetic.make_gif's default animation
+
+    steps = (
+        ('withdrawn', lambda: None),
+        ('shown', lambda: visibility.set_float(1, opacity=0.75)),
+        ('transparent', lambda: visibility.set_float(1, opacity=0.05)),
+        ('shown', lambda: visibility.set_float(1, opacity=0.75)),
+        ('locked', lambda: backend.set_presence('away')),
+        ('obscured', lambda: backend.set_presence('fullscreen')),
+        ('shown', lambda: backend.set_presence('present')),
+        ('withdrawn', lambda: visibility.remove_float(1)),
+    )
+    print(f"{'state':>12} {'callbacks':>10} {'frames':>8} {'pending':>8} {'cpu ms':>8}")
+    for label, step in steps:
+        step()
+        loop.run(0.05)  # Let the change settle (event delivery, resume)
+        callbacks, frames, cpu = loop.callbacks, len(drawn), time.process_time()
+        loop.run(seconds)
+        print(f"{visibility.state:>12} {loop.callbacks - callbacks:>10} {len(drawn) - frames:>8} "
+              f"{loop.pending():>8} {(time.process_time() - cpu) * 1000:>8.1f}")
+        assert visibility.state == label, (visibility.state, label)
+
+    stats = animation.stats()
+    print(f"suspends {stats['suspends']}, suspended {stats['suspended_seconds']:.1f} s, "
+          f"presence checks {visibility.stats()['presence_checks']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,435 @@
+"""The benchmark suite: run every case, write the results and compare them with a baseline
+
+    python benchmarks/suite.py                    # compare with benchmarks/baseline.json
+    python benchmarks/suite.py --update-baseline  # accept the current numbers
+    xvfb-run python benchmarks/suite.py           # also run the cases that need a display
+
+Every result is a time in milliseconds (lower is better), usually the
+best of several runs, on the synthetic GIFs from synthetic.GIF_SET. Each
+run also times a fixed calibration workload, and baseline numbers are
+scaled by how much faster or slower that ran, so a busy or different
+machine doesn't read as a regression. A result more than --tolerance
+slower than its scaled baseline, and at least --min-delta ms slower, is a
+regression: it is printed and the suite exits with status 1. So does a
+result with no baseline entry at all, since it can't regress unnoticed
+otherwise: record the baseline with a display (xvfb-run) so it covers
+every case. Cases that need a display are skipped without one.
+The bench_*.py scripts next to this one compare old and new approaches
+in more detail; this suite is what guards against regressions.
+"""
+import argparse
+import json
+import os
+import platform
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from synthetic import FakeIcon, TickLoop, have_display, make_gif_set
+
+import PIL
+
+from backend import SimulatedBackend
+from bundle import build_bundle, bundle_path, read_bundle
+from desktops import DesktopManager
+from floats import SIZE_PRESETS, SPEED_PRESETS
+from framecache import FrameCache
+from frames import (FrameSource, first_frame, gif_digest, load_numpy, render_frames, scale_frame, scale_frames,
+                    tray_frame, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+from hotkeys import HotkeyPipeline
+from resizer import FrameResizer
+from tray import PillowIconEncoder
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, 'baseline.json')
+DEFAULT_OUTPUT = os.path.join(HERE, 'results.json')
+DESKTOP_LATENCY = {'window_view': 0.002, 'move_to_desktop': 0.004, 'current_desktop': 0.001}
+
+CASES = []
+
+
+def case(needs_display=False):
+    """Register a benchmark case; it gets the context and returns {name: ms}"""
+    def register(fn):
+        CASES.append((fn.__name__, fn, needs_display))
+        return fn
+    return register
+
+
+def best_ms(fn, repeat=5):
+    """Fastest of several runs; noise only ever makes a run slower"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return min(samples)
+
+
+def calibrate():
+    """Time a fixed Pillow and Python workload, to tell a slower machine from slower code"""
+    from PIL import Image
+    image = Image.new('RGBA', (360, 450), (40, 120, 220, 128))
+
+    def work():
+        for _ in range(4):
+            image.resize((144, 180), Image.LANCZOS)
+        sum(i * i for i in range(200000))
+    return best_ms(work, repeat=7)
+
+
+def size_name(size):
+    return f'{size[0]}x{size[1]}'
+
+
+# Headless cases
+@case()
+def load_gif(ctx):
+    """What GifMinimizer.load_gif does, plus decoding the first frame"""
+    results = {}
+    for name, path in ctx['gifs'].items():
+        def load():
+            source = FrameSource(path)
+            gif_digest(path)
+            source[0]
+            source.close()
+        results[f'load_gif/{name}'] = best_ms(load)
+    return results
+
+
+@case()
+def startup(ctx):
+    """Getting the tray and default float frames: decoding, a prebuilt bundle, or just the first frame"""
+    results = {}
+    for name in ('default', 'large-many'):
+        path = ctx['gifs'][name]
+
+        def decode():
+            source = FrameSource(path)
+            render_frames(source, [
+                tray_frame,
+                lambda frame: scale_frame(frame, (72, 90), DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+            ])
+            source.durations()
+            source.close()
+        results[f'startup/decode/{name}'] = best_ms(decode, repeat=3 if name == 'default' else 1)
+
+        build_bundle(path)
+        results[f'startup/bundle/{name}'] = best_ms(lambda: read_bundle(bundle_path(path), gif_digest(path)).close())
+        results[f'startup/first_frame/{name}'] = best_ms(lambda: tray_frame(first_frame(path)))
+    return results
+
+
+@case()
+def set_size(ctx):
+    """Scaling a whole GIF (cache miss) and reading it back from the disk cache"""
+    results = {}
+    cache = FrameCache(cache_dir=os.path.join(ctx['tmp'], 'frames'))
+
+    def scale(source, size):
+        return scale_frames(source, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+
+    path = ctx['gifs']['default']
+    source = FrameSource(path)
+    digest = gif_digest(path)
+    for size in SIZE_PRESETS:
+        results[f'set_size/cold/{size_name(size)}'] = best_ms(lambda: scale(source, size), repeat=3)
+
+        key = FrameCache.make_key(digest, size, DEFAULT_RESAMPLE, DEFAULT_THRESHOLD)
+        cache.put(key, scale(source, size))
+        cache.flush()
+
+        def from_disk():
+            cache.clear()
+            cache.get(key)
+        results[f'set_size/disk/{size_name(size)}'] = best_ms(from_disk)
+    cache.close()
+    source.close()
+
+    # The same from the full-size frames of a bundle, mapped instead of decoded
+    bundle = read_bundle(build_bundle(path, source=True))
+    for size in SIZE_PRESETS:
+        results[f'set_size/atlas/{size_name(size)}'] = best_ms(lambda: scale(bundle.source, size), repeat=3)
+    bundle.close()
+
+    # The default float size on every input
+    for name, path in ctx['gifs'].items():
+        source = FrameSource(path)
+        results[f'set_size/cold/{name}'] = best_ms(lambda: scale(source, (72, 90)), repeat=3)
+        source.close()
+    return results
+
+
+@case()
+def resize_worker(ctx):
+    """The longest the UI loop goes without a tick while the resizer scales the GIF in the background"""
+    path = ctx['gifs']['large-few']
+    gaps = []
+    for _ in range(3):
+        loop = TickLoop()
+        resizer = FrameResizer(loop.post)
+        result = []
+        resizer.resize(FrameSource(path), (288, 360), result.append, on_error=result.append)
+        loop.run_until(lambda: result)
+        resizer.shutdown()
+        if not result or isinstance(result[0], Exception):
+            raise RuntimeError(f'background resize failed: {result}')
+        gaps.append(loop.worst_gap_ms())
+    return {'resize_worker/worst_gap': min(gaps)}
+
+
+@case()
+def tray(ctx):
+    """Rendering one tray frame, and one icon update the way pystray serializes it"""
+    source = FrameSource(ctx['gifs']['default'])
+    frames = list(source)
+    source.close()
+
+    tray_frames = []
+    render_ms = best_ms(lambda: tray_frames.__setitem__(slice(None), [tray_frame(f) for f in frames]))
+
+    icon = FakeIcon()
+    encoder = PillowIconEncoder()
+    encoded = [encoder.encode(frame) for frame in tray_frames]
+
+    def update_all():
+        for frame in encoded:
+            encoder.apply(icon, frame)
+    update_ms = best_ms(update_all)
+    return {
+        'tray/render_frame': render_ms / len(frames),
+        'tray/update': update_ms / len(encoded),
+    }
+
+
+@case()
+def hotkey(ctx, rounds=30):
+    """Hook to float with the hotkey worker, the desktop manager and a stand-in UI thread"""
+    backend = SimulatedBackend(latency=DESKTOP_LATENCY, desktop_count=2)
+    desktops = DesktopManager(backend)
+    desktops.setup()
+    ui = queue.Queue()
+    pipeline = HotkeyPipeline(None, debounce=0)
+
+    def handle(pressed_at):
+        hwnd = backend.foreground_window()
+        backend.cursor_pos()
+        if desktops.park([hwnd]):
+            ui.put(pressed_at)
+
+    def ui_loop():
+        while True:
+            pressed_at = ui.get()
+            if pressed_at is None:
+                return
+            pipeline.record_float(pressed_at)
+            done.set()
+
+    pipeline.handler = handle
+    pipeline.start()
+    thread = threading.Thread(target=ui_loop, daemon=True)
+    thread.start()
+    done = threading.Event()
+    for i in range(rounds):
+        done.clear()
+        backend.open_window(f'Window {i}')
+        pipeline.press()
+        done.wait(5)
+    pipeline.stop()
+    ui.put(None)
+    desktops.shutdown()
+    latency = pipeline.float_latency.snapshot()
+    return {'hotkey/to_float_p50': latency['p50'], 'hotkey/to_float_p90': latency['p90']}
+
+
+# Cases that drive the real app, so they need a display
+def pump(root, done, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not done() and time.perf_counter() < deadline:
+        root.update()
+        time.sleep(0.001)
+
+
+def run_for(root, seconds):
+    # mainloop sleeps between events, so we don't measure our own busy loop
+    root.after(int(seconds * 1000), root.quit)
+    root.mainloop()
+
+
+@case(needs_display=True)
+def app(ctx, rounds=20):
+    """Startup to first frame, animation CPU per frame at each speed, and hotkey to visible"""
+    import tkinter as tk
+    from WindowsFloat import GifMinimizer
+
+    results = {}
+    cwd = os.getcwd()
+    os.chdir(ctx['tmp'])
+    os.rename(ctx['gifs']['default'], 'windowsfloat.gif')
+    try:
+        backend = SimulatedBackend(latency=DESKTOP_LATENCY, desktop_count=2)
+        root = tk.Tk()
+        start = time.perf_counter()
+        gif = GifMinimizer(root, backend=backend)
+        pump(root, lambda: gif.animation.ticks > 0)
+        results['app/startup_to_first_frame'] = (time.perf_counter() - start) * 1000
+        results['app/import'] = gif.startup['import_ms']
+        results['app/hotkey_ready'] = gif.startup['hotkey_ready_ms']
+        gif.hotkeys.debounce = 0  # We press far faster than key repeat
+
+        # Hotkey to visible float
+        samples = []
+        for i in range(rounds):
+            hwnd = backend.open_window(f'Window {i}')
+            start = time.perf_counter()
+            backend.press_hotkey()
+            pump(root, lambda: hwnd in gif.floats)
+            samples.append((time.perf_counter() - start) * 1000)
+            if i < rounds - 1:
+                gif.restore_from_menu(gif.floats.get(hwnd))
+        results['app/hotkey_to_visible'] = statistics.median(samples)
+
+        # CPU per animation frame with one float up
+        for speed in SPEED_PRESETS:
+            gif.set_speed(speed)
+            run_for(root, 0.3)
+            ticks, cpu = gif.animation.ticks, time.process_time()
+            run_for(root, 1.5)
+            frames = gif.animation.ticks - ticks
+            if frames:
+                results[f'app/animate_cpu_per_frame/{speed}x'] = (time.process_time() - cpu) * 1000 / frames
+
+        gif.exit_app()
+        try:
+            pump(root, lambda: False, timeout=0.2)
+        except (SystemExit, tk.TclError):
+            pass  # _destroy_app exits the process's Tk loop
+    finally:
+        os.chdir(cwd)
+    return results
+
+
+# Running and comparing
+def machine():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'pillow': PIL.__version__,
+        'numpy': load_numpy().__version__ if load_numpy() is not None else None,
+    }
+
+
+def run(only=None, display=None):
+    display = have_display() if display is None else display
+    results = {}
+    skipped = []
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['LOCALAPPDATA'] = tmp  # Keep the frame cache out of the real profile
+        ctx = {'tmp': tmp, 'gifs': make_gif_set(tmp)}
+        for name, fn, needs_display in CASES:
+            if only and not any(part in name for part in only):
+                continue
+            if needs_display and not display:
+                skipped.append(name)
+                continue
+            start = time.perf_counter()
+            results.update(fn(ctx))
+            print(f'{name}: {time.perf_counter() - start:.1f} s', file=sys.stderr)
+    return results, skipped
+
+
+def compare(results, baseline, tolerance, min_delta, scale=1.0):
+    """Return (rows, regressions, missing); each row is (name, value, scaled baseline or None, status)
+
+    missing lists the results the baseline has no entry for.
+    """
+    rows, regressions, missing = [], [], []
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base is not None:
+            base *= scale
+        if base is None:
+            status = 'MISSING'
+            missing.append(name)
+        elif value > base * (1 + tolerance) and value - base > min_delta:
+            status = 'REGRESSION'
+            regressions.append(name)
+        elif value < base / (1 + tolerance) and base - value > min_delta:
+            status = 'faster'
+        else:
+            status = 'ok'
+        rows.append((name, value, base, status))
+    return rows, regressions, missing
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_results(path, results, calibration):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'machine': machine(), 'calibration_ms': calibration, 'results': results},
+                  f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='where to write this run (JSON)')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE, help='results to compare against')
+    parser.add_argument('--update-baseline', action='store_true', help='store this run as the baseline')
+    parser.add_argument('--tolerance', type=float, default=1.0,
+                        help='allowed slowdown as a fraction (1.0 lets a case take twice as long)')
+    parser.add_argument('--min-delta', type=float, default=1.0, help='ignore slowdowns below this many ms')
+    parser.add_argument('--only', nargs='*', help='run only cases whose name contains one of these')
+    parser.add_argument('--no-calibrate', action='store_true', help='compare raw times, unscaled')
+    args = parser.parse_args(argv)
+
+    calibration = calibrate()
+    results, skipped = run(args.only)
+    # Calibrate again afterwards so a slowdown halfway through is noticed too
+    calibration = min(calibration, calibrate())
+    save_results(args.output, results, calibration)
+    if args.update_baseline:
+        save_results(args.baseline, results, calibration)
+        print(f'baseline updated: {args.baseline}')
+        if skipped:
+            print(f"no entries for the cases skipped without a display: {', '.join(skipped)}")
+        return 0
+
+    scale = 1.0
+    baseline = {}
+    if os.path.exists(args.baseline):
+        stored = load_results(args.baseline)
+        baseline = stored['results']
+        if not args.no_calibrate and stored.get('calibration_ms'):
+            scale = calibration / stored['calibration_ms']
+            print(f'calibration: {calibration:.1f} ms vs {stored["calibration_ms"]:.1f} ms in the baseline'
+                  f' (baseline scaled x{scale:.2f})')
+    rows, regressions, missing = compare(results, baseline, args.tolerance, args.min_delta, scale)
+    print(f"{'benchmark':40} {'ms':>10} {'baseline':>10} {'change':>8}  status")
+    for name, value, base, status in rows:
+        change = f'{(value / base - 1) * 100:+7.1f}%' if base else ''
+        base_text = f'{base:10.3f}' if base is not None else ' ' * 10
+        print(f'{name:40} {value:10.3f} {base_text} {change:>8}  {status}')
+    if skipped:
+        print(f"skipped without a display: {', '.join(skipped)}")
+
+    if regressions:
+        print(f'\n{len(regressions)} REGRESSION(S) against {args.baseline}:')
+        for name in regressions:
+            print(f'  {name}')
+    if missing:
+        print(f'\n{len(missing)} result(s) with no entry in {args.baseline} (run with --update-baseline):')
+        for name in missing:
+            print(f'  {name}')
+    return 1 if regressions or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""Synthetic GIF inputs and shared helpers for the benchmarks"""
+import heapq
+import io
+import itertools
+import os
+import queue
+import sys
+import time
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from PIL import Image, ImageDraw
+
+# The suite's inputs: small/large, few/many frames, with and without transparency
+GIF_SET = {
+    'small-few': dict(size=(120, 150), frame_count=8, transparent=True),
+    'small-many': dict(size=(120, 150), frame_count=96, transparent=True),
+    'default': dict(size=(360, 450), frame_count=24, transparent=True),
+    'large-few': dict(size=(720, 900), frame_count=8, transparent=True),
+    'large-many': dict(size=(720, 900), frame_count=64, transparent=True),
+    'opaque': dict(size=(360, 450), frame_count=24, transparent=False),
+}
+
+
+def make_gif(path, size=(360, 450), frame_count=24, transparent=True, duration=80, hold=1, pingpong=False):
+    """Write an animated GIF with a moving shape on a transparent background
+
+    hold shows every frame that many times, each copy one pixel off the last
+    (an exact copy would be merged by the encoder); pingpong plays the
+    frames forwards and then backwards, so each frame comes up twice.
+    """
+    width, height = size
+    frames = []
+    for i in range(frame_count):
+        frame = Image.new('RGBA', size, (0, 0, 0, 0) if transparent else (255, 255, 255, 255))
+        draw = ImageDraw.Draw(frame)
+        offset = (i * width // max(frame_count, 1)) % width
+        draw.ellipse(
+            (offset // 2, height // 4, offset // 2 + width // 2, height // 4 + height // 2),
+            fill=(40 + i * 7 % 200, 120, 220, 255)
+        )
+        draw.rectangle((0, height - height // 8, width, height), fill=(90, 90, 90, 255))
+        frames.append(frame)
+    if pingpong:
+        frames += frames[-2:0:-1]
+    if hold > 1:
+        held = []
+        for frame in frames:
+            for copy in range(hold):
+                frame = frame.copy()
+                frame.putpixel((copy, height - 1), (98, 90, 90, 255))
+                held.append(frame)
+        frames = held
+
+    frames[0].save(
+        path,
+        save_all=True,
+        append_images=frames[1:],
+        duration=duration,
+        loop=0,
+        disposal=2,
+    )
+    return path
+
+
+def have_display():
+    """Return True if Tk windows (and pystray, which connects to the display when imported) can open"""
+    return sys.platform == 'win32' or bool(os.environ.get('DISPLAY'))
+
+
+def make_gif_set(directory, names=None):
+    """Write the GIF_SET inputs into directory; returns {name: path}"""
+    paths = {}
+    for name in names or GIF_SET:
+        paths[name] = make_gif(os.path.join(directory, f'{name}.gif'), **GIF_SET[name])
+    return paths
+
+
+class FakeIcon:
+    """Counts icon updates and serializes them like pystray's backends do"""
+
+    def __init__(self):
+        self.updates = 0
+        self.serialize_ms = 0.0
+        self._icon = None
+
+    @property
+    def icon(self):
+        return self._icon
+
+    @icon.setter
+    def icon(self, image):
+        start = time.perf_counter()
+        image.save(io.BytesIO(), format='ICO')
+        self.serialize_ms += (time.perf_counter() - start) * 1000
+        self._icon = image
+        self.updates += 1
+
+
+class TickLoop:
+    """Minimal stand-in for the Tk event loop: ticks every tick_ms like animate_gif and runs posted callbacks"""
+
+    def __init__(self, tick_ms=16):
+        self.tick_ms = tick_ms
+        self.callbacks = queue.Queue()
+        self.ticks = []
+        self.finished = None
+
+    def post(self, callback):
+        self.callbacks.put(callback)
+
+    def run_until(self, done, timeout=30):
+        deadline = time.perf_counter() + timeout
+        next_tick = time.perf_counter()
+        self.ticks.append(next_tick)
+        while not done() and time.perf_counter() < deadline:
+            try:
+                self.callbacks.get(timeout=max(0, next_tick - time.perf_counter()))()
+            except queue.Empty:
+                pass
+            now = time.perf_counter()
+            if now >= next_tick:
+                self.ticks.append(now)
+                next_tick = now + self.tick_ms / 1000
+        self.finished = time.perf_counter()
+
+    def worst_gap_ms(self):
+        # Include the stretch after the last tick, when a blocking call stalls the loop
+        ticks = self.ticks + [self.finished]
+        gaps = [b - a for a, b in zip(ticks, ticks[1:])]
+        return max(gaps) * 1000 if gaps else 0.0
+
+
+class EventLoop:
+    """Just enough of Tk's after() to run the app's timers in real time, on this thread"""
+
+    def __init__(self):
+        self.queue = []
+        self.cancelled = set()
+        self.ids = itertools.count()
+        self.callbacks = 0
+
+    def after(self, ms, callback, *args):
+        after_id = next(self.ids)
+        heapq.heappush(self.queue, (time.monotonic() + ms / 1000, after_id, lambda: callback(*args)))
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.cancelled.add(after_id)
+
+    def pending(self):
+        return sum(1 for _, after_id, _ in self.queue if after_id not in self.cancelled)
+
+    def run(self, seconds):
+        end = time.monotonic() + seconds
+        while True:
+            while self.queue and self.queue[0][1] in self.cancelled:
+                self.cancelled.discard(heapq.heappop(self.queue)[1])
+            due = self.queue[0][0] if self.queue else end
+            if due >= end:
+                time.sleep(max(0.0, end - time.monotonic()))
+                return
+            time.sleep(max(0.0, due - time.monotonic()))
+            _, _, callback = heapq.heappop(self.queue)
+            self.callbacks += 1
+            callback()
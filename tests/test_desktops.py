@@ -0,0 +1,110 @@
+"""DesktopManager makes every backend call on its own thread and never has the UI thread wait for it"""
+import os
+import queue
+import sys
+import threading
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from backend import SimulatedBackend, WindowGoneError  # noqa: E402
+from desktops import DesktopManager  # noqa: E402
+
+
+class UILoop:
+    """Stands in for the Tk root: like Tk, post() from another thread waits until the UI thread has run it"""
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.callbacks = queue.Queue()
+
+    def post(self, callback):
+        if threading.current_thread() is self.thread:
+            self.callbacks.put(callback)
+            return
+        done = threading.Event()
+        self.callbacks.put(lambda: (callback(), done.set()))
+        if not done.wait(5):
+            raise AssertionError('the UI thread never ran a posted callback')
+
+    def run_until(self, done, timeout=5):
+        while not done():
+            self.callbacks.get(timeout=timeout)()
+
+
+class DesktopManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = UILoop()
+        self.backend = SimulatedBackend(latency={'move_view': 0.01}, desktop_count=2)
+        self.hwnds = [self.backend.open_window(f'Doc {i}', process='app.exe') for i in range(3)]
+
+        # Like WindowWatcher, hand every window event to the UI thread
+        self.events = []
+        self.backend.subscribe_window_events(lambda event, hwnd: self.loop.post(lambda: self.events.append(event)))
+
+        # Where each backend call is made from
+        self.callers = set()
+        call = self.backend._call
+        self.backend._call = lambda name: (self.callers.add(threading.current_thread().name), call(name))
+
+        self.desktops = DesktopManager(self.backend, self.loop.post)
+        self.addCleanup(self.desktops.shutdown)
+        self.desktops.setup()
+
+    def call(self, method, *args, **kwargs):
+        """Call method with on_done from the UI thread and run the UI until the result arrives"""
+        results = []
+        self.assertIsNone(method(*args, on_done=results.append, on_error=results.append, **kwargs))
+        self.loop.run_until(lambda: results)
+        return results[0]
+
+    def test_park_and_restore_deliver_through_post(self):
+        self.assertEqual(self.call(self.desktops.park, self.hwnds), self.hwnds)
+        self.assertEqual({self.backend.windows[h].desktop for h in self.hwnds}, {1})
+
+        # Restoring uncloaks the windows, so the backend posts events from the desktop thread meanwhile
+        self.assertEqual(self.call(self.desktops.restore, self.hwnds, focus=self.hwnds[0]), self.hwnds)
+        self.assertEqual({self.backend.windows[h].desktop for h in self.hwnds}, {0})
+        self.assertEqual(self.backend.foreground, self.hwnds[0])
+        self.assertIn('uncloaked', self.events)
+        self.assertTrue(all(name.startswith('desktops') for name in self.callers), self.callers)
+
+    def test_a_window_that_wont_move_is_reported(self):
+        errors = []
+        self.desktops.on_error = errors.append
+
+        def move_view(view, desktop):
+            raise RuntimeError('access denied')
+        self.backend.move_view = move_view
+
+        self.assertEqual(self.call(self.desktops.park, self.hwnds[:1]), [])
+        self.assertEqual([str(e) for e in errors], ['access denied'])
+        self.assertEqual(self.desktops.stats()['failed_moves'], 1)
+        self.assertEqual(self.desktops.stats()['retries'], 1)
+
+    def test_window_back(self):
+        self.call(self.desktops.park, self.hwnds[:1])
+        self.assertFalse(self.call(self.desktops.window_back, self.hwnds[0]))
+        self.assertTrue(self.call(self.desktops.window_back, self.hwnds[1]))
+
+        self.backend.close_window(self.hwnds[0])
+        self.assertIsInstance(self.call(self.desktops.window_back, self.hwnds[0]), WindowGoneError)
+        self.assertTrue(all(name.startswith('desktops') for name in self.callers), self.callers)
+
+    def test_windows_of_process_checks_visibility_on_the_desktop_thread(self):
+        self.backend.open_window('Other', process='other.exe')
+        self.backend.windows[self.hwnds[2]].visible = False
+
+        result = []
+        thread = threading.Thread(target=lambda: result.append(self.desktops.windows_of_process(self.hwnds[0])))
+        thread.start()
+        thread.join()
+
+        self.assertEqual(result, [self.hwnds[:2]])
+        self.assertIn('is_window_visible', self.backend.calls)
+        self.assertTrue(all(name.startswith('desktops') for name in self.callers), self.callers)
+
+
+if __name__ == '__main__':
+    unittest.main()
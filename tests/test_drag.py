@@ -0,0 +1,99 @@
+"""WindowMover moves the dragged window at most once per display frame and ends where the mouse let go"""
+import heapq
+import itertools
+import os
+import sys
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from drag import FRAME_MS, WindowMover  # noqa: E402
+
+
+class VirtualLoop:
+    """An after() loop on a virtual millisecond clock"""
+
+    def __init__(self):
+        self.now_ms = 0.0
+        self.queue = []
+        self.cancelled = set()
+        self.ids = itertools.count()
+
+    def clock(self):
+        return self.now_ms / 1000
+
+    def after(self, ms, callback, *args):
+        after_id = next(self.ids)
+        heapq.heappush(self.queue, (self.now_ms + ms, after_id, callback, args))
+        return after_id
+
+    def after_cancel(self, after_id):
+        self.cancelled.add(after_id)
+
+    def advance(self, ms):
+        """Run everything due in the next ms milliseconds"""
+        end = self.now_ms + ms
+        while self.queue and self.queue[0][0] <= end:
+            due, after_id, callback, args = heapq.heappop(self.queue)
+            self.now_ms = due
+            if after_id not in self.cancelled:
+                callback(*args)
+        self.now_ms = end
+
+
+class WindowMoverTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = VirtualLoop()
+        self.moves = []
+        self.mover = WindowMover(self.loop.after, self.loop.after_cancel, clock=self.loop.clock)
+
+    def move(self, x, y):
+        self.moves.append((self.loop.now_ms, x, y))
+
+    def test_one_move_per_frame_and_final_position(self):
+        self.mover.begin(self.move, (0, 0))
+        # A 1000 Hz mouse for half a second
+        for i in range(1, 501):
+            self.mover.request(i, 2 * i)
+            self.loop.advance(1)
+        dragged = list(self.moves)
+        self.mover.end()
+
+        times = [t for t, _, _ in dragged]
+        self.assertTrue(all(b - a >= FRAME_MS for a, b in zip(times, times[1:])), times)
+        self.assertLessEqual(len(dragged), 500 / FRAME_MS + 1)
+        # Letting go puts the window where the mouse was, without waiting for the frame
+        self.assertEqual(self.moves[-1], (500, 500, 1000))
+        self.assertEqual(self.mover.stats()['moves_requested'], 500)
+
+    def test_end_applies_the_last_position_at_once(self):
+        self.mover.begin(self.move, (0, 0))
+        self.mover.request(10, 10)  # Moves straight away
+        self.mover.request(20, 20)  # Waits for the frame
+        self.mover.request(30, 40)
+        self.assertEqual([m[1:] for m in self.moves], [(10, 10)])
+        self.mover.end()
+        self.assertEqual([m[1:] for m in self.moves], [(10, 10), (30, 40)])
+        # Nothing is left to fire after the drag
+        self.loop.advance(100)
+        self.assertEqual(len(self.moves), 2)
+        self.assertFalse(self.mover.active)
+
+    def test_cancel_does_not_move(self):
+        self.mover.begin(self.move, (0, 0))
+        self.mover.request(10, 10)
+        self.mover.request(20, 20)
+        self.mover.cancel()
+        self.loop.advance(100)
+        self.assertEqual([m[1:] for m in self.moves], [(10, 10)])
+
+    def test_no_move_back_to_the_same_place(self):
+        self.mover.begin(self.move, (5, 5))
+        self.mover.request(5, 5)
+        self.mover.end()
+        self.assertEqual(self.moves, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+"""FrameCache writes frame sets to disk off the caller's thread, each through a temporary file of its own"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from PIL import Image  # noqa: E402
+
+from framecache import FrameCache  # noqa: E402
+
+
+def make_frames(count, color):
+    return [Image.new('RGBA', (8, 10), (color, i, 0, 255)) for i in range(count)]
+
+
+class FrameCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = FrameCache(self.tmp.name)
+        self.addCleanup(self.cache.close)
+        self.key = FrameCache.make_key('abc', (8, 10), 1, 128)
+
+    def test_put_writes_in_the_background(self):
+        writer_threads = []
+        write = self.cache._write
+        self.cache._write = lambda key, frames, durations: (writer_threads.append(threading.current_thread()),
+                                                            write(key, frames, durations))
+
+        frames = make_frames(3, 10)
+        self.cache.put(self.key, frames)
+        self.assertIs(self.cache.get(self.key), frames)  # Usable from memory at once
+        self.cache.flush()
+
+        self.assertEqual(len(writer_threads), 1)
+        self.assertIsNot(writer_threads[0], threading.current_thread())
+        read = FrameCache(self.tmp.name).get(self.key)
+        self.assertEqual([f.tobytes() for f in read], [f.tobytes() for f in frames])
+
+    def test_writers_never_share_a_temporary_file(self):
+        # Two copies of the app writing the same set at once
+        other = FrameCache(self.tmp.name)
+        self.addCleanup(other.close)
+        first, second = make_frames(20, 10), make_frames(20, 200)
+        threads = [threading.Thread(target=cache._write, args=(self.key, frames))
+                   for cache, frames in ((self.cache, first), (other, second)) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        read = FrameCache(self.tmp.name).get(self.key)
+        self.assertIn([f.tobytes() for f in read],
+                      ([f.tobytes() for f in first], [f.tobytes() for f in second]))
+        self.assertEqual([name for name in os.listdir(self.tmp.name) if name.endswith('.tmp')], [])
+
+    def test_write_error_is_counted_and_leaves_nothing_behind(self):
+        # os.replace into a directory that does not exist fails like a full or read-only disk would
+        self.cache._path_for = lambda key: os.path.join(self.tmp.name, 'missing', 'set.wfc')
+
+        self.cache.put(self.key, make_frames(2, 10))
+        self.cache.flush()
+
+        self.assertEqual(self.cache.stats()['write_errors'], 1)
+        self.assertEqual(self.cache.stats()['pending_writes'], 0)
+        self.assertEqual(os.listdir(self.tmp.name), [])
+        self.assertIsNotNone(self.cache.get(self.key))
+
+    def test_tray_frames_keep_their_durations(self):
+        frames = make_frames(3, 10)
+        self.cache.put_tray('abc', frames, [100, 40, 250])
+        self.cache.flush()
+
+        read_frames, durations = FrameCache(self.tmp.name).get_tray('abc')
+        self.assertEqual([f.tobytes() for f in read_frames], [f.tobytes() for f in frames])
+        self.assertEqual(durations, [100, 40, 250])
+        self.assertIsNone(FrameCache(self.tmp.name).get(self.key))  # Not mistaken for a scaled set
+        with self.assertRaises(ValueError):
+            self.cache.put_tray('abc', frames, [100])
+
+    def test_close_writes_what_is_queued(self):
+        self.cache.put(self.key, make_frames(2, 10))
+        self.cache.close()
+        self.cache.put(FrameCache.make_key('def', (8, 10), 1, 128), make_frames(2, 10))  # Memory only now
+
+        self.assertIsNotNone(FrameCache(self.tmp.name).get(self.key))
+        self.assertEqual(len([name for name in os.listdir(self.tmp.name) if name.endswith('.wfc')]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
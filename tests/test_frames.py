@@ -0,0 +1,105 @@
+"""FrameSource merges holds and repeats as it decodes, and serves several readers from one small window"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from synthetic import make_gif  # noqa: E402
+
+from frames import FrameSource  # noqa: E402
+
+
+def pixels(frames):
+    return [frame.tobytes() for frame in frames]
+
+
+class FrameSourceTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+
+    def source(self, name, tolerance=0, **kwargs):
+        source = FrameSource(make_gif(os.path.join(self.dir, f'{name}.gif'), size=(40, 50), **kwargs),
+                             tolerance=tolerance)
+        self.addCleanup(source.close)
+        return source
+
+    def test_ping_pong_frames_are_aliases(self):
+        source = self.source('pingpong', frame_count=6, pingpong=True)
+        frames = list(source)
+
+        # Forwards 0-5, then back through 4-1
+        self.assertEqual(len(frames), 10)
+        self.assertEqual(source.aliases, {6: 4, 7: 3, 8: 2, 9: 1})
+        for position, first in source.aliases.items():
+            self.assertEqual(frames[position].tobytes(), frames[first].tobytes())
+        self.assertEqual(source.stats()['unique_frames'], 6)
+
+    def test_a_static_gif_is_one_frame(self):
+        source = self.source('static', frame_count=1)
+        self.assertEqual(len(list(source)), 1)
+        self.assertEqual(len(source), 1)
+        self.assertEqual(len(source.durations()), 1)
+
+    def test_durations_after_a_partial_pass_match_a_full_one(self):
+        # Each held copy is one pixel off the last, so they merge with a small tolerance
+        partial = self.source('held', tolerance=8, frame_count=8, hold=3, duration=50)
+        for _, frame in zip(range(4), partial):
+            pass
+        self.assertFalse(partial.complete)
+
+        full = FrameSource(partial.path, tolerance=8)
+        self.addCleanup(full.close)
+        self.assertEqual(partial.durations(), full.durations())
+        self.assertEqual(partial.durations(), [150] * 8)
+        self.assertEqual(pixels(partial), pixels(full))
+
+    def test_concurrent_readers_see_the_same_frames(self):
+        source = self.source('shared', frame_count=12, hold=2, pingpong=True)
+        expected = pixels(FrameSource(source.path))
+        results, errors = [], []
+
+        def read():
+            try:
+                for _ in range(3):
+                    results.append(pixels(source))
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=read) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(results), 12)
+        self.assertTrue(all(result == expected for result in results))
+        self.assertLessEqual(source.stats()['peak_window'], source.window * len(threads))
+
+    def test_interleaved_readers_keep_their_own_frames(self):
+        source = self.source('interleaved', frame_count=10)
+        source.durations()
+        first_pass = source.decoded
+
+        for _ in range(50):
+            ahead, behind = iter(source), iter(source)
+            for _ in range(5):
+                next(ahead)
+            for _ in ahead:
+                next(behind)
+            for _ in behind:
+                pass
+
+        # A window for each reader covers this GIF, so only the frames the first pass evicted are decoded again
+        self.assertLessEqual(source.decoded - first_pass, source.frame_count - source.window)
+
+
+if __name__ == '__main__':
+    unittest.main()
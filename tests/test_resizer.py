@@ -0,0 +1,133 @@
+"""FrameResizer hands every result, and every failure, to the UI thread through post"""
+import os
+import queue
+import sys
+import tempfile
+import threading
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from synthetic import make_gif  # noqa: E402
+
+from frames import FrameSource  # noqa: E402
+from resizer import FrameResizer  # noqa: E402
+
+SIZE = (36, 45)
+
+
+class UILoop:
+    """Stands in for the Tk root: post() may come from any thread, callbacks only run in run_until()"""
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.callbacks = queue.Queue()
+        self.posted_from = set()
+
+    def post(self, callback):
+        self.posted_from.add(threading.current_thread().name)
+        self.callbacks.put(callback)
+
+    def run_until(self, done, timeout=30):
+        while not done():
+            self.callbacks.get(timeout=timeout)()
+
+
+class BrokenSource:
+    """A frame source that fails partway through decoding"""
+    aliases = {}
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __iter__(self):
+        yield self.frames[0]
+        raise OSError('truncated GIF')
+
+    def __getitem__(self, index):
+        if index > 0:
+            raise OSError('truncated GIF')
+        return self.frames[0]
+
+
+class FrameResizerTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.path = make_gif(os.path.join(cls.tmp.name, 'test.gif'), size=(120, 150), frame_count=12)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        self.loop = UILoop()
+        self.resizer = FrameResizer(self.loop.post, workers=2, chunk_size=4)
+        self.addCleanup(self.resizer.shutdown)
+
+    def on_ui_thread(self, results):
+        # The callbacks touch Tk in the app, so they must only ever run on the UI thread
+        def record(*args):
+            self.assertIs(threading.current_thread(), self.loop.thread)
+            results.append(args)
+        return record
+
+    def test_result_arrives_through_post(self):
+        results = []
+        future = self.resizer.resize(FrameSource(self.path), SIZE, self.on_ui_thread(results))
+        future.result(timeout=30)
+        # Scaled on the workers, but nothing has run on the UI thread until it takes the posted callback
+        self.assertEqual(results, [])
+        self.loop.run_until(lambda: results)
+
+        frames, = results[0]
+        self.assertEqual(len(frames), 12)
+        self.assertTrue(all(frame.size == SIZE for frame in frames))
+        # Only the workers posted; the UI thread never waited on them
+        self.assertNotIn(self.loop.thread.name, self.loop.posted_from)
+
+    def test_refine_posts_chunks_from_the_start_frame(self):
+        chunks, done = [], []
+        self.resizer.refine(FrameSource(self.path), SIZE, self.on_ui_thread(chunks), self.on_ui_thread(done),
+                            start=5)
+        self.loop.run_until(lambda: done)
+
+        # Chunks grow from one frame at the start frame and wrap around; the workers may post them in any order
+        self.assertEqual(sorted(indices for indices, _ in chunks), [[0, 1, 2, 3], [4], [5], [6, 7], [8, 9, 10, 11]])
+        self.assertEqual(len(done[0][0]), 12)
+
+    def test_failure_reaches_on_error(self):
+        source = BrokenSource([FrameSource(self.path)[0]])
+        done, errors = [], []
+        self.resizer.resize(source, SIZE, self.on_ui_thread(done), on_error=self.on_ui_thread(errors))
+        self.loop.run_until(lambda: errors)
+
+        self.assertEqual(done, [])
+        self.assertIsInstance(errors[0][0], OSError)
+
+    def test_refine_failure_reaches_on_error(self):
+        source = BrokenSource([FrameSource(self.path)[0]])
+        errors = []
+        self.resizer.refine(source, SIZE, lambda indices, frames: None, on_error=self.on_ui_thread(errors))
+        self.loop.run_until(lambda: errors)
+        self.assertIsInstance(errors[0][0], OSError)
+
+    def test_failure_without_on_error_is_raised_on_the_ui_thread(self):
+        source = BrokenSource([FrameSource(self.path)[0]])
+        self.resizer.resize(source, SIZE, lambda frames: None).exception(timeout=30)
+        with self.assertRaises(OSError):
+            self.loop.callbacks.get(timeout=30)()
+
+    def test_superseded_failure_is_still_reported(self):
+        source = BrokenSource([FrameSource(self.path)[0]])
+        errors, done = [], []
+        self.resizer.resize(source, SIZE, lambda frames: None, on_error=self.on_ui_thread(errors))
+        self.resizer.resize(FrameSource(self.path), SIZE, self.on_ui_thread(done))
+        self.loop.run_until(lambda: errors and done)
+        self.assertIsInstance(errors[0][0], OSError)
+
+
+if __name__ == '__main__':
+    unittest.main()
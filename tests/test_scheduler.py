@@ -0,0 +1,124 @@
+"""AnimationScheduler keeps to its frame schedule however late its timer fires"""
+import os
+import sys
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from scheduler import AnimationScheduler  # noqa: E402
+
+
+class FakeRoot:
+    """A clock and Tk's after()/after_cancel() on it; every timer fires lag seconds late"""
+
+    def __init__(self, lag=0.0):
+        self.now = 0.0
+        self.lag = lag
+        self.timers = {}
+        self._ids = iter(range(1, 1 << 30))
+
+    def clock(self):
+        return self.now
+
+    def after(self, ms, fn):
+        after_id = next(self._ids)
+        self.timers[after_id] = (self.now + ms / 1000 + self.lag, fn)
+        return after_id
+
+    def after_cancel(self, after_id):
+        del self.timers[after_id]
+
+    def run_until(self, until):
+        """Fire the timers due before until, in order, moving the clock to each"""
+        while self.timers:
+            after_id = min(self.timers, key=lambda i: self.timers[i][0])
+            due, fn = self.timers[after_id]
+            if due >= until:
+                break
+            del self.timers[after_id]
+            self.now = max(self.now, due)  # A timer that's overdue fires as soon as it can
+            fn()
+        self.now = max(self.now, until)
+
+
+class AnimationSchedulerTest(unittest.TestCase):
+    def scheduler(self, lag=0.0):
+        self.root = FakeRoot(lag)
+        self.frames = []
+        self.skips = []
+        return AnimationScheduler(self.root.after, self.root.after_cancel, self.frames.append,
+                                  on_skip=self.skips.append, clock=self.root.clock)
+
+    def test_holds_its_tick_rate(self):
+        for lag in (0.0, 0.007):
+            scheduler = self.scheduler(lag)
+            scheduler.start([40] * 5)
+            self.root.run_until(9.99)
+
+            # Scheduled against deadlines, so a timer that always fires late doesn't slow the loop down
+            self.assertEqual(scheduler.ticks, 250, lag)  # 0 to 9.96 s
+            self.assertEqual(scheduler.skipped, 0)
+            self.assertEqual(self.frames[:7], [0, 1, 2, 3, 4, 0, 1])
+            self.assertLess(scheduler.stats()['lateness_ms_max'], lag * 1000 + 1)
+
+    def test_late_frames_are_skipped(self):
+        scheduler = self.scheduler()
+        scheduler.start([100] * 10)
+        self.root.run_until(0.25)
+        self.assertEqual(self.frames, [0, 1, 2])
+
+        # The UI thread is busy until 0.55 s: frames 3 and 4 have had their whole time by then
+        self.root.now = 0.55
+        self.root.run_until(0.56)
+        self.assertEqual(self.frames, [0, 1, 2, 5])
+        self.assertEqual(self.skips, [2])
+        self.assertEqual(scheduler.skipped, 2)
+
+        # And the frame after that still comes at its own time
+        (due, _), = self.root.timers.values()
+        self.assertAlmostEqual(due, 0.6)
+
+    def test_a_long_stall_starts_over_from_now(self):
+        scheduler = self.scheduler()
+        scheduler.start([100] * 4)
+        self.root.run_until(0.05)
+        self.root.now = 30.0  # Slept through many loops
+        self.root.run_until(30.01)
+        self.assertEqual(self.skips, [4])
+        (due, _), = self.root.timers.values()
+        self.assertAlmostEqual(due, 30.1)
+
+    def test_lands_on_the_right_frame_after_suspend(self):
+        scheduler = self.scheduler()
+        scheduler.start([100, 200, 300])  # One loop is 600 ms
+        self.root.run_until(0.05)
+        scheduler.suspend()
+        self.assertEqual(self.root.timers, {})  # Nothing ticks while suspended
+
+        # 10 450 ms in, 250 ms into a loop: frame 1 (100-300 ms) is showing
+        self.root.run_until(10.45)
+        scheduler.unsuspend()
+        self.root.run_until(10.46)
+        self.assertEqual(self.frames, [0, 1])
+        self.assertAlmostEqual(scheduler.stats()['suspended_seconds'], 10.4)
+
+        # Frame 2 follows after frame 1's whole 200 ms
+        self.root.run_until(10.651)
+        self.assertEqual(self.frames, [0, 1, 2])
+
+    def test_start_while_suspended_only_records_the_frame(self):
+        scheduler = self.scheduler()
+        scheduler.suspend()
+        scheduler.start([100] * 4, frame=2)
+        self.root.run_until(0.25)
+        self.assertEqual(self.frames, [])
+
+        # The loop counts as started at frame 2 when start() was called: 250 ms on, that's frame 0
+        scheduler.unsuspend()
+        self.root.run_until(0.26)
+        self.assertEqual(self.frames, [0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+"""ThemeLibrary reports failed loads and unmaps the bundles of themes it evicts"""
+import os
+import queue
+import sys
+import tempfile
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+
+from synthetic import make_gif  # noqa: E402
+
+from atlas import AtlasError  # noqa: E402
+from bundle import build_bundle  # noqa: E402
+from framecache import FrameCache  # noqa: E402
+from themes import ThemeLibrary, load_theme  # noqa: E402
+
+SIZE = (36, 45)
+
+
+class ThemeLibraryTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = tmp.name
+        self.paths = {}
+        for name in ('a', 'b'):
+            self.paths[name] = make_gif(os.path.join(self.dir, f'{name}.gif'), size=(60, 75), frame_count=6)
+            build_bundle(self.paths[name], sizes=[SIZE], source=True)
+        self.paths['broken'] = os.path.join(self.dir, 'broken.gif')
+        with open(self.paths['broken'], 'wb') as f:
+            f.write(b'GIF89a not really')
+
+        self.callbacks = queue.Queue()
+        self.errors = []
+        cache = FrameCache(os.path.join(self.dir, 'frames'))
+        self.addCleanup(cache.close)
+        self.library = ThemeLibrary(self.paths, cache, self.callbacks.put, on_error=self.errors.append)
+        self.addCleanup(self.library.shutdown)
+
+    def load(self, name):
+        results = []
+        self.library.preload(name, [SIZE], results.append, results.append)
+        while not results:
+            self.callbacks.get(timeout=30)()
+        return results[0]
+
+    def test_a_failed_load_reaches_every_caller_and_on_error(self):
+        results = []
+        self.library.preload('broken', [SIZE], results.append, results.append)
+        self.library.preload('broken', [SIZE], None, results.append)  # Joins the load already running
+        while len(results) < 2:
+            self.callbacks.get(timeout=30)()
+
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(result, Exception) for result in results))
+        self.assertEqual(self.errors, results[:1])
+        self.assertEqual(self.library.stats()['load_errors'], 1)
+
+    def test_evicting_a_bundle_theme_unmaps_it(self):
+        a = self.load('a')
+        self.assertIsNotNone(a.atlas)
+        self.library.activate(a)
+        self.assertEqual(a.frame_sets[SIZE][0].size, SIZE)
+
+        b = self.load('b')
+        self.library.budget = a.nbytes - 1
+        self.library.activate(b)  # a is inactive now, and over the budget
+
+        self.assertIsNone(self.library.get('a'))
+        self.assertIsNone(a.atlas.view)
+        with self.assertRaises(AtlasError):
+            a.frame_sets[SIZE][0]
+        self.assertIsNotNone(b.atlas.view)
+
+    def test_a_warm_cache_loads_without_decoding(self):
+        self.paths['plain'] = make_gif(os.path.join(self.dir, 'plain.gif'), size=(60, 75), frame_count=6)
+        cold = load_theme('plain', self.paths['plain'], [SIZE], self.library.cache)
+        self.library.cache.flush()
+
+        warm = load_theme('plain', self.paths['plain'], [SIZE], FrameCache(os.path.join(self.dir, 'frames')))
+        self.assertEqual(warm.source.decoded, 0)
+        self.assertEqual(warm.durations, cold.durations)
+        self.assertEqual([f.tobytes() for f in warm.tray_frames], [f.tobytes() for f in cold.tray_frames])
+
+    def test_replacing_a_theme_keeps_what_the_new_one_shares(self):
+        a = self.load('a')
+        self.library.activate(a)
+        again = type(a)(a.name, a.path, a.digest, a.durations, a.tray_frames, a.source, a.frame_sets, a.atlas)
+        self.library.add(again)
+        self.assertIsNotNone(a.atlas.view)
+        self.assertEqual(again.source[0].size, a.source[0].size)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""TrayAnimator makes its idle, battery and tray calls without holding its lock"""
+import os
+import sys
+import threading
+import types
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from PIL import Image  # noqa: E402
+
+from tray import PillowIconEncoder, TrayAnimator, Win32IconEncoder  # noqa: E402
+
+
+class Icon:
+    icon = None
+
+
+class FakeWin32Encoder(Win32IconEncoder):
+    """Win32IconEncoder without pywin32: handles are just numbers"""
+
+    def __init__(self):
+        self.win32gui = types.SimpleNamespace(NIM_MODIFY=1, NIF_ICON=2, DestroyIcon=lambda hicon: None)
+        self.direct = True
+
+    def encode(self, frame):
+        return id(frame), frame
+
+
+class TrayAnimatorTest(unittest.TestCase):
+    def setUp(self):
+        self.frames = [Image.new('RGBA', (16, 16), (i * 40, 0, 0, 255)) for i in range(4)]
+        self.unblocked = []
+        self.done = threading.Event()
+
+    def poke_from_another_thread(self, animator):
+        # poke() needs the lock, so it only returns here if the animation thread doesn't hold it
+        thread = threading.Thread(target=animator.poke, daemon=True)
+        thread.start()
+        thread.join(1)
+        self.unblocked.append(not thread.is_alive())
+
+    def test_checks_and_updates_run_without_the_lock(self):
+        animator = None
+
+        def on_battery():
+            self.poke_from_another_thread(animator)
+            return False
+
+        class Encoder(PillowIconEncoder):
+            def apply(encoder, icon, encoded):
+                self.poke_from_another_thread(animator)
+                super().apply(icon, encoded)
+                if len(self.unblocked) >= 6:
+                    self.done.set()
+
+        animator = TrayAnimator(Icon(), self.frames, [10] * 4, encoder=Encoder(), on_battery=on_battery)
+        animator.start()
+        self.assertTrue(self.done.wait(5))
+        animator.stop()
+        self.assertTrue(all(self.unblocked), self.unblocked)
+
+    def test_stop_wakes_a_paused_animation(self):
+        animator = TrayAnimator(Icon(), self.frames, [10] * 4, encoder=PillowIconEncoder(),
+                                on_battery=lambda: True, poll_interval=60)
+        animator.start()
+        animator.stop(timeout=2)
+        self.assertFalse(animator._thread.is_alive())
+        self.assertEqual(animator.updates, 0)
+
+    def test_a_timed_out_stop_leaves_the_icons_to_the_thread(self):
+        applying = threading.Event()
+        unblock = threading.Event()
+        released = []
+
+        class Encoder(FakeWin32Encoder):
+            def apply(encoder, icon, encoded):
+                applying.set()
+                unblock.wait(5)
+
+            def release(encoder, encoded):
+                released.append(encoded)
+
+        animator = TrayAnimator(Icon(), self.frames, [10] * 4, encoder=Encoder())
+        animator.start()
+        self.assertTrue(applying.wait(5))
+        animator.stop(timeout=0.05)
+        self.assertTrue(animator._thread.is_alive())
+        self.assertEqual(released, [])
+
+        unblock.set()
+        animator._thread.join(5)
+        self.assertFalse(animator._thread.is_alive())
+        self.assertEqual(len(released), len(self.frames))
+        self.assertEqual(animator.encoded, [])
+
+
+class Win32IconEncoderTest(unittest.TestCase):
+    def test_sends_the_handle_through_pystray(self):
+        sent = []
+        icon = Icon()
+        icon._message = lambda code, flags, **kwargs: sent.append((code, flags, kwargs))
+        encoder = FakeWin32Encoder()
+        frame = Image.new('RGBA', (16, 16))
+
+        encoder.apply(icon, encoder.encode(frame))
+        self.assertEqual(sent, [(1, 2, {'hIcon': id(frame)})])
+        self.assertIsNone(icon.icon)
+
+    def test_falls_back_to_icon_icon(self):
+        frame = Image.new('RGBA', (16, 16))
+        for icon in (Icon(), types.SimpleNamespace(icon=None, _message=lambda code: None)):
+            encoder = FakeWin32Encoder()
+            encoder.apply(icon, encoder.encode(frame))
+            self.assertIs(icon.icon, frame)
+            self.assertFalse(encoder.direct)
+
+
+if __name__ == '__main__':
+    unittest.main()
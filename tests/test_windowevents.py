@@ -0,0 +1,108 @@
+"""WindowWatcher and VisibilityTracker share one window event hook, fed from another thread"""
+import os
+import sys
+import threading
+import unittest
+
+# The app modules live next to WindowsFloat.py rather than in a package
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'WindowsFloat'))
+
+from backend import SimulatedBackend  # noqa: E402
+from visibility import VisibilityTracker  # noqa: E402
+from windowevents import SharedWindowEvents, WindowWatcher  # noqa: E402
+
+
+class UILoop:
+    """Collects after() callbacks, from any thread, until run() calls them on this one"""
+
+    def __init__(self):
+        self.callbacks = []
+        self._lock = threading.Lock()
+        self._ids = iter(range(1, 1 << 30))
+
+    def after(self, ms, fn, *args):
+        with self._lock:
+            self.callbacks.append((fn, args))
+            return next(self._ids)
+
+    def after_cancel(self, after_id):
+        pass
+
+    def run(self):
+        with self._lock:
+            callbacks, self.callbacks = self.callbacks, []
+        for fn, args in callbacks:
+            fn(*args)
+
+
+class SharedWindowEventsTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = UILoop()
+        self.backend = SimulatedBackend()
+        self.events = SharedWindowEvents(self.backend)
+        self.checked = []
+        self.watcher = WindowWatcher(self.events, self.loop.after, self.loop.after_cancel, self.check)
+        self.visibility = VisibilityTracker(self.backend, self.loop.after, self.loop.after_cancel,
+                                            lambda visible: None, events=self.events)
+
+    def check(self, hwnd):
+        self.checked.append(hwnd)
+        return False
+
+    def test_one_backend_subscription_for_both(self):
+        self.watcher.watch(1)
+        self.visibility.set_float(1)
+        self.assertEqual(len(self.backend.listeners), 1)
+        self.assertEqual(self.events.stats(), {'listeners': 2, 'subscriptions': 1})
+
+        self.watcher.unwatch(1)
+        self.assertEqual(len(self.backend.listeners), 1)
+        self.visibility.remove_float(1)
+        self.assertEqual(self.backend.listeners, [])
+
+        self.watcher.watch(2)
+        self.assertEqual(self.events.stats(), {'listeners': 1, 'subscriptions': 2})
+
+    def test_no_events_means_polling(self):
+        backend = SimulatedBackend(events=False)
+        watcher = WindowWatcher(SharedWindowEvents(backend), self.loop.after, self.loop.after_cancel, self.check)
+        watcher.watch(1)
+        self.assertFalse(watcher.event_driven)
+
+    def test_events_from_another_thread_while_the_ui_changes_the_watched_set(self):
+        for hwnd in range(100):
+            self.watcher.watch(hwnd)
+        errors = []
+        stop = threading.Event()
+
+        def hook():
+            try:
+                while not stop.is_set():
+                    self.backend._emit('foreground', None)
+                    self.backend._emit('destroy', 50)
+            except Exception as e:
+                errors.append(e)
+
+        thread = threading.Thread(target=hook)
+        thread.start()
+        try:
+            for i in range(2000):
+                self.watcher.watch(1000 + i)
+                self.watcher.unwatch(1000 + i - 1)
+        finally:
+            stop.set()
+            thread.join()
+        self.assertEqual(errors, [])
+
+        # A foreground event checks every window watched by the time the UI thread gets to it
+        self.loop.run()
+        self.checked.clear()
+        self.backend._emit('foreground', None)
+        self.watcher.unwatch(7)
+        self.loop.run()
+        self.assertEqual(sorted(self.checked), sorted(self.watcher.hwnds))
+        self.assertNotIn(7, self.checked)
+
+
+if __name__ == '__main__':
+    unittest.main()